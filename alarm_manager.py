@@ -0,0 +1,253 @@
+"""
+Drive alarm manager
+
+Decodes G540 fault codes (register 0x2102) and state word 2 bits into
+named alarm conditions, debounces them, and keeps an in-memory alarm
+history indexed by id, drive and code. An alarm stays in the active list
+until it has both cleared and been acknowledged. Every change bumps a
+version number; clients long-poll wait_for_change() and only re-render
+when something actually happened.
+"""
+
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# G500 series fault table (register 0x2102 value -> keypad code, description)
+FAULT_CODES = {
+    1: ('OUt1', 'Inverter unit U phase protection'),
+    2: ('OUt2', 'Inverter unit V phase protection'),
+    3: ('OUt3', 'Inverter unit W phase protection'),
+    4: ('OC1', 'Over-current when accelerating'),
+    5: ('OC2', 'Over-current when decelerating'),
+    6: ('OC3', 'Over-current at constant speed'),
+    7: ('OV1', 'Over-voltage when accelerating'),
+    8: ('OV2', 'Over-voltage when decelerating'),
+    9: ('OV3', 'Over-voltage at constant speed'),
+    10: ('UV', 'DC bus under-voltage'),
+    11: ('OL1', 'Motor overload'),
+    12: ('OL2', 'Inverter overload'),
+    13: ('SPI', 'Input phase loss'),
+    14: ('SPO', 'Output phase loss'),
+    15: ('OH1', 'Rectifier overheat'),
+    16: ('OH2', 'Inverter module overheat'),
+    17: ('EF', 'External fault'),
+    18: ('CE', 'RS-485 communication fault'),
+    19: ('ItE', 'Current detection fault'),
+    20: ('tE', 'Motor autotuning fault'),
+    21: ('EEP', 'EEPROM operation fault'),
+    22: ('PIDE', 'PID feedback offline'),
+    23: ('bCE', 'Braking unit fault'),
+    24: ('END', 'Running time reached'),
+    25: ('OL3', 'Electrical overload'),
+    26: ('PCE', 'Keypad communication fault'),
+    27: ('UPE', 'Parameter upload fault'),
+    28: ('DNE', 'Parameter download fault'),
+}
+
+# State word 2 bits (see g540_diagnostic.decode_state_word_2)
+STATE2_READY = 0x0001
+STATE2_OVERLOAD = 0x0010
+STATE2_CTRL_MASK = 0x0060
+STATE2_CTRL_COMM = 0x0040
+
+SEVERITY_FAULT = 'fault'
+SEVERITY_WARNING = 'warning'
+
+
+def decode_fault(code):
+    """(keypad code, description) for a fault register value"""
+    return FAULT_CODES.get(code, (f'E{code:03d}', f'Unknown fault {code}'))
+
+
+def conditions(status):
+    """Alarm conditions present in a VFDController.get_status() dict: {code: (severity, message)}"""
+    if status.get('state') == 'NoComm':
+        return {'comm_loss': (SEVERITY_FAULT, 'No Modbus response')}
+
+    found = {}
+    fault = status.get('fault_code', 0)
+    if fault or status.get('state') == 'Fault':
+        keypad, text = decode_fault(fault)
+        found[f'fault_{keypad}'] = (SEVERITY_FAULT, f'{keypad}: {text}')
+
+    state2 = status.get('state_word_2', 0)
+    if state2 & STATE2_OVERLOAD:
+        found['overload'] = (SEVERITY_WARNING, 'Overload pre-alarm')
+    if state2 and state2 & STATE2_CTRL_MASK != STATE2_CTRL_COMM:
+        found['local_control'] = (SEVERITY_WARNING, 'Not in communication control (keypad/terminal)')
+    return found
+
+
+class Alarm:
+    """One alarm occurrence"""
+
+    def __init__(self, alarm_id, drive, code, severity, message, raised):
+        self.id = alarm_id
+        self.drive = drive
+        self.code = code
+        self.severity = severity
+        self.message = message
+        self.raised = raised
+        self.cleared = None
+        self.acknowledged = None
+        self.acknowledged_by = None
+
+    @property
+    def is_active(self):
+        """Shown until it has cleared and been acknowledged"""
+        return self.cleared is None or self.acknowledged is None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'drive': self.drive,
+            'code': self.code,
+            'severity': self.severity,
+            'message': self.message,
+            'raised': self.raised,
+            'cleared': self.cleared,
+            'acknowledged': self.acknowledged,
+            'acknowledged_by': self.acknowledged_by
+        }
+
+
+class AlarmManager:
+    """Debounced drive alarms with acknowledgement and change notification"""
+
+    def __init__(self, raise_delay=3.0, clear_delay=10.0, history_size=500,
+                 on_change=None, clock=time.time):
+        """
+        Initialize alarm manager.
+
+        Args:
+            raise_delay: Seconds a condition must persist before it alarms
+            clear_delay: Seconds a condition must be gone before the alarm clears
+            history_size: Alarms kept in the history
+            on_change: Optional callback(event, alarm) for 'raised'/'cleared'/'acknowledged'
+            clock: Wall-clock time source
+        """
+        self.raise_delay = raise_delay
+        self.clear_delay = clear_delay
+        self.on_change = on_change
+        self.clock = clock
+
+        self.history = deque(maxlen=history_size)
+        self.by_id = {}
+        self.by_drive = {}    # drive -> [alarm ids]
+        self.by_code = {}     # code -> [alarm ids]
+        self.current = {}     # (drive, code) -> Alarm not yet cleared
+        self._pending = {}    # (drive, code) -> (first seen, severity, message)
+        self._absent = {}     # (drive, code) -> first time the condition was gone
+
+        self.version = 0
+        self._next_id = 1
+        self._lock = threading.RLock()  # Pollers on each bus and API threads share this
+        self._changed = threading.Condition()
+
+    def _notify(self, event, alarm):
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+        log = logger.warning if event == 'raised' else logger.info
+        log(f"Alarm {event}: {alarm.drive} {alarm.message}")
+        if self.on_change:
+            self.on_change(event, alarm)
+
+    def _add(self, drive, code, severity, message, now):
+        alarm = Alarm(self._next_id, drive, code, severity, message, now)
+        self._next_id += 1
+
+        if len(self.history) == self.history.maxlen:
+            old = self.history[0]
+            del self.by_id[old.id]
+            self.by_drive[old.drive].remove(old.id)
+            self.by_code[old.code].remove(old.id)
+        self.history.append(alarm)
+        self.by_id[alarm.id] = alarm
+        self.by_drive.setdefault(drive, []).append(alarm.id)
+        self.by_code.setdefault(code, []).append(alarm.id)
+        return alarm
+
+    def observe(self, drive, status):
+        """Evaluate one status sample for a drive"""
+        if status is None:
+            return
+        with self._lock:
+            self._evaluate(drive, conditions(status), self.clock())
+
+    def _evaluate(self, drive, present, now):
+        for code, (severity, message) in present.items():
+            key = (drive, code)
+            self._absent.pop(key, None)
+            if key in self.current:
+                continue
+            first, _, _ = self._pending.setdefault(key, (now, severity, message))
+            if now - first >= self.raise_delay:
+                del self._pending[key]
+                alarm = self._add(drive, code, severity, message, now)
+                self.current[key] = alarm
+                self._notify('raised', alarm)
+
+        for key in [k for k in self._pending if k[0] == drive and k[1] not in present]:
+            del self._pending[key]  # Transient: gone before the raise delay
+
+        for key in [k for k in self.current if k[0] == drive and k[1] not in present]:
+            gone = self._absent.setdefault(key, now)
+            if now - gone >= self.clear_delay:
+                del self._absent[key]
+                alarm = self.current.pop(key)
+                alarm.cleared = now
+                self._notify('cleared', alarm)
+
+    def acknowledge(self, alarm_id, user=None):
+        with self._lock:
+            alarm = self.by_id.get(alarm_id)
+            if alarm is None or alarm.acknowledged is not None:
+                return False
+            alarm.acknowledged = self.clock()
+            alarm.acknowledged_by = user
+            self._notify('acknowledged', alarm)
+            return True
+
+    def acknowledge_all(self, user=None):
+        with self._lock:
+            pending = [a.id for a in self.history if a.acknowledged is None]
+            return sum(self.acknowledge(alarm_id, user) for alarm_id in pending)
+
+    def active(self):
+        with self._lock:
+            return [a.to_dict() for a in self.history if a.is_active]
+
+    def query(self, drive=None, code=None, limit=100):
+        """Most recent alarms first, filtered by drive and/or code"""
+        with self._lock:
+            if drive is not None:
+                ids = self.by_drive.get(drive, [])
+            elif code is not None:
+                ids = self.by_code.get(code, [])
+            else:
+                ids = [a.id for a in self.history]
+            alarms = [self.by_id[i] for i in reversed(ids)]
+            if drive is not None and code is not None:
+                alarms = [a for a in alarms if a.code == code]
+            return [a.to_dict() for a in alarms[:limit]]
+
+    def wait_for_change(self, since, timeout):
+        """Block until the version moves past 'since' or the timeout expires"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != since, timeout)
+            return self.version
+
+    def get_status(self):
+        with self._lock:
+            active = [a for a in self.history if a.is_active]
+        return {
+            'version': self.version,
+            'active': len(active),
+            'unacknowledged': sum(1 for a in active if a.acknowledged is None),
+            'faults': sum(1 for a in active if a.severity == SEVERITY_FAULT and a.cleared is None)
+        }
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+"""
+RS-485 frame capture and offline decoder
+
+Capture timestamps every raw frame at the serial layer: a TapSerial proxy
+in front of each bus's port records what is written (TX), what is read
+(RX) and any bytes still waiting when the next transaction clears the
+input buffer (STRAY: late replies, echoes, noise), plus the full line
+settings whenever the port is reconfigured (CONFIG), so frame timing
+stays right across a g540_baud.py migration. Records go into a
+fixed-size in-memory ring, so the bus thread never waits on the SD card;
+a writer thread drains it to a compact binary file that rotates by size.
+If the writer falls behind, the oldest records are overwritten and
+counted. The sniff command captures passively instead, from a second
+adapter that only listens to the chain, splitting the byte stream into
+frames on the Modbus inter-frame silence (3.5 characters).
+
+File layout: MAGIC, a length-prefixed JSON header (bus names and line
+settings), then records of RECORD (time, kind, bus index, length) + frame;
+a CONFIG record's frame is the new line settings as JSON.
+
+The decoder pairs requests with replies, measures latency and turnaround
+(latency minus the time both frames take on the wire), flags missing
+replies, CRC errors, truncated frames, collisions (more bytes than the
+reply can hold) and interleaved frames (replies from the wrong slave,
+unsolicited or late bytes), and reports per-slave statistics:
+
+    python3 bus_capture.py decode bus_capture.bin bus_capture.bin.1
+    python3 bus_capture.py decode bus_capture.bin --slave 2 --anomalies 50
+    python3 bus_capture.py sniff /dev/ttyUSB1 --baudrate 9600 --parity N -o sniff.bin
+"""
+
+import os
+import sys
+import json
+import time
+import struct
+import argparse
+import threading
+import statistics
+import logging
+from datetime import datetime
+
+from vfd_controller import ModbusBus, crc16
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'R485CAP\x01'
+HEADER_LENGTH = struct.Struct('<I')
+RECORD = struct.Struct('<dBBH')    # epoch time, kind, bus index, frame length
+
+TX, RX, STRAY, SNIFF, CONFIG = range(5)
+
+LINE_SETTINGS = ('baudrate', 'bytesize', 'parity', 'stopbits')
+
+
+def char_bits(line):
+    """Bits per character on the wire: start + data + parity (unless 'N') + stop"""
+    return 1 + line.get('bytesize', 8) + (line.get('parity', 'E') != 'N') + line.get('stopbits', 1)
+
+
+class FrameRing:
+    """Fixed-size byte ring of RECORD-prefixed frames; the oldest are overwritten when full"""
+
+    def __init__(self, size):
+        self.size = size
+        self.buffer = bytearray(size)
+        self.head = 0           # next write position
+        self.tail = 0           # oldest record
+        self.used = 0
+        self.overwritten = 0
+
+    def _write(self, pos, data):
+        first = min(len(data), self.size - pos)
+        self.buffer[pos:pos + first] = data[:first]
+        self.buffer[:len(data) - first] = data[first:]
+
+    def _read(self, pos, n):
+        first = min(n, self.size - pos)
+        return bytes(self.buffer[pos:pos + first]) + bytes(self.buffer[:n - first])
+
+    def put(self, record):
+        n = len(record)
+        if n > self.size:
+            self.overwritten += 1
+            return
+        while self.size - self.used < n:
+            length = RECORD.unpack(self._read(self.tail, RECORD.size))[3]
+            self.tail = (self.tail + RECORD.size + length) % self.size
+            self.used -= RECORD.size + length
+            self.overwritten += 1
+        self._write(self.head, record)
+        self.head = (self.head + n) % self.size
+        self.used += n
+
+    def drain(self):
+        data = self._read(self.tail, self.used)
+        self.tail = self.head
+        self.used = 0
+        return data
+
+
+class TapSerial:
+    """Serial port proxy recording every frame written and read"""
+
+    def __init__(self, ser, capture, bus):
+        """
+        Args:
+            ser: The bus's serial.Serial
+            capture: BusCapture receiving the frames
+            bus: Bus index in the capture header
+        """
+        object.__setattr__(self, 'ser', ser)
+        object.__setattr__(self, 'capture', capture)
+        object.__setattr__(self, 'bus', bus)
+
+    def __getattr__(self, name):
+        return getattr(self.ser, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.ser, name, value)
+        if name in LINE_SETTINGS:
+            line = {key: getattr(self.ser, key) for key in LINE_SETTINGS}
+            self.capture.record(CONFIG, self.bus, json.dumps(line, separators=(',', ':')).encode())
+
+    def write(self, data):
+        self.capture.record(TX, self.bus, data)
+        return self.ser.write(data)
+
+    def read(self, size=1):
+        data = self.ser.read(size)
+        if data:
+            self.capture.record(RX, self.bus, data)
+        return data
+
+    def reset_input_buffer(self):
+        if self.ser.is_open:
+            waiting = self.ser.in_waiting
+            if waiting:
+                self.capture.record(STRAY, self.bus, self.ser.read(waiting))
+        self.ser.reset_input_buffer()
+
+
+class BusCapture:
+    """Timestamped raw frame capture into a ring drained to rotating binary files"""
+
+    def __init__(self, path, buses, ring_size=1024 * 1024, max_bytes=20 * 1024 * 1024, backups=5,
+                 flush_interval=1.0):
+        """
+        Initialize bus capture.
+
+        Args:
+            path: Capture file path
+            buses: Dict of bus name -> {'baudrate', 'parity', ...} (SERIAL_BUSES); the order gives the bus index
+            ring_size: Bytes of frames held in memory between writer passes
+            max_bytes: Rotate when the file grows past this size
+            backups: Rotated files to keep
+            flush_interval: Seconds between writer passes
+        """
+        self.path = path
+        self.buses = [dict(name=name, **{key: cfg[key] for key in LINE_SETTINGS if key in cfg})
+                      for name, cfg in buses.items()]
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+
+        self.ring = FrameRing(ring_size)
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.written = 0
+        # Epoch timestamps from the high-resolution counter
+        self._epoch = time.time() - time.perf_counter()
+        self._file = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def tap(self, ser, bus):
+        """Wrap a bus's serial port so its traffic is captured"""
+        return TapSerial(ser, self, bus)
+
+    def record(self, kind, bus, data):
+        """Add one frame; never blocks on disk"""
+        record = RECORD.pack(self._epoch + time.perf_counter(), kind, bus, len(data)) + bytes(data)
+        with self.lock:
+            self.ring.put(record)
+            self.frames += 1
+            if kind == CONFIG:
+                self.buses[bus].update(json.loads(data))  # Header of the next rotated file
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer, name='bus-capture', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write out what is buffered and close the file"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+
+    def _header(self):
+        header = json.dumps({'created': datetime.now().isoformat(timespec='seconds'),
+                             'buses': self.buses}).encode()
+        return MAGIC + HEADER_LENGTH.pack(len(header)) + header
+
+    def _open(self):
+        earlier = os.path.exists(self.path) and os.path.getsize(self.path) > 0
+        self._file = open(self.path, 'ab')
+        if earlier:
+            self._rotate()  # Keep an earlier run's file whole; each file has its own header
+        else:
+            self._file.write(self._header())
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'ab')
+        self._file.write(self._header())
+
+    def _writer(self):
+        try:
+            self._open()
+        except OSError as e:
+            logger.error(f"Cannot open bus capture {self.path}: {e}")
+            return
+
+        while True:
+            stopping = self._stop_event.wait(self.flush_interval)
+            with self.lock:
+                data = self.ring.drain()
+            if data:
+                try:
+                    self._file.write(data)
+                    self._file.flush()
+                    self.written += len(data)
+                    if self._file.tell() >= self.max_bytes:
+                        self._rotate()
+                except OSError as e:
+                    logger.error(f"Bus capture write failed: {e}")
+            if stopping:
+                break
+
+        self._file.close()
+
+    def get_stats(self):
+        return {
+            'frames': self.frames,
+            'written_bytes': self.written,
+            'overwritten': self.ring.overwritten,
+            'buffered_bytes': self.ring.used
+        }
+
+
+# ==================== PASSIVE CAPTURE ====================
+
+def sniff(port, baudrate, parity='N', stopbits=1, path='sniff.bin', duration=None, gap=None):
+    """
+    Listen on a spare adapter and capture every frame on the chain.
+
+    Frames are split on silence: gap seconds (default 3.5 characters, but
+    at least 2 ms since USB adapters deliver bytes in bursts). The
+    timestamp is when the first burst of a frame arrived.
+    """
+    bus = ModbusBus('sniff', port, baudrate, parity, stopbits)
+    line = {'baudrate': baudrate, 'parity': parity, 'stopbits': stopbits}
+    char_time = char_bits(line) / baudrate
+    gap = gap or max(3.5 * char_time, 0.002)
+    capture = BusCapture(path, {'sniff': line})
+    if not bus.connect():
+        raise RuntimeError(f"Cannot open {port}")
+    bus.ser.timeout = gap
+    capture.start()
+    end = time.monotonic() + duration if duration else None
+    frame, started = b'', None
+    try:
+        while end is None or time.monotonic() < end:
+            data = bus.ser.read(256)
+            if data:
+                if not frame:
+                    started = capture._epoch + time.perf_counter()
+                frame += data
+            elif frame:
+                with capture.lock:
+                    capture.ring.put(RECORD.pack(started, SNIFF, 0, len(frame)) + frame)
+                    capture.frames += 1
+                frame = b''
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.stop()
+        bus.close()
+    return capture.get_stats()
+
+
+# ==================== DECODER ====================
+
+def read_capture(paths):
+    """(header, time, kind, bus, frame) for every record, files in the order given"""
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            raise ValueError(f"{path}: not a bus capture file")
+        pos = len(MAGIC)
+        length, = HEADER_LENGTH.unpack_from(data, pos)
+        pos += HEADER_LENGTH.size
+        header = json.loads(data[pos:pos + length])
+        pos += length
+        while pos + RECORD.size <= len(data):
+            t, kind, bus, length = RECORD.unpack_from(data, pos)
+            pos += RECORD.size
+            if pos + length > len(data):
+                break  # Cut off mid-record (capture still running)
+            yield header, t, kind, bus, data[pos:pos + length]
+            pos += length
+
+
+def crc_ok(frame):
+    return len(frame) >= 4 and frame[-2:] == crc16(frame[:-2])
+
+
+def reply_length(request):
+    """Expected reply length for a request frame (None if unknown)"""
+    if len(request) < 6:
+        return None
+    if request[1] == 0x03:
+        return 5 + 2 * ((request[4] << 8) | request[5])
+    if request[1] in (0x06, 0x10):
+        return 8
+    return None
+
+
+class SlaveStats:
+    def __init__(self):
+        self.requests = 0
+        self.replies = 0
+        self.counts = {}
+        self.latency = []
+        self.turnaround = []
+
+    def flag(self, kind):
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def summary(self):
+        def ms(values, fn):
+            return round(1000 * fn(values), 2) if values else None
+        return {
+            'requests': self.requests,
+            'replies': self.replies,
+            **self.counts,
+            'latency_ms': {'mean': ms(self.latency, statistics.mean),
+                           'p95': ms(self.latency, lambda v: sorted(v)[int(0.95 * (len(v) - 1))]),
+                           'max': ms(self.latency, max)},
+            'turnaround_ms': {'mean': ms(self.turnaround, statistics.mean),
+                              'max': ms(self.turnaround, max)},
+        }
+
+
+class Decoder:
+    """Reconstructs Modbus transactions from captured frames"""
+
+    def __init__(self, slave=None, max_anomalies=20):
+        self.slave = slave
+        self.max_anomalies = max_anomalies
+        self.slaves = {}
+        self.anomalies = []
+        self.anomaly_count = 0
+        self.frames = 0
+        self.wire_time = 0.0
+        self.first = None
+        self.last = None
+        self.lines = {}        # bus -> line settings from the latest CONFIG record
+        self.pending = {}      # bus -> (time, request frame)
+
+    def _stats(self, slave):
+        return self.slaves.setdefault(slave, SlaveStats())
+
+    def _flag(self, t, bus, slave, kind, detail=''):
+        if self.slave is not None and slave != self.slave:
+            return
+        self._stats(slave).flag(kind)
+        self.anomaly_count += 1
+        if len(self.anomalies) < self.max_anomalies:
+            self.anomalies.append({'time': datetime.fromtimestamp(t).isoformat(timespec='milliseconds'),
+                                   'bus': bus, 'slave': slave, 'anomaly': kind, 'detail': detail})
+
+    def _char_time(self, header, bus):
+        line = self.lines.get(bus) or header['buses'][bus]
+        return char_bits(line) / line['baudrate']
+
+    def _request(self, t, bus, frame):
+        previous = self.pending.pop(bus, None)
+        if previous and previous[1][0] != 0:
+            self._flag(t, bus, previous[1][0], 'no_reply', previous[1].hex())
+        if not crc_ok(frame):
+            self._flag(t, bus, frame[0] if frame else None, 'crc', f"request {frame.hex()}")
+            return
+        if frame[0] == 0:
+            return  # Broadcast: never answered
+        if self.slave is None or frame[0] == self.slave:
+            self._stats(frame[0]).requests += 1
+        self.pending[bus] = (t, frame)
+
+    def _reply(self, t, bus, frame, char_time, sniffed):
+        pending = self.pending.pop(bus, None)
+        if pending is None:
+            self._flag(t, bus, frame[0] if frame else None, 'interleaved', f"unsolicited {frame.hex()}")
+            return
+        sent, request = pending
+        slave = request[0]
+        expected = reply_length(request)
+        if not crc_ok(frame):
+            if expected and len(frame) > expected:
+                self._flag(t, bus, slave, 'collision', f"{len(frame)} bytes for a {expected}-byte reply")
+            elif expected and len(frame) < expected and not (len(frame) == 5 and frame[1] & 0x80):
+                self._flag(t, bus, slave, 'short', f"{len(frame)} of {expected} bytes")
+            else:
+                self._flag(t, bus, slave, 'crc', frame.hex())
+            return
+        if frame[0] != slave:
+            self._flag(t, bus, slave, 'interleaved', f"reply from slave {frame[0]}")
+            return
+        if frame[1] & 0x80:
+            self._flag(t, bus, slave, 'exception', f"0x{frame[2]:02X}")
+        if self.slave is not None and slave != self.slave:
+            return
+        stats = self._stats(slave)
+        stats.replies += 1
+        latency = t - sent
+        # Tap RX times mark the end of the reply, sniffed frames their start
+        wire = len(request) * char_time + (0 if sniffed else len(frame) * char_time)
+        stats.latency.append(latency)
+        stats.turnaround.append(latency - wire)
+
+    def feed(self, header, t, kind, bus, frame):
+        if kind == CONFIG:
+            self.lines[bus] = json.loads(frame)
+            return
+        self.frames += 1
+        self.first = self.first or t
+        self.last = t
+        char_time = self._char_time(header, bus)
+        self.wire_time += len(frame) * char_time
+        if kind == TX:
+            self._request(t, bus, frame)
+        elif kind == RX:
+            self._reply(t, bus, frame, char_time, sniffed=False)
+        elif kind == STRAY:
+            pending = self.pending.get(bus)
+            self._flag(t, bus, frame[0] if frame else None, 'interleaved',
+                       f"{len(frame)} late bytes {frame[:16].hex()}" + (' (request outstanding)' if pending else ''))
+        elif kind == SNIFF:
+            # Direction is not known: a frame from the slave just asked, with its function code, is the reply
+            pending = self.pending.get(bus)
+            if (pending and len(frame) >= 2 and frame[0] == pending[1][0] and
+                    frame[1] & 0x7F == pending[1][1]):
+                self._reply(t, bus, frame, char_time, sniffed=True)
+            else:
+                self._request(t, bus, frame)
+
+    def report(self):
+        span = (self.last - self.first) if self.first else 0.0
+        return {
+            'frames': self.frames,
+            'duration_s': round(span, 3),
+            'bus_utilization': round(self.wire_time / span, 3) if span else None,
+            'slaves': {slave: stats.summary() for slave, stats in sorted(self.slaves.items(),
+                                                                        key=lambda item: item[0] or 0)},
+            'anomaly_count': self.anomaly_count,
+            'anomalies': self.anomalies
+        }
+
+
+def print_report(report):
+    print(f"{report['frames']} frames over {report['duration_s']:.1f} s, "
+          f"bus utilization {report['bus_utilization'] or 0:.1%}")
+    print(f"\n{'slave':>5} {'req':>7} {'reply':>7} {'no_rep':>6} {'crc':>5} {'short':>5} {'coll':>5} "
+          f"{'inter':>5} {'exc':>5} {'lat ms':>7} {'p95':>7} {'max':>7} {'turn ms':>7}")
+    for slave, s in report['slaves'].items():
+        lat, turn = s['latency_ms'], s['turnaround_ms']
+        fmt = lambda v: f"{v:7.1f}" if v is not None else f"{'-':>7}"
+        print(f"{str(slave):>5} {s['requests']:7d} {s['replies']:7d} {s.get('no_reply', 0):6d} "
+              f"{s.get('crc', 0):5d} {s.get('short', 0):5d} {s.get('collision', 0):5d} "
+              f"{s.get('interleaved', 0):5d} {s.get('exception', 0):5d} "
+              f"{fmt(lat['mean'])} {fmt(lat['p95'])} {fmt(lat['max'])} {fmt(turn['mean'])}")
+    if report['anomalies']:
+        print(f"\nAnomalies ({report['anomaly_count']}, first {len(report['anomalies'])}):")
+        for a in report['anomalies']:
+            print(f"  {a['time']}  bus {a['bus']} slave {a['slave']}: {a['anomaly']} {a['detail']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RS-485 frame capture decoder and passive sniffer")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('decode', help="Reconstruct transactions and report per-slave statistics")
+    p.add_argument('files', nargs='+', help="Capture files, oldest first (e.g. bus_capture.bin.1 bus_capture.bin)")
+    p.add_argument('--slave', type=int, help="Only this slave address")
+    p.add_argument('--anomalies', type=int, default=20, help="Anomalies listed in detail")
+    p.add_argument('--json', action='store_true')
+
+    p = sub.add_parser('sniff', help="Capture the chain passively from a listen-only adapter")
+    p.add_argument('port')
+    p.add_argument('--baudrate', type=int, required=True)
+    p.add_argument('--parity', default='N', choices=['N', 'E', 'O'])
+    p.add_argument('--stopbits', type=int, default=1)
+    p.add_argument('-o', '--output', default='sniff.bin')
+    p.add_argument('--duration', type=float, help="Seconds (default: until Ctrl+C)")
+    p.add_argument('--gap', type=float, help="Inter-frame silence in seconds (default: 3.5 characters)")
+
+    args = parser.parse_args()
+
+    if args.command == 'sniff':
+        print(f"Listening on {args.port} @ {args.baudrate} {args.parity} -> {args.output} (Ctrl+C to stop)")
+        try:
+            stats = sniff(args.port, args.baudrate, args.parity, args.stopbits, args.output,
+                          args.duration, args.gap)
+        except RuntimeError as e:
+            print(f"✗ {e}")
+            sys.exit(1)
+        print(f"✓ {stats['frames']} frames captured")
+        return
+
+    decoder = Decoder(slave=args.slave, max_anomalies=args.anomalies)
+    try:
+        for record in read_capture(args.files):
+            decoder.feed(*record)
+    except (OSError, ValueError) as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    report = decoder.report()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
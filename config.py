@@ -1,42 +1,228 @@
 """
 Configuration for RaspCoolingTower system with 3 GALT G540 VFDs
+
+These are the defaults; sections can be overridden (and most reloaded
+live) from the TOML file in CONFIG_FILE, see live_config.py.
 """
 
+import os
+
 # VFD Configuration (GALT G540)
 VFD_CONFIG = {
     'fan': {
         'device_id': 3,
         'description': 'Cooling Tower Fan Motor',
-        'type': 'fan'
+        'bus': 'bus0',
+        'type': 'fan',
+        'rated_power_kw': 5.5      # kW motor rating; output power (0x3006) is % of this
     },
     'pump_primary': {
         'device_id': 1,
         'description': 'Primary Pump Motor',
-        'type': 'pump'
+        'bus': 'bus0',
+        'type': 'pump',
+        'rated_power_kw': 7.5
     },
     'pump_backup': {
         'device_id': 2,
         'description': 'Backup Pump Motor',
-        'type': 'pump'
+        'bus': 'bus0',
+        'type': 'pump',
+        'rated_power_kw': 7.5
     }
 }
 
 # Serial Port Configuration (GALT G540 Actual Settings)
-SERIAL_PORT = '/dev/ttyUSB0'  # USB-RS485 adapter (auto-detected)
+SERIAL_PORT = os.environ.get('COOLING_TOWER_SERIAL_PORT', '/dev/ttyUSB0')  # USB-RS485 adapter (auto-detected)
 SERIAL_BAUDRATE = 9600         # Found via scanner (P14.01=3)
 SERIAL_PARITY = 'N'            # No parity (P14.02=0)
 SERIAL_STOPBITS = 1
 SERIAL_BYTESIZE = 8
 
+# RS-485 buses; each bus is polled by its own worker thread
+SERIAL_BUSES = {
+    'bus0': {
+        'port': SERIAL_PORT,
+        'baudrate': SERIAL_BAUDRATE,
+        'parity': SERIAL_PARITY,
+        'stopbits': SERIAL_STOPBITS,
+        'bytesize': SERIAL_BYTESIZE,
+    },
+    # 'bus1': {'port': '/dev/ttyUSB1', 'baudrate': 9600, 'parity': 'N',
+    #          'stopbits': 1, 'bytesize': 8},
+}
+
+# Towers (cells) and their drives. Each VFD gives 'bus' + 'device_id'
+# or an 'address' of the form 'bus/slave'. Drives are named '<tower>.<role>'.
+TOWERS = {
+    'tower1': {
+        'description': 'Cooling Tower Cell 1',
+        'vfds': VFD_CONFIG,
+    },
+    # 'tower2': {
+    #     'description': 'Cooling Tower Cell 2',
+    #     'vfds': {
+    #         'fan': {'address': 'bus1/3', 'description': 'Cell 2 Fan', 'type': 'fan',
+    #                 'rated_power_kw': 5.5},
+    #         'pump_primary': {'address': 'bus1/1', 'description': 'Cell 2 Primary Pump',
+    #                          'type': 'pump', 'rated_power_kw': 7.5},
+    #         'pump_backup': {'address': 'bus1/2', 'description': 'Cell 2 Backup Pump',
+    #                         'type': 'pump', 'rated_power_kw': 7.5},
+    #     },
+    # },
+}
+
+# Tower run by the closed-loop controller in this process
+CONTROL_TOWER = 'tower1'
+
+# Control daemon IPC (the daemon owns the hardware; web workers only read state)
+CONTROL_DAEMON = {
+    'socket_path': '/tmp/cooling_tower.sock',         # Unix socket for commands
+    'state_path': '/dev/shm/cooling_tower_state',     # shared memory state snapshot
+    'state_size': 1024 * 1024,     # bytes mapped for the snapshot
+    'publish_interval': 0.5,       # seconds between state snapshots
+    'command_timeout': 10.0,       # seconds a web request waits for a command reply
+    'stale_after': 5.0,            # seconds before the web side reports the daemon down
+}
+
+# Hardware bring-up (serial adapters and sensors are attached in the background)
+HARDWARE = {
+    'retry_interval': 2.0,         # seconds between bring-up / USB hotplug checks
+}
+
+# TOML overrides, checked for changes between control cycles
+CONFIG_FILE = os.environ.get('COOLING_TOWER_CONFIG', 'config.toml')
+CONFIG_RELOAD = {
+    'enabled': True,
+    'check_interval': 5.0,         # seconds between file change checks
+}
+
+# Shadow Register Cache (reads within max age are served from memory)
+REGISTER_CACHE = {
+    'enabled': True,
+    'default_max_age': 0.0,        # seconds; 0 = always read the drive
+    'policies': [                  # (first, last, max age s), first match wins
+        (0x0000, 0x1FFF, 3600.0),  # P00-P31 function-code parameters (static)
+        (0x2000, 0x2001, 0.0),     # control command / set frequency
+        (0x2103, 0x2103, 3600.0),  # identification code
+        (0x2100, 0x2102, 0.5),     # state words 1/2, fault code
+        (0x3000, 0x30FF, 0.5),     # monitoring values (frequency, current, power...)
+    ],
+}
+
+# Adaptive Bus Polling (dashboard status polling outside the control loop)
+ADAPTIVE_POLLING = {
+    'enabled': True,
+    'blocks': [(0x2100, 3), (0x3000, 7)],  # (start register, count) per drive
+    'min_interval': 1.0,           # seconds, for blocks that change every poll
+    'max_interval': 10.0,          # seconds, for blocks that never change
+    'bus_budget': 0.3,             # fraction of bus time polling may use
+    'deadbands': {                 # raw counts a register may move and count as unchanged
+        0x3000: 5,                 # running frequency (0.05 Hz)
+        0x3002: 10,                # bus voltage (1 V)
+        0x3004: 2,                 # output current (0.2 A)
+        0x3006: 5,                 # output power (0.5 %)
+    },
+    'smoothing': 0.2,              # weight of the newest sample in the change rate
+}
+
+# Modbus TCP Gateway (serves cached drive registers to plant SCADA)
+MODBUS_GATEWAY = {
+    'enabled': False,
+    'host': '0.0.0.0',
+    'port': 5020,                  # 502 needs root
+    'unit_map': {                  # TCP unit id -> drive name or 'bus/slave'
+        1: 'tower1.pump_primary',
+        2: 'tower1.pump_backup',
+        3: 'tower1.fan',
+    },
+    'poll_blocks': [(0x2100, 3), (0x3000, 8)],  # (start, count) kept fresh per drive
+    'poll_interval': 2.0,          # seconds between gateway poll rounds
+    'max_age': 30.0,               # seconds before cached values count as stale
+    'writable': [(0x2000, 0x2001)],  # register ranges SCADA may write (control, freq)
+    'write_timeout': 5.0,          # seconds a client waits for a queued write
+    'queue_size': 32,              # queued writes before clients get 'busy'
+}
+
 # Control Parameters
 CONTROL_PARAMS = {
     'target_pressure': 15.0,     # psi
     'pressure_tolerance': 2.0,   # psi
-    'kp': 1.0,                   # Proportional gain
+    'kp': 1.0,                   # Proportional gain (Hz per psi)
+    'ki': 0.0,                   # Integral gain (Hz per psi per second; 0 = P only)
     'min_frequency': 20.0,       # Hz
     'max_frequency': 60.0,       # Hz
 }
 
+# Emergency stop (broadcast stop frame, then per-drive verification)
+ESTOP = {
+    'command': 0x0006,             # 0x0006 coast (free) stop, 0x0005 ramp stop
+    'repeats': 2,                  # broadcast frames per bus (not acknowledged)
+    'deadline': 3.0,               # seconds to stop and confirm every drive
+    'read_timeout': 0.25,          # seconds per verification read / addressed stop
+}
+
+# Start / stop sequences (sequencer.py). A step fires once the steps it
+# comes 'after' are done and is done when all its drives meet 'until'
+# (state 'running' / 'stopped', min_frequency / max_frequency in Hz);
+# steps without a dependency between them ramp at the same time.
+# Drives: 'fan', 'lead_pump', 'pump_primary', 'pump_backup'
+SEQUENCES = {
+    'poll_interval': 0.2,          # seconds between state word polls
+    'command_timeout': 90.0,       # seconds the web front-end waits for start / stop
+    'start': [
+        {'step': 'fan', 'action': 'start_fan', 'drives': ['fan'],
+         'until': {'state': 'running', 'min_frequency': 20.0}, 'timeout': 20.0},
+        {'step': 'pump', 'action': 'start_pump', 'drives': ['lead_pump'],
+         'until': {'state': 'running'}, 'timeout': 10.0},
+    ],
+    'stop': [
+        {'step': 'pumps', 'action': 'stop_pumps', 'drives': ['pump_primary', 'pump_backup'],
+         'until': {'state': 'stopped'}, 'timeout': 30.0},
+        {'step': 'fan', 'action': 'stop_fan', 'drives': ['fan'],
+         'until': {'state': 'stopped'}, 'timeout': 60.0},
+    ],
+}
+
+# Relay-feedback autotune of the pressure loop (pressure_autotune.py)
+AUTOTUNE = {
+    'relay_amplitude': 5.0,        # Hz above / below the pump frequency at the start
+    'hysteresis': 0.3,             # psi relay switching band (above sensor noise)
+    'max_deviation': 8.0,          # psi from target before the test is aborted
+    'cycles': 4,                   # settled oscillation cycles averaged
+    'max_cycles': 12,              # abort if not settled after this many
+    'max_duration': 600.0,         # seconds
+    'rule': 'tyreus_luyben',       # 'tyreus_luyben', 'ziegler_nichols' or 'p_only'
+    'max_kp': 10.0,                # limits on the gains applied
+    'max_ki': 2.0,
+    'apply': True,                 # apply the recommended gains (False: report only)
+}
+
+# Fan Temperature Control (PI loop on basin water temperature)
+FAN_CONTROL = {
+    'enabled': True,
+    'temperature_setpoint': 85.0,  # °F basin water temperature
+    'kp': 0.04,                    # airflow fraction per °F
+    'ki': 0.0005,                  # airflow fraction per °F per second
+    'deadband': 0.5,               # °F around setpoint treated as on target
+    'min_frequency': 25.0,         # Hz, minimum fan speed
+    'max_frequency': 60.0,         # Hz
+    'rated_frequency': 60.0,       # Hz at 100% airflow
+    'rate_limit': 0.5,             # Hz/s maximum speed change
+    'trim_rate': 0.05,             # Hz/s downward trim while on target
+    'update_interval': 5.0,        # seconds between fan updates
+    'start_frequency': 45.0,       # Hz when the fan is started
+}
+
+# Control Scheduler (fixed-rate control loop + telemetry lane)
+CONTROL_SCHEDULER = {
+    'control_period': 1.0,         # seconds between pressure control cycles
+    'deadline_tolerance': 0.1,     # fraction of period a cycle may start late
+    'telemetry_rate': 2.0,         # max telemetry tasks started per second
+    'telemetry_max_overdue': 5.0,  # seconds past due before a task runs without slack
+    'vfd_status_interval': 5.0,    # seconds between status polls of each VFD
+}
+
 # Pump Failover Configuration
 PUMP_FAILOVER = {
     'health_check_interval': 5.0,  # seconds
@@ -44,6 +230,48 @@ PUMP_FAILOVER = {
     'auto_failover_enabled': True
 }
 
+# Pump Lead/Lag Rotation (balances run hours between the two pumps)
+PUMP_ROTATION = {
+    'enabled': True,
+    'rotation_hours': 168.0,       # lead run hours before handing over (weekly)
+    'handover_ramp_time': 10.0,    # seconds per ramp (incoming up, then outgoing down)
+    'runtime_file': 'pump_runtime.json',  # persisted run-hour counters
+    'save_interval': 300.0,        # seconds between run-hour saves
+}
+
+# Parallel Pump Staging (lag pump joins the lead on sustained high demand)
+PUMP_STAGING = {
+    'enabled': True,
+    'stage_frequency': 59.0,       # Hz, lead at/above this calls for the lag pump
+    'stage_delay': 60.0,           # seconds of sustained demand before staging
+    'destage_frequency': 35.0,     # Hz, parallel speed at/below this drops the lag pump
+    'destage_delay': 120.0,        # seconds of low demand before destaging
+    'stage_ramp_time': 10.0,       # seconds to ramp the lag pump in or out
+}
+
+# Predictive Pump Health (score 0-100, fails over before the drive trips)
+PUMP_HEALTH = {
+    'enabled': True,
+    'rated_current': 10.0,         # A, pump motor nameplate current
+    'current_warn_ratio': 0.9,     # penalize above 90% of rated current
+    'current_slope_limit': 0.5,    # A/min rise that costs the full trend penalty
+    'trend_window': 300.0,         # seconds of current samples for the trend
+    'latency_nominal': 0.2,        # s, normal Modbus transaction time
+    'latency_limit': 0.6,          # s, transaction time for the full penalty
+    'failover_score': 50.0,        # degrade below this score...
+    'recover_score': 75.0,         # ...and recover only above this one
+    'trip_samples': 3,             # consecutive low samples before degrading
+    'recover_time': 300.0,         # seconds above recover_score before recovery
+}
+
+# Energy Metering (trapezoidal kWh integration of VFD output power)
+ENERGY_METER = {
+    'enabled': True,
+    'data_file': 'energy_totals.json',  # persisted daily/monthly totals
+    'save_interval': 300.0,        # seconds between saves
+    'max_gap': 120.0,              # seconds; longer sample gaps are not integrated
+}
+
 # Sensor Configuration (ADS1115)
 SENSOR_CONFIG = {
     'i2c_address': 0x48,          # Default ADS1115 address
@@ -55,3 +283,91 @@ SENSOR_CONFIG = {
 # Logging
 LOG_FILE = 'cooling_tower.log'
 LOG_LEVEL = 'INFO'
+
+# Drive Alarms (fault code / state word 2 decoding)
+ALARMS = {
+    'enabled': True,
+    'raise_delay': 3.0,            # seconds a condition must persist before it alarms
+    'clear_delay': 10.0,           # seconds a condition must be gone before it clears
+    'history_size': 500,           # alarms kept in memory
+    'long_poll_timeout': 25.0,     # seconds a dashboard alarm request may wait for a change
+}
+
+# Automatic Fault Reset / Restart (per fault class retry policies)
+FAULT_RECOVERY = {
+    'enabled': True,
+    'verify_timeout': 5.0,         # seconds for a reset/restart to show in state word 1
+    'lockout_poll': 10.0,          # seconds between reads of a locked-out drive
+    'policies': {                  # max_attempts within window (s), delay (s) before each reset
+        'overvoltage':  {'max_attempts': 3, 'delay': 5.0, 'window': 3600.0},
+        'undervoltage': {'max_attempts': 3, 'delay': 10.0, 'window': 3600.0},
+        'overcurrent':  {'max_attempts': 2, 'delay': 10.0, 'window': 3600.0},
+        'comm':         {'max_attempts': 3, 'delay': 2.0, 'window': 600.0},
+        'overload':     {'max_attempts': 1, 'delay': 120.0, 'window': 3600.0},
+        'thermal':      {'max_attempts': 1, 'delay': 300.0, 'window': 3600.0},
+        'external':     {'max_attempts': 0},
+        'default':      {'max_attempts': 0},  # hardware faults need an operator
+    },
+}
+
+# Structured event / trace log (NDJSON, written off the control thread)
+EVENT_LOG = {
+    'enabled': True,
+    'path': 'events.ndjson',
+    'max_bytes': 5 * 1024 * 1024,  # rotate at 5 MB
+    'backups': 5,                  # rotated files kept
+    'queue_size': 1000,            # records buffered before dropping
+    'flush_interval': 2.0,         # seconds
+    'summary_interval': 60.0,      # seconds between text status lines
+}
+
+# Control traffic capture for replay.py (sensor samples, mode changes and
+# the control tower's Modbus reads / writes; off by default, ~20 MB/day)
+CAPTURE = {
+    'enabled': False,
+    'path': 'capture.ndjson',
+    'max_bytes': 50 * 1024 * 1024, # rotate at 50 MB
+    'backups': 20,                 # rotated files kept
+    'queue_size': 5000,            # records buffered before dropping
+    'flush_interval': 2.0,         # seconds
+}
+
+# Raw RS-485 frame capture (bus_capture.py; decode offline for timing / CRC problems)
+BUS_CAPTURE = {
+    'enabled': False,
+    'path': 'bus_capture.bin',
+    'ring_size': 1024 * 1024,      # bytes of frames buffered in memory (oldest overwritten)
+    'max_bytes': 20 * 1024 * 1024, # rotate at 20 MB
+    'backups': 5,                  # rotated files kept
+    'flush_interval': 1.0,         # seconds between writes to disk
+}
+
+# Plant simulator (plant_simulator.py; offline testing of control settings)
+SIMULATOR = {
+    'rated_frequency': 60.0,       # Hz, pump and fan motors
+    'rated_voltage': 460.0,        # V at rated frequency
+    'accel_rate': 6.0,             # Hz/s drive ramp
+    'shutoff_pressure': 40.0,      # psi, pump shut-off pressure at rated speed
+    'pump_curve_k': 0.000375,      # psi per gpm^2, pump curve droop
+    'static_pressure': 5.0,        # psi, static head of the system
+    'system_resistance': 0.0005,   # psi per gpm^2, system curve at average demand
+    'demand_swing': 0.3,           # fraction the system resistance swings over a day
+    'pipe_time_constant': 3.0,     # seconds, pressure response lag
+    'pressure_noise': 0.1,         # psi, sensor noise (1 sigma)
+    'pump_rated_current': 10.0,    # A
+    'pump_load': 0.85,             # output power fraction at rated speed
+    'fan_rated_current': 8.0,      # A
+    'fan_load': 0.9,
+    'wet_bulb': 72.0,              # °F, daily average
+    'wet_bulb_swing': 6.0,         # °F, daily swing (peak mid-afternoon)
+    'approach': 6.0,               # °F above wet bulb at full airflow and average load
+    'load_swing': 0.3,             # fraction the heat load swings over a day
+    'natural_draft': 0.1,          # airflow fraction with the fan stopped
+    'thermal_time_constant': 900.0,  # seconds, basin temperature response
+    'initial_temperature': 85.0,   # °F
+    'temperature_noise': 0.05,     # °F, sensor noise (1 sigma)
+    'start_hour': 6.0,             # time of day the simulation starts
+    'trip_rate': 0.0,              # random trips per running drive per hour
+    'random_faults': [4, 5, 6, 7, 8, 9, 11],  # fault codes for random trips (OC1-3, OV1-3, OL1)
+    'latency': 0.2,                # s, reported Modbus transaction time
+}
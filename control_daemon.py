@@ -0,0 +1,802 @@
+#!/usr/bin/env python3
+"""
+Cooling tower control daemon
+
+Owns the RS-485 buses and the sensors: runs the control loop, the bus
+pollers and the Modbus TCP gateway, publishes its state to shared memory
+and executes commands from the web front-ends over a Unix socket (see
+control_ipc.py). Web workers never touch the hardware, so they can run as
+several WSGI processes and be restarted without disturbing control.
+
+    python3 control_daemon.py        # then start web_dashboard.py
+"""
+
+import signal
+import threading
+import time
+import logging
+from datetime import datetime
+from vfd_controller import MultiVFDManager, RegisterCachePolicy
+from sensor_manager import SensorManager
+from pump_failover import PumpFailoverManager
+from pump_health import PumpHealthMonitor
+from fan_control import FanController
+from energy_meter import EnergyMeter
+from alarm_manager import AlarmManager
+from fault_recovery import FaultRecovery
+from live_config import ConfigManager, apply_sections
+from modbus_gateway import ModbusGateway
+from control_scheduler import ControlScheduler
+from pressure_control import BIAS_FREQUENCY, PressureController
+from pressure_autotune import RelayAutotuner, AutotuneAborted
+from sequencer import Sequencer, SequenceError
+from event_log import EventLog
+from bus_capture import BusCapture
+from control_ipc import StatePublisher, CommandServer
+from hardware_monitor import HardwareMonitor
+from config import *
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CoolingTowerSystem:
+    def __init__(self):
+        # Apply config file overrides before anything reads the config
+        self.config = ConfigManager(CONFIG_FILE, on_reload=self.apply_config)
+        self.config.load()
+        self._reload_requested = False
+        
+        self.running = False
+        self.auto_mode = False
+        self.system_state = {
+            'timestamp': None,
+            'sensors': {'pressure_psi': 0, 'temperature_f': 0},
+            'fan': {'state': 'Unknown', 'frequency': 0, 'current': 0, 'voltage': 0, 'fault': 0},
+            'pump_primary': {'state': 'Unknown', 'frequency': 0, 'current': 0, 'voltage': 0, 'fault': 0},
+            'pump_backup': {'state': 'Unknown', 'frequency': 0, 'current': 0, 'voltage': 0, 'fault': 0},
+            'active_pump': 'primary',
+            'pump_health': {},
+            'pump_run_hours': {},
+            'pump_staged': None,
+            'control_params': CONTROL_PARAMS.copy(),
+            'fan_control': {'setpoint': FAN_CONTROL['temperature_setpoint']},
+            'autotune': None,
+            'estop': None,
+            'sequence': None,
+            'scheduler': None,
+            'energy': {},
+            'drives': {},
+            'alarms': {},
+            'recovery': {},
+            'hardware': {},
+            'errors': []
+        }
+        self.gateway = None
+        self.recovery = None
+        self.alarms = None
+        if ALARMS['enabled']:
+            self.alarms = AlarmManager(
+                raise_delay=ALARMS['raise_delay'],
+                clear_delay=ALARMS['clear_delay'],
+                history_size=ALARMS['history_size']
+            )
+        self.energy = None
+        if ENERGY_METER['enabled']:
+            self.energy = EnergyMeter(
+                {name: cfg['rated_power_kw'] for name, cfg in TOWERS[CONTROL_TOWER]['vfds'].items()},
+                data_file=ENERGY_METER['data_file'],
+                save_interval=ENERGY_METER['save_interval'],
+                max_gap=ENERGY_METER['max_gap']
+            )
+        self.capture = None
+        if CAPTURE['enabled']:
+            self.capture = EventLog(
+                CAPTURE['path'],
+                max_bytes=CAPTURE['max_bytes'],
+                backups=CAPTURE['backups'],
+                queue_size=CAPTURE['queue_size'],
+                flush_interval=CAPTURE['flush_interval']
+            )
+        self.pressure_control = PressureController()
+        self.autotune = None
+        self.scheduler = None
+        self.sensors = None
+        self.hardware = None
+        self.bus_capture = None
+        
+        # Initialize drive objects (no I/O here, so startup never waits for hardware)
+        try:
+            cache_policy = None
+            if REGISTER_CACHE['enabled']:
+                cache_policy = RegisterCachePolicy(REGISTER_CACHE['policies'], REGISTER_CACHE['default_max_age'])
+            self.vfd_manager = MultiVFDManager.from_config(SERIAL_BUSES, TOWERS, cache_policy=cache_policy)
+            if self.capture:
+                self.vfd_manager.set_recorder(self.capture.record, tower=CONTROL_TOWER)
+            if BUS_CAPTURE['enabled']:
+                self.bus_capture = BusCapture(
+                    BUS_CAPTURE['path'],
+                    SERIAL_BUSES,
+                    ring_size=BUS_CAPTURE['ring_size'],
+                    max_bytes=BUS_CAPTURE['max_bytes'],
+                    backups=BUS_CAPTURE['backups'],
+                    flush_interval=BUS_CAPTURE['flush_interval']
+                )
+                self.vfd_manager.set_bus_capture(self.bus_capture)
+            
+            vfds = self.vfd_manager.get_tower(CONTROL_TOWER)
+            self.fan_vfd = vfds['fan']
+            pump_primary = vfds['pump_primary']
+            pump_backup = vfds['pump_backup']
+            
+            self.fan_control = FanController(
+                setpoint=FAN_CONTROL['temperature_setpoint'],
+                kp=FAN_CONTROL['kp'],
+                ki=FAN_CONTROL['ki'],
+                deadband=FAN_CONTROL['deadband'],
+                min_frequency=FAN_CONTROL['min_frequency'],
+                max_frequency=FAN_CONTROL['max_frequency'],
+                rated_frequency=FAN_CONTROL['rated_frequency'],
+                rate_limit=FAN_CONTROL['rate_limit'],
+                trim_rate=FAN_CONTROL['trim_rate'],
+                update_interval=FAN_CONTROL['update_interval'],
+                start_frequency=FAN_CONTROL['start_frequency']
+            )
+            
+            health_monitor = None
+            if PUMP_HEALTH['enabled']:
+                health_monitor = PumpHealthMonitor(
+                    rated_current=PUMP_HEALTH['rated_current'],
+                    current_warn_ratio=PUMP_HEALTH['current_warn_ratio'],
+                    current_slope_limit=PUMP_HEALTH['current_slope_limit'],
+                    trend_window=PUMP_HEALTH['trend_window'],
+                    latency_nominal=PUMP_HEALTH['latency_nominal'],
+                    latency_limit=PUMP_HEALTH['latency_limit'],
+                    failover_score=PUMP_HEALTH['failover_score'],
+                    recover_score=PUMP_HEALTH['recover_score'],
+                    trip_samples=PUMP_HEALTH['trip_samples'],
+                    recover_time=PUMP_HEALTH['recover_time']
+                )
+            
+            self.pump_manager = PumpFailoverManager(
+                pump_primary,
+                pump_backup,
+                max_errors=PUMP_FAILOVER['max_consecutive_errors'],
+                check_interval=PUMP_FAILOVER['health_check_interval'],
+                health_monitor=health_monitor,
+                rotation_hours=PUMP_ROTATION['rotation_hours'] if PUMP_ROTATION['enabled'] else None,
+                handover_ramp_time=PUMP_ROTATION['handover_ramp_time'],
+                min_frequency=CONTROL_PARAMS['min_frequency'],
+                runtime_file=PUMP_ROTATION['runtime_file'],
+                save_interval=PUMP_ROTATION['save_interval'],
+                stage_frequency=PUMP_STAGING['stage_frequency'] if PUMP_STAGING['enabled'] else None,
+                stage_delay=PUMP_STAGING['stage_delay'],
+                destage_frequency=PUMP_STAGING['destage_frequency'],
+                destage_delay=PUMP_STAGING['destage_delay'],
+                stage_ramp_time=PUMP_STAGING['stage_ramp_time']
+            )
+            
+            if FAULT_RECOVERY['enabled']:
+                self.recovery = FaultRecovery(
+                    {'fan': self.fan_vfd, 'pump_primary': pump_primary, 'pump_backup': pump_backup},
+                    FAULT_RECOVERY['policies'],
+                    verify_timeout=FAULT_RECOVERY['verify_timeout'],
+                    lockout_poll=FAULT_RECOVERY['lockout_poll'],
+                    on_escalate=self.on_fault_escalated,
+                    on_recovered=self.on_fault_recovered,
+                    should_restart=self.should_restart
+                )
+            
+            # Ports and sensors are opened in the background as they appear
+            self.hardware = HardwareMonitor(
+                self.vfd_manager,
+                lambda: SensorManager(i2c_address=SENSOR_CONFIG['i2c_address'], gain=SENSOR_CONFIG['ads_gain']),
+                interval=HARDWARE['retry_interval'],
+                on_change=self.on_hardware_change
+            )
+            
+        except Exception as e:
+            logger.error(f"Hardware initialization failed: {e}")
+            self.system_state['errors'].append(str(e))
+    
+    def on_hardware_change(self, status):
+        """A bus or the sensors attached or detached"""
+        self.sensors = self.hardware.sensors
+        self.system_state['hardware'] = status
+        self.system_state['errors'] = self.hardware.errors()
+    
+    def update_sensors(self):
+        """Update sensor readings only (fast ~0.02s)"""
+        if self.sensors is None:
+            return  # Not attached yet
+        try:
+            sensor_data = self.sensors.read_all()
+            self.system_state['sensors'] = sensor_data
+            self.system_state['timestamp'] = datetime.now().isoformat()
+            if self.capture:
+                self.capture.record('sensors', **sensor_data)
+        except Exception as e:
+            logger.error(f"Sensor update error: {e}")
+    
+    def start_capture(self):
+        """Open the replay capture, headed by the settings replay needs"""
+        self.capture.start()
+        self.capture.record('capture', version=1, tower=CONTROL_TOWER,
+                            control_period=CONTROL_SCHEDULER['control_period'],
+                            vfd_status_interval=CONTROL_SCHEDULER['vfd_status_interval'])
+        self.record_mode()
+    
+    def record_mode(self):
+        """Capture operator state (running, auto, settings) for replay"""
+        if self.capture:
+            autotune = self.autotune.center if self.autotune and not self.autotune.done else None
+            self.capture.record('mode', running=self.running, auto=self.auto_mode,
+                                control_params=dict(self.system_state['control_params']),
+                                fan_setpoint=self.fan_control.setpoint, autotune=autotune)
+    
+    def apply_settings(self, data):
+        """Operator (or autotune) changes to the loop settings; returns the control params"""
+        params = self.system_state['control_params']
+        for key in ('target_pressure', 'kp', 'ki', 'min_frequency', 'max_frequency'):
+            if key in data:
+                params[key] = float(data[key])
+        if 'temperature_setpoint' in data:
+            self.fan_control.setpoint = float(data['temperature_setpoint'])
+            self.system_state['fan_control'] = self.fan_control.get_status()
+        self.record_mode()
+        return params
+    
+    def _vfd_state(self, vfd, status=None):
+        status = status or vfd.get_status()
+        return {
+            'state': status['state'],
+            'frequency': status['output_frequency'],
+            'current': status['output_current'],
+            'voltage': status['output_voltage'],
+            'fault': status['fault_code']
+        }
+    
+    def _observe_alarms(self, name, status):
+        if self.alarms:
+            self.alarms.observe(name, status)
+            self.system_state['alarms'] = self.alarms.get_status()
+    
+    def _record_energy(self, name, status):
+        if self.energy:
+            self.energy.record(name, status)
+            self.system_state['energy'] = self.energy.get_status()
+    
+    def update_fan(self, status=None):
+        """Update fan VFD status"""
+        status = status or self.fan_vfd.get_status()
+        self._observe_alarms(f"{CONTROL_TOWER}.fan", status)
+        if self.recovery:
+            self.recovery.observe('fan', status)
+        self._record_energy('fan', status)
+        self.system_state['fan'] = self._vfd_state(self.fan_vfd, status)
+    
+    def update_pump(self, name, status=None):
+        """Update one pump VFD status ('pump_primary' or 'pump_backup')"""
+        vfd = self.pump_manager.primary if name == 'pump_primary' else self.pump_manager.backup
+        status = status or vfd.get_status()
+        self.pump_manager.observe(vfd, status)
+        self._observe_alarms(f"{CONTROL_TOWER}.{name}", status)
+        if self.recovery:
+            self.recovery.observe(name, status)
+        self._record_energy(name, status)
+        self.system_state[name] = self._vfd_state(vfd, status)
+        self.system_state['active_pump'] = self.pump_manager.active_pump.value
+        self.system_state['pump_staged'] = self.pump_manager.staged['phase'] if self.pump_manager.staged else None
+        self.system_state['pump_run_hours'] = {
+            name: round(hours, 1) for name, hours in self.pump_manager.run_hours.items()
+        }
+        if self.pump_manager.health_monitor:
+            self.system_state['pump_health'] = self.pump_manager.health_monitor.get_status()
+    
+    def on_fault_escalated(self, name, vfd, fault_code):
+        """Fault recovery gave up on a drive: take a pump out of service"""
+        if name.startswith('pump_'):
+            self.pump_manager.pump_failed(vfd)
+            self.system_state['active_pump'] = self.pump_manager.active_pump.value
+    
+    def on_fault_recovered(self, name, vfd):
+        if name.startswith('pump_'):
+            self.pump_manager.pump_restored(vfd)
+    
+    def should_restart(self, name, vfd):
+        """Restart a reset drive only if it is still meant to run (a pump may have been failed over)"""
+        if name.startswith('pump_'):
+            return self.pump_manager.needs_running(vfd)
+        return self.running
+    
+    def update_recovery(self):
+        self.recovery.update()
+        self.system_state['recovery'] = self.recovery.get_status()
+    
+    def reload_config(self):
+        """Check the config file (scheduler lane while running, so between cycles)"""
+        force, self._reload_requested = self._reload_requested, False
+        self.config.load(force=force)
+    
+    def apply_config(self, sections):
+        """Push reloaded config sections into the running objects"""
+        apply_sections(sections, fan_control=getattr(self, 'fan_control', None),
+                       pump_manager=getattr(self, 'pump_manager', None), alarms=self.alarms,
+                       recovery=self.recovery, vfd_manager=getattr(self, 'vfd_manager', None))
+        if 'CONTROL_PARAMS' in sections:
+            self.system_state['control_params'] = CONTROL_PARAMS.copy()
+        if 'FAN_CONTROL' in sections and hasattr(self, 'fan_control'):
+            self.system_state['fan_control'] = self.fan_control.get_status()
+        if getattr(self, 'capture', None) and ('CONTROL_PARAMS' in sections or 'FAN_CONTROL' in sections):
+            self.record_mode()
+    
+    def start_gateway(self):
+        """Start the Modbus TCP gateway for SCADA"""
+        self.gateway = ModbusGateway(
+            self.vfd_manager,
+            MODBUS_GATEWAY['unit_map'],
+            host=MODBUS_GATEWAY['host'],
+            port=MODBUS_GATEWAY['port'],
+            poll_blocks=MODBUS_GATEWAY['poll_blocks'],
+            poll_interval=MODBUS_GATEWAY['poll_interval'],
+            max_age=MODBUS_GATEWAY['max_age'],
+            writable=MODBUS_GATEWAY['writable'],
+            write_timeout=MODBUS_GATEWAY['write_timeout'],
+            queue_size=MODBUS_GATEWAY['queue_size']
+        )
+        self.gateway.start()
+    
+    def on_drive_status(self, name, status):
+        """Bus poller callback: store status of any drive ('<tower>.<role>')"""
+        tower, _, role = name.partition('.')
+        vfd = self.vfd_manager.get_vfd(name)
+        self.system_state['drives'][name] = dict(self._vfd_state(vfd, status), address=vfd.address,
+                                                cache=vfd.get_cache_stats())
+        
+        if tower == CONTROL_TOWER:
+            if role == 'fan':
+                self.update_fan(status)
+            elif role in ('pump_primary', 'pump_backup'):
+                self.update_pump(role, status)
+        else:
+            self._observe_alarms(name, status)
+    
+    def is_scheduler_drive(self, name):
+        """Control tower drives are polled by the control scheduler while running"""
+        return self.running and name.startswith(CONTROL_TOWER + '.')
+    
+    def update_vfds(self):
+        """Update VFD status (slow ~30s)"""
+        try:
+            self.update_fan()
+            self.update_pump('pump_primary')
+            self.update_pump('pump_backup')
+        except Exception as e:
+            logger.error(f"VFD update error: {e}")
+    
+    def update_state(self):
+        """Update complete system state from hardware"""
+        self.update_sensors()
+        self.update_vfds()
+    
+    def control_step(self):
+        """One control cycle: fresh sensor read, then pressure control"""
+        self.update_sensors()
+        
+        if self.auto_mode and self.sensors is not None:
+            # Automatic pressure control (relay experiment instead while autotuning)
+            pressure = self.system_state['sensors']['pressure_psi']
+            output_hz = None
+            if self.autotune and not self.autotune.done:
+                output_hz = self.autotune_step(pressure)
+            if output_hz is None:
+                output_hz = self.pressure_control.update(pressure, self.system_state['control_params'])
+            
+            self.pump_manager.set_frequency(output_hz)
+            
+            # Check pump health for failover
+            if PUMP_FAILOVER['auto_failover_enabled']:
+                self.pump_manager.check_health()
+            
+            # Fan loop on basin temperature
+            if FAN_CONTROL['enabled']:
+                fan_hz = self.fan_control.update(self.system_state['sensors']['temperature_f'])
+                if fan_hz is not None:
+                    self.fan_vfd.set_frequency(fan_hz)
+            self.system_state['fan_control'] = self.fan_control.get_status()
+        
+        self.system_state['scheduler'] = self.scheduler.get_stats()
+    
+    def start_autotune(self):
+        """Begin a relay autotune of the pressure loop on the lead pump"""
+        if not (self.running and self.auto_mode and self.sensors is not None):
+            raise RuntimeError('Autotune needs the system running in auto mode')
+        if self.autotune and not self.autotune.done:
+            raise RuntimeError('Autotune already running')
+        if self.pump_manager.handover or self.pump_manager.staged:
+            raise RuntimeError('Autotune needs a single lead pump (handover or staging in progress)')
+        params = self.system_state['control_params']
+        self.autotune = RelayAutotuner(
+            target=params['target_pressure'],
+            center=self.pump_manager.frequency or BIAS_FREQUENCY,
+            pump=self.pump_manager.active_pump.value,
+            min_frequency=params['min_frequency'],
+            max_frequency=params['max_frequency'],
+            amplitude=AUTOTUNE['relay_amplitude'],
+            hysteresis=AUTOTUNE['hysteresis'],
+            max_deviation=AUTOTUNE['max_deviation'],
+            cycles=AUTOTUNE['cycles'],
+            max_cycles=AUTOTUNE['max_cycles'],
+            max_duration=AUTOTUNE['max_duration'],
+            rule=AUTOTUNE['rule'],
+            max_kp=AUTOTUNE['max_kp'],
+            max_ki=AUTOTUNE['max_ki']
+        )
+        self.system_state['autotune'] = self.autotune.get_status()
+        self.record_mode()
+        logger.info(f"Pressure autotune started on {self.autotune.pump} pump "
+                    f"({self.autotune.low:.1f}-{self.autotune.high:.1f} Hz)")
+        return self.system_state['autotune']
+    
+    def autotune_step(self, pressure):
+        """One relay step; None once the test is over and the PI loop takes back over"""
+        if self.pump_manager.handover or self.pump_manager.staged:
+            self.autotune.cancel('Pump staging or handover started')
+            output_hz = None
+        else:
+            try:
+                output_hz = self.autotune.update(pressure, self.pump_manager.active_pump.value)
+            except AutotuneAborted:
+                output_hz = None
+        if output_hz is None:
+            self.finish_autotune()
+        self.system_state['autotune'] = self.autotune.get_status()
+        return output_hz
+    
+    def finish_autotune(self):
+        """Hand the loop back from the relay test, applying the result if configured"""
+        # Bumpless: the integral restarts from where the pump was before the test
+        self.pressure_control.reset(self.autotune.center)
+        if self.autotune.result and AUTOTUNE['apply']:
+            self.apply_settings(self.autotune.result['recommended'])
+        else:
+            self.record_mode()
+    
+    def control_loop(self):
+        """Main control loop (fixed rate, VFD polling in the slack)"""
+        self.scheduler = ControlScheduler(
+            self.control_step,
+            period=CONTROL_SCHEDULER['control_period'],
+            telemetry_rate=CONTROL_SCHEDULER['telemetry_rate'],
+            deadline_tolerance=CONTROL_SCHEDULER['deadline_tolerance'],
+            max_overdue=CONTROL_SCHEDULER['telemetry_max_overdue']
+        )
+        interval = CONTROL_SCHEDULER['vfd_status_interval']
+        self.scheduler.add_telemetry('fan', self.update_fan, interval)
+        self.scheduler.add_telemetry('pump_primary', lambda: self.update_pump('pump_primary'), interval)
+        self.scheduler.add_telemetry('pump_backup', lambda: self.update_pump('pump_backup'), interval)
+        if self.recovery:
+            self.scheduler.add_telemetry('recovery', self.update_recovery, CONTROL_SCHEDULER['control_period'])
+        if CONFIG_RELOAD['enabled']:
+            self.scheduler.add_telemetry('config', self.reload_config, CONFIG_RELOAD['check_interval'])
+        
+        if self.running:
+            self.scheduler.run()
+    
+    def run_sequence(self, name, actions):
+        """Run a start / stop sequence from SEQUENCES; raises SequenceError on failure"""
+        drives = {
+            'fan': self.fan_vfd,
+            'lead_pump': self.pump_manager.get_active_vfd(),
+            'pump_primary': self.pump_manager.primary,
+            'pump_backup': self.pump_manager.backup,
+        }
+        sequencer = Sequencer(name, SEQUENCES[name], actions, drives,
+                              poll_interval=SEQUENCES['poll_interval'])
+        try:
+            return sequencer.run()
+        finally:
+            self.system_state['sequence'] = sequencer.get_status()
+    
+    def _start_fan(self):
+        self.fan_control.reset()
+        self.fan_vfd.set_frequency(self.fan_control.frequency)
+        return self.fan_vfd.start()
+    
+    def _start_pump(self):
+        self.pressure_control.reset()
+        return self.pump_manager.start(BIAS_FREQUENCY)
+    
+    def _stop_drives(self):
+        """Orderly stop of pumps and fan, ramping down together"""
+        try:
+            self.run_sequence('stop', {'stop_pumps': self.pump_manager.stop, 'stop_fan': self.fan_vfd.stop})
+        except SequenceError as e:
+            logger.warning(f"Drives not confirmed stopped: {e}")
+    
+    def start_system(self):
+        """Start the cooling tower system (returns once the drives confirm running)"""
+        if self.running:
+            return
+        if self.hardware is None or not self.hardware.ready:
+            raise RuntimeError('Hardware not ready: ' + '; '.join(self.system_state['errors']))
+        
+        self.running = True
+        self.record_mode()
+        
+        # Fan and lead pump ramp together; each step waits for its drive's state word
+        try:
+            self.run_sequence('start', {'start_fan': self._start_fan, 'start_pump': self._start_pump})
+        except SequenceError as e:
+            self.running = False
+            self.record_mode()
+            self._stop_drives()
+            raise RuntimeError(f"Start sequence failed: {e}")
+        
+        # Start control thread
+        self.control_thread = threading.Thread(target=self.control_loop, daemon=True)
+        self.control_thread.start()
+        
+        logger.info("System started")
+    
+    def stop_system(self):
+        """Stop the cooling tower system (returns once the drives confirm stopped)"""
+        self.running = False
+        self.auto_mode = False
+        if self.autotune and not self.autotune.done:
+            self.autotune.cancel('System stopped')
+            self.system_state['autotune'] = self.autotune.get_status()
+        self.record_mode()
+        if self.scheduler:
+            self.scheduler.stop()
+        
+        control_thread = getattr(self, 'control_thread', None)
+        if control_thread:
+            control_thread.join(timeout=CONTROL_SCHEDULER['control_period'] * 2)  # Let the cycle finish
+        
+        self._stop_drives()
+        if self.energy:
+            self.energy.save()
+        
+        logger.info("System stopped")
+    
+    def emergency_stop(self):
+        """Stop every drive at once (broadcast), without the orderly stop's waits"""
+        # Take the drives away from the control loop, failover and fault recovery first
+        self.running = False
+        self.auto_mode = False
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.autotune and not self.autotune.done:
+            self.autotune.cancel('Emergency stop')
+            self.system_state['autotune'] = self.autotune.get_status()
+        if self.recovery:
+            self.recovery.cancel()
+        self.pump_manager.stop(send=False)
+        
+        result = self.vfd_manager.emergency_stop(
+            command=ESTOP['command'],
+            deadline=ESTOP['deadline'],
+            repeats=ESTOP['repeats'],
+            read_timeout=ESTOP['read_timeout']
+        )
+        result['time'] = datetime.now().isoformat()
+        self.system_state['estop'] = result
+        self.record_mode()
+        if self.energy:
+            self.energy.save()
+        return result
+
+
+class ControlDaemon:
+    """Runs CoolingTowerSystem and serves it to web front-ends over IPC"""
+
+    def __init__(self):
+        self.system = CoolingTowerSystem()
+        self.publisher = StatePublisher(
+            CONTROL_DAEMON['state_path'],
+            CONTROL_DAEMON['state_size'],
+            self.snapshot,
+            interval=CONTROL_DAEMON['publish_interval']
+        )
+        self.commands = CommandServer(CONTROL_DAEMON['socket_path'], {
+            'start': self.cmd_start,
+            'stop': self.cmd_stop,
+            'auto': self.cmd_auto,
+            'vfd_frequency': self.cmd_vfd_frequency,
+            'vfd_start': self.cmd_vfd_start,
+            'vfd_stop': self.cmd_vfd_stop,
+            'settings': self.cmd_settings,
+            'estop': self.cmd_estop,
+            'autotune_start': self.cmd_autotune_start,
+            'autotune_abort': self.cmd_autotune_abort,
+            'pump_switch': self.cmd_pump_switch,
+            'alarm_ack': self.cmd_alarm_ack,
+            'alarm_ack_all': self.cmd_alarm_ack_all,
+            'alarm_history': self.cmd_alarm_history,
+            'energy_history': self.cmd_energy_history,
+            'config_reload': self.cmd_config_reload,
+        })
+        self._stop_event = threading.Event()
+    
+    def snapshot(self):
+        """State published to the web front-ends"""
+        system = self.system
+        return {
+            'published': time.time(),
+            'running': system.running,
+            'auto_mode': system.auto_mode,
+            'state': system.system_state,
+            'alarm_version': system.alarms.version if system.alarms else None,
+            'alarms': system.alarms.active() if system.alarms else None,
+            'energy': system.energy.get_status() if system.energy else None,
+            'gateway': system.gateway.get_stats() if system.gateway else None,
+            'polling': system.vfd_manager.get_polling_stats() if hasattr(system, 'vfd_manager') else {},
+            'config': system.config.get_status(),
+            'ipc': {'publisher': self.publisher.get_stats(), 'commands': self.commands.get_stats()}
+        }
+    
+    # ==================== COMMANDS ====================
+    
+    def _vfd(self, name):
+        vfds = {'fan': self.system.fan_vfd,
+                'pump_primary': self.system.pump_manager.primary,
+                'pump_backup': self.system.pump_manager.backup}
+        if name not in vfds:
+            raise ValueError('Invalid VFD name')
+        return vfds[name]
+    
+    def cmd_start(self):
+        self.system.start_system()
+        return {'message': 'System started', 'sequence': self.system.system_state['sequence']}
+    
+    def cmd_stop(self):
+        self.system.stop_system()
+        sequence = self.system.system_state['sequence']
+        if sequence and not sequence['ok']:
+            return {'success': False, 'error': 'Stop not confirmed: ' + ', '.join(
+                f"{name} ({step['error']})" for name, step in sequence['steps'].items() if step['error']),
+                'sequence': sequence}
+        return {'message': 'System stopped', 'sequence': sequence}
+    
+    def cmd_auto(self, enabled=False):
+        system = self.system
+        if enabled and not system.auto_mode:
+            system.pressure_control.reset(system.pump_manager.frequency or BIAS_FREQUENCY)
+        if not enabled and system.autotune and not system.autotune.done:
+            system.autotune.cancel('Auto mode switched off')
+            system.finish_autotune()
+            system.system_state['autotune'] = system.autotune.get_status()
+        system.auto_mode = bool(enabled)
+        system.record_mode()
+        return {'auto_mode': self.system.auto_mode}
+    
+    def cmd_estop(self):
+        if not hasattr(self.system, 'vfd_manager'):
+            return {'success': False, 'error': 'Drives not initialized'}
+        result = self.system.emergency_stop()
+        if result['unconfirmed']:
+            return {'success': False, 'error': 'Stop not confirmed: ' + ', '.join(
+                f"{name} ({state})" for name, state in sorted(result['unconfirmed'].items())), 'estop': result}
+        return {'estop': result}
+    
+    def cmd_vfd_frequency(self, name, frequency):
+        self._vfd(name).set_frequency(float(frequency))
+    
+    def cmd_vfd_start(self, name):
+        self._vfd(name).start()
+    
+    def cmd_vfd_stop(self, name):
+        self._vfd(name).stop()
+    
+    def cmd_settings(self, **data):
+        return {'settings': self.system.apply_settings(data)}
+    
+    def cmd_autotune_start(self):
+        return {'autotune': self.system.start_autotune()}
+    
+    def cmd_autotune_abort(self):
+        system = self.system
+        if not system.autotune or system.autotune.done:
+            return {'success': False, 'error': 'No autotune running'}
+        system.autotune.cancel('Aborted by operator')
+        system.finish_autotune()
+        system.system_state['autotune'] = system.autotune.get_status()
+        return {'autotune': system.system_state['autotune']}
+    
+    def cmd_pump_switch(self):
+        if not self.system.pump_manager.switch_lead():
+            return {'success': False, 'error': 'Pump switch not possible now'}
+        self.system.system_state['active_pump'] = self.system.pump_manager.active_pump.value
+    
+    def cmd_alarm_ack(self, alarm_id, user=None):
+        if not self.system.alarms.acknowledge(alarm_id, user):
+            return {'success': False, 'error': 'Unknown or already acknowledged alarm'}
+    
+    def cmd_alarm_ack_all(self, user=None):
+        return {'acknowledged': self.system.alarms.acknowledge_all(user)}
+    
+    def cmd_alarm_history(self, drive=None, code=None, limit=100):
+        return {'alarms': self.system.alarms.query(drive=drive, code=code, limit=limit)}
+    
+    def cmd_energy_history(self):
+        energy = self.system.energy
+        return {'history': {name: energy.get_history(name) for name in energy.drives}}
+    
+    def cmd_config_reload(self):
+        """Re-read the config override file (applied between control cycles)"""
+        self.system._reload_requested = True
+        if not self.system.running:
+            self.system.reload_config()
+        return {'config': self.system.config.get_status()}
+    
+    # ==================== MAIN LOOP ====================
+    
+    def _update_thread(self):
+        """Fast sensor updates every 2 seconds (control loop owns them while running)"""
+        last_config_check = time.monotonic()
+        while not self._stop_event.is_set():
+            if not self.system.running:
+                self.system.update_sensors()
+                if (CONFIG_RELOAD['enabled'] and
+                        time.monotonic() - last_config_check >= CONFIG_RELOAD['check_interval']):
+                    last_config_check = time.monotonic()
+                    self.system.reload_config()
+            self._stop_event.wait(2.0)
+    
+    def run(self):
+        system = self.system
+        
+        # Serve (degraded) status right away; hardware attaches when it appears
+        self.publisher.start()
+        self.commands.start()
+        if system.capture and hasattr(system, 'fan_control'):
+            system.start_capture()
+        if system.bus_capture:
+            system.bus_capture.start()
+        if system.hardware:
+            system.hardware.start()
+        
+        threading.Thread(target=self._update_thread, daemon=True).start()
+        
+        # VFD status updates, one worker per bus: every 10 seconds, or adaptive by
+        # change rate within a bus budget (control tower drives are left to the
+        # control loop while it runs)
+        if hasattr(system, 'vfd_manager'):
+            adaptive = ADAPTIVE_POLLING if ADAPTIVE_POLLING['enabled'] else None
+            system.vfd_manager.start_polling(10.0, system.on_drive_status, skip=system.is_scheduler_drive,
+                                             adaptive=adaptive)
+            
+            # SCADA reads are served from cache; writes queue onto the bus
+            if MODBUS_GATEWAY['enabled']:
+                system.start_gateway()
+        
+        logger.info("Control daemon running")
+        
+        signal.signal(signal.SIGTERM, lambda signum, frame: self._stop_event.set())
+        try:
+            while not self._stop_event.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.shutdown()
+    
+    def shutdown(self):
+        """Stop serving commands, bring the drives to a safe stop"""
+        logger.info("Control daemon shutting down")
+        self._stop_event.set()
+        self.commands.stop()
+        if self.system.hardware:
+            self.system.hardware.stop()
+        if self.system.running:
+            self.system.stop_system()
+        self.publisher.publish()  # Last state (stopped) for the web front-ends
+        self.publisher.stop()
+        if self.system.capture:
+            self.system.capture.stop()
+        if self.system.bus_capture:
+            self.system.bus_capture.stop()
+
+
+if __name__ == '__main__':
+    ControlDaemon().run()
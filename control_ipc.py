@@ -0,0 +1,284 @@
+"""
+IPC between the control daemon and web front-ends
+
+The control daemon owns the serial buses and sensors. It publishes a JSON
+snapshot of its state into a memory-mapped file (on /dev/shm, i.e. shared
+memory) and takes commands over a Unix socket. Web workers map the
+snapshot read-only and send commands; they never share a process, a lock
+or the GIL with the control loop, so web load or a crashed worker cannot
+delay a control cycle.
+
+Snapshot layout: a header (sequence, payload length, crc32) followed by
+the JSON payload. The writer makes the sequence odd while it copies and
+even when done; a reader retries until it sees the same even sequence
+before and after its copy and the checksum matches (a seqlock, so the
+writer never waits for readers, however many there are).
+
+Commands are one JSON object per line, {"cmd": name, "args": {...}},
+answered with one JSON object per line.
+"""
+
+import os
+import json
+import mmap
+import time
+import zlib
+import socket
+import struct
+import logging
+import threading
+import socketserver
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('<QII')  # sequence, payload length, crc32
+
+
+class DaemonUnavailable(Exception):
+    """The control daemon's socket is missing or not answering"""
+
+
+# ==================== DAEMON SIDE ====================
+
+class StatePublisher:
+    """Writes state snapshots into the shared memory file at a fixed rate"""
+
+    def __init__(self, path, size, snapshot, interval=0.5):
+        """
+        Initialize state publisher.
+
+        Args:
+            path: Snapshot file, normally under /dev/shm
+            size: Mapped size in bytes (header + largest payload)
+            snapshot: Function returning the JSON-serializable state
+            interval: Seconds between snapshots
+        """
+        self.path = path
+        self.size = size
+        self.snapshot = snapshot
+        self.interval = interval
+
+        self.sequence = 0
+        self.published = 0
+        self.errors = 0
+        self.last_bytes = 0
+        self._map = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o640)
+        try:
+            os.ftruncate(fd, self.size)
+            self._map = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self._map, 0, 0, 0, 0)  # Readers see 'no data yet'
+        self._thread = threading.Thread(target=self._run, name='state-publisher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+    def publish(self):
+        """Serialize and write one snapshot; returns False if it was not written"""
+        try:
+            data = json.dumps(self.snapshot(), separators=(',', ':'), default=str).encode()
+        except (TypeError, ValueError, RuntimeError) as e:
+            # RuntimeError: a dict changed size while another thread updated it
+            self.errors += 1
+            logger.debug(f"Snapshot skipped: {e}")
+            return False
+        if HEADER.size + len(data) > self.size:
+            self.errors += 1
+            logger.error(f"State snapshot of {len(data)} bytes does not fit in {self.size}")
+            return False
+
+        self.sequence += 1
+        HEADER.pack_into(self._map, 0, self.sequence, 0, 0)
+        self._map[HEADER.size:HEADER.size + len(data)] = data
+        self.sequence += 1
+        HEADER.pack_into(self._map, 0, self.sequence, len(data), zlib.crc32(data))
+        self.published += 1
+        self.last_bytes = len(data)
+        return True
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.publish()
+
+    def get_stats(self):
+        return {
+            'published': self.published,
+            'errors': self.errors,
+            'bytes': self.last_bytes
+        }
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                reply = self.server.dispatch(request.get('cmd'), request.get('args') or {})
+            except ValueError as e:
+                reply = {'success': False, 'error': f"Bad request: {e}"}
+            self.wfile.write(json.dumps(reply, separators=(',', ':'), default=str).encode() + b'\n')
+
+
+class _CommandSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class CommandServer:
+    """Unix socket server dispatching web commands to handler functions"""
+
+    def __init__(self, path, handlers):
+        """
+        Initialize command server.
+
+        Args:
+            path: Unix socket path
+            handlers: Dict of command name -> function(**args) returning a reply dict
+        """
+        self.path = path
+        self.handlers = handlers
+        self.commands = 0
+        self.failures = 0
+        self._server = None
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)  # Left over from a previous run
+        self._server = _CommandSocketServer(self.path, _CommandHandler)
+        self._server.dispatch = self.dispatch
+        os.chmod(self.path, 0o660)
+        threading.Thread(target=self._server.serve_forever, name='command-server', daemon=True).start()
+        logger.info(f"Command socket listening on {self.path}")
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def dispatch(self, cmd, args):
+        handler = self.handlers.get(cmd)
+        if handler is None:
+            return {'success': False, 'error': f"Unknown command '{cmd}'"}
+        self.commands += 1
+        try:
+            reply = handler(**args)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Command {cmd} failed: {e}")
+            return {'success': False, 'error': str(e)}
+        return {'success': True, **(reply or {})}
+
+    def get_stats(self):
+        return {'commands': self.commands, 'failures': self.failures}
+
+
+# ==================== WEB SIDE ====================
+
+class StateReader:
+    """Lock-free reader of the daemon's state snapshot"""
+
+    def __init__(self, path, retries=20):
+        """
+        Initialize state reader.
+
+        Args:
+            path: Snapshot file written by StatePublisher
+            retries: Copies attempted before giving up on a snapshot being rewritten
+        """
+        self.path = path
+        self.retries = retries
+        self._map = None
+        self._inode = None
+        self._lock = threading.Lock()
+
+    def _remap(self):
+        """(Re)map the file, e.g. after the daemon recreated it"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._map = None
+            return False
+        if self._map is not None and st.st_ino == self._inode:
+            return True
+        with open(self.path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Created but not sized yet
+                return False
+        self._inode = st.st_ino
+        return True
+
+    def read(self):
+        """Latest snapshot dict, or None if the daemon has not published one"""
+        with self._lock:  # Only guards the mapping; reads never wait for the daemon
+            if not self._remap():
+                return None
+            mapped = self._map
+        for _ in range(self.retries):
+            sequence, length, crc = HEADER.unpack_from(mapped, 0)
+            if sequence == 0:
+                return None
+            if sequence % 2 == 0 and HEADER.size + length <= len(mapped):
+                data = mapped[HEADER.size:HEADER.size + length]
+                if HEADER.unpack_from(mapped, 0)[0] == sequence and zlib.crc32(data) == crc:
+                    return json.loads(data)
+            time.sleep(0.001)  # Writer mid-copy
+        return None
+
+
+class DaemonClient:
+    """Web-side access to the control daemon: snapshot reads and commands"""
+
+    def __init__(self, socket_path, state_path, timeout=10.0, stale_after=5.0):
+        """
+        Initialize daemon client.
+
+        Args:
+            socket_path: Daemon command socket
+            state_path: Daemon state snapshot file
+            timeout: Seconds to wait for a command reply
+            stale_after: Snapshot age in seconds after which the daemon counts as down
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.reader = StateReader(state_path)
+
+    def snapshot(self):
+        """Latest snapshot, or None if there is none or it is stale"""
+        snap = self.reader.read()
+        if snap is None or time.time() - snap.get('published', 0) > self.stale_after:
+            return None
+        return snap
+
+    def call(self, cmd, args=None, timeout=None):
+        """
+        Send a command and return the daemon's reply dict.
+
+        Args:
+            cmd: Command name
+            args: Dict of command arguments (kept apart from the call's own options)
+            timeout: Seconds to wait for the reply (default: the client timeout)
+        """
+        request = json.dumps({'cmd': cmd, 'args': args or {}}).encode() + b'\n'
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout or self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(request)
+                reply = sock.makefile('rb').readline()
+        except OSError as e:  # Includes socket.timeout
+            raise DaemonUnavailable(f"Control daemon not reachable: {e}")
+        if not reply:
+            raise DaemonUnavailable("Control daemon closed the connection")
+        return json.loads(reply)
@@ -0,0 +1,242 @@
+"""
+Fixed-rate control scheduler for the cooling tower
+
+The pressure loop runs on a fixed period measured against a monotonic clock.
+Telemetry polling (VFD status reads, status logging) runs in a separate,
+lower-priority lane: a telemetry task is only started when it is due, its
+rate budget allows it, and its expected duration fits into the slack
+before the next control deadline. The expected duration is a smoothed
+average of past runs, capped at one control period, so a single slow run
+(Modbus retries against a silent drive) does not keep a task out of the
+slack; a task overdue by more than max_overdue runs regardless. Late
+control cycles are counted and reported as missed deadlines.
+"""
+
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryTask:
+    """A periodic low-priority task run in the slack between control cycles"""
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+
+        self.last_run = None
+        self.last_duration = 0.0
+        self.expected_duration = 0.0
+        self.runs = 0
+        self.errors = 0
+        self.deferred = 0
+        self.forced = 0
+
+    def is_due(self, now):
+        return self.last_run is None or now - self.last_run >= self.interval
+
+    def overdue(self, now):
+        if self.last_run is None:
+            return float('inf')
+        return now - self.last_run - self.interval
+
+
+class ControlScheduler:
+    """Runs a control step at a fixed rate with a telemetry lane in its slack"""
+
+    def __init__(self, control_fn, period=1.0, telemetry_rate=2.0,
+                 deadline_tolerance=0.1, max_overdue=5.0, duration_smoothing=0.5,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        Initialize control scheduler.
+
+        Args:
+            control_fn: Callable run once per control period
+            period: Control period in seconds
+            telemetry_rate: Maximum telemetry tasks started per second
+            deadline_tolerance: Fraction of the period a cycle may start late
+                                before it counts as a missed deadline
+            max_overdue: Seconds past due after which a telemetry task runs
+                         even if it does not fit into the slack
+            duration_smoothing: Weight of the latest run in a task's expected duration
+            clock: Monotonic clock function
+            sleep: Sleep function
+        """
+        self.control_fn = control_fn
+        self.period = period
+        self.telemetry_rate = telemetry_rate
+        self.deadline_tolerance = deadline_tolerance
+        self.max_overdue = max_overdue
+        self.duration_smoothing = duration_smoothing
+        self.clock = clock
+        self.sleep = sleep
+
+        self.telemetry = []
+        self.running = False
+
+        self._next_deadline = None
+        self._last_telemetry_start = None
+
+        # Statistics
+        self.cycles = 0
+        self.missed_deadlines = 0
+        self.skipped_cycles = 0
+        self.overruns = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+        self.last_control_duration = 0.0
+        self.max_control_duration = 0.0
+
+    def add_telemetry(self, name, func, interval):
+        """Register a telemetry task run at most every `interval` seconds"""
+        task = TelemetryTask(name, func, interval)
+        self.telemetry.append(task)
+        return task
+
+    def run(self):
+        """Run control cycles until stop() is called"""
+        self.running = True
+        self._next_deadline = self.clock()
+        logger.info(f"Control scheduler started: period={self.period:.2f}s, "
+                    f"telemetry budget={self.telemetry_rate:.1f}/s")
+
+        while self.running:
+            self._wait_for_deadline()
+            if not self.running:
+                break
+            self._run_control()
+
+        logger.info("Control scheduler stopped")
+
+    def stop(self):
+        self.running = False
+
+    def _wait_for_deadline(self):
+        """Run telemetry in the slack before the next deadline, then sleep"""
+        while self.running:
+            now = self.clock()
+            remaining = self._next_deadline - now
+            if remaining <= 0:
+                return
+
+            task = self._pick_telemetry(now, remaining)
+            if task:
+                self._run_telemetry(task)
+                continue
+
+            self.sleep(min(remaining, self._time_until_telemetry(now)))
+
+    def _budget_wait(self, now):
+        """Seconds until the telemetry rate budget allows another task"""
+        if self.telemetry_rate <= 0:
+            return float('inf')
+        if self._last_telemetry_start is None:
+            return 0.0
+        return max(0.0, self._last_telemetry_start + 1.0 / self.telemetry_rate - now)
+
+    def _time_until_telemetry(self, now):
+        """Seconds until a telemetry task could next become runnable"""
+        if not self.telemetry:
+            return float('inf')
+        due_in = min(
+            0.0 if t.last_run is None else max(0.0, t.last_run + t.interval - now)
+            for t in self.telemetry
+        )
+        # Never busy-wait: if work is pending but does not fit, sleep to the deadline
+        return max(due_in, self._budget_wait(now)) or float('inf')
+
+    def _pick_telemetry(self, now, remaining):
+        """Pick the most overdue telemetry task that fits into the slack (or is starving)"""
+        if self._budget_wait(now) > 0:
+            return None
+
+        due = [t for t in self.telemetry if t.is_due(now)]
+        due.sort(key=lambda t: t.overdue(now), reverse=True)
+
+        for task in due:
+            if task.expected_duration < remaining:
+                return task
+            if task.overdue(now) > self.max_overdue:
+                task.forced += 1
+                logger.debug(f"Telemetry task '{task.name}' overdue by {task.overdue(now):.1f}s, "
+                             f"running despite {remaining * 1000:.0f} ms slack")
+                return task
+            task.deferred += 1
+        return None
+
+    def _run_telemetry(self, task):
+        start = self.clock()
+        self._last_telemetry_start = start
+        try:
+            task.func()
+        except Exception as e:
+            task.errors += 1
+            logger.error(f"Telemetry task '{task.name}' error: {e}")
+        end = self.clock()
+        task.last_run = start
+        task.last_duration = end - start
+        # Smoothed and capped: one outlier must not keep the task out of the slack
+        if task.runs:
+            expected = (self.duration_smoothing * task.last_duration +
+                        (1 - self.duration_smoothing) * task.expected_duration)
+        else:
+            expected = task.last_duration
+        task.expected_duration = min(expected, self.period)
+        task.runs += 1
+
+    def _run_control(self):
+        start = self.clock()
+        lateness = start - self._next_deadline
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+        if lateness > self.period * self.deadline_tolerance:
+            self.missed_deadlines += 1
+            logger.warning(f"Control deadline missed by {lateness * 1000:.0f} ms "
+                           f"(total missed: {self.missed_deadlines})")
+
+        try:
+            self.control_fn()
+        except Exception as e:
+            logger.error(f"Control step error: {e}")
+
+        duration = self.clock() - start
+        self.cycles += 1
+        self.last_control_duration = duration
+        self.max_control_duration = max(self.max_control_duration, duration)
+        if duration > self.period:
+            self.overruns += 1
+
+        # Keep the original phase; skip whole periods we can no longer meet
+        self._next_deadline += self.period
+        now = self.clock()
+        if self._next_deadline < now:
+            skipped = int((now - self._next_deadline) // self.period) + 1
+            self.skipped_cycles += skipped
+            self._next_deadline += skipped * self.period
+
+    def get_stats(self):
+        """Get scheduler timing statistics"""
+        return {
+            'period': self.period,
+            'cycles': self.cycles,
+            'missed_deadlines': self.missed_deadlines,
+            'skipped_cycles': self.skipped_cycles,
+            'overruns': self.overruns,
+            'last_lateness_ms': round(self.last_lateness * 1000, 1),
+            'max_lateness_ms': round(self.max_lateness * 1000, 1),
+            'last_control_ms': round(self.last_control_duration * 1000, 1),
+            'max_control_ms': round(self.max_control_duration * 1000, 1),
+            'telemetry': {
+                t.name: {
+                    'runs': t.runs,
+                    'errors': t.errors,
+                    'deferred': t.deferred,
+                    'forced': t.forced,
+                    'last_duration_ms': round(t.last_duration * 1000, 1)
+                }
+                for t in self.telemetry
+            }
+        }
@@ -0,0 +1,166 @@
+"""
+Energy metering for the tower VFDs
+
+Integrates drive output power into kWh on the Pi with the trapezoidal
+rule as samples arrive, so no raw samples are stored. Keeps lifetime,
+daily and monthly totals per drive and persists them to a JSON file so
+they survive restarts.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class DriveEnergy:
+    """Running energy totals for one drive"""
+
+    def __init__(self, name, rated_power_kw):
+        self.name = name
+        self.rated_power_kw = rated_power_kw
+
+        self.power_kw = 0.0
+        self.last_sample = None  # (timestamp, kW)
+
+        self.total_kwh = 0.0
+        self.daily = {}    # 'YYYY-MM-DD' -> kWh
+        self.monthly = {}  # 'YYYY-MM' -> kWh
+
+    def to_dict(self):
+        return {
+            'total_kwh': self.total_kwh,
+            'daily': self.daily,
+            'monthly': self.monthly
+        }
+
+    def load(self, data):
+        self.total_kwh = float(data.get('total_kwh', 0.0))
+        self.daily = {k: float(v) for k, v in data.get('daily', {}).items()}
+        self.monthly = {k: float(v) for k, v in data.get('monthly', {}).items()}
+
+
+class EnergyMeter:
+    """Per-drive kWh accounting from sampled output power"""
+
+    def __init__(self, drives, data_file=None, save_interval=300.0, max_gap=120.0,
+                 keep_days=62, keep_months=24, clock=time.time):
+        """
+        Initialize energy meter.
+
+        Args:
+            drives: Dict of drive name -> rated power in kW
+            data_file: JSON file for persisted totals
+            save_interval: Seconds between saves
+            max_gap: Sample gaps longer than this (s) are not integrated
+            keep_days: Daily totals to retain
+            keep_months: Monthly totals to retain
+            clock: Wall-clock time source (day/month boundaries)
+        """
+        self.data_file = data_file
+        self.save_interval = save_interval
+        self.max_gap = max_gap
+        self.keep_days = keep_days
+        self.keep_months = keep_months
+        self.clock = clock
+
+        self.drives = {name: DriveEnergy(name, kw) for name, kw in drives.items()}
+        self._last_save = clock()
+        self._load()
+
+    def _load(self):
+        if not self.data_file or not os.path.exists(self.data_file):
+            return
+        try:
+            with open(self.data_file) as f:
+                data = json.load(f)
+            for name, drive in self.drives.items():
+                if name in data:
+                    drive.load(data[name])
+            logger.info(f"Loaded energy totals from {self.data_file}")
+        except Exception as e:
+            logger.error(f"Failed to load energy totals: {e}")
+
+    def save(self):
+        """Persist totals atomically"""
+        self._last_save = self.clock()
+        if not self.data_file:
+            return
+        try:
+            tmp = self.data_file + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({name: d.to_dict() for name, d in self.drives.items()}, f)
+            os.replace(tmp, self.data_file)
+        except Exception as e:
+            logger.error(f"Failed to save energy totals: {e}")
+
+    def power_kw(self, name, status):
+        """Drive output power in kW from a VFDController.get_status() dict"""
+        drive = self.drives[name]
+        return max(0.0, status.get('output_power_pct', 0.0)) / 100.0 * drive.rated_power_kw
+
+    def record(self, name, status):
+        """Add a power sample for a drive and integrate since the previous one"""
+        drive = self.drives.get(name)
+        if drive is None or status is None or status.get('state') == 'NoComm':
+            return
+
+        now = self.clock()
+        kw = self.power_kw(name, status)
+        drive.power_kw = kw
+
+        if drive.last_sample is not None:
+            t0, kw0 = drive.last_sample
+            dt = now - t0
+            if 0 < dt <= self.max_gap:
+                kwh = (kw0 + kw) / 2.0 * dt / 3600.0
+                self._accumulate(drive, now, kwh)
+        drive.last_sample = (now, kw)
+
+        if now - self._last_save >= self.save_interval:
+            self.save()
+
+    def _accumulate(self, drive, timestamp, kwh):
+        stamp = datetime.fromtimestamp(timestamp)
+        day = stamp.strftime('%Y-%m-%d')
+        month = stamp.strftime('%Y-%m')
+
+        drive.total_kwh += kwh
+        drive.daily[day] = drive.daily.get(day, 0.0) + kwh
+        drive.monthly[month] = drive.monthly.get(month, 0.0) + kwh
+
+        # ISO keys sort chronologically; drop the oldest beyond retention
+        for key in sorted(drive.daily)[:-self.keep_days]:
+            del drive.daily[key]
+        for key in sorted(drive.monthly)[:-self.keep_months]:
+            del drive.monthly[key]
+
+    def get_status(self):
+        """Current power and today/month/lifetime kWh per drive"""
+        stamp = datetime.fromtimestamp(self.clock())
+        day = stamp.strftime('%Y-%m-%d')
+        month = stamp.strftime('%Y-%m')
+
+        drives = {}
+        for name, d in self.drives.items():
+            drives[name] = {
+                'power_kw': round(d.power_kw, 2),
+                'today_kwh': round(d.daily.get(day, 0.0), 2),
+                'month_kwh': round(d.monthly.get(month, 0.0), 2),
+                'total_kwh': round(d.total_kwh, 2)
+            }
+        return {
+            'drives': drives,
+            'power_kw': round(sum(d['power_kw'] for d in drives.values()), 2),
+            'today_kwh': round(sum(d['today_kwh'] for d in drives.values()), 2),
+            'month_kwh': round(sum(d['month_kwh'] for d in drives.values()), 2),
+            'total_kwh': round(sum(d['total_kwh'] for d in drives.values()), 2)
+        }
+
+    def get_history(self, name):
+        """Daily and monthly totals for a drive"""
+        drive = self.drives[name]
+        return {'daily': dict(drive.daily), 'monthly': dict(drive.monthly)}
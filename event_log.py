@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Structured event and trace log
+
+Records are newline-delimited JSON objects ({"t": epoch, "k": kind, ...})
+handed to a bounded queue and written by a background thread, so the
+control loop never waits on the SD card. If the writer falls behind, new
+records are dropped and counted rather than blocking the caller. Files
+rotate by size (events.ndjson -> events.ndjson.1 ... .N).
+
+Decode and filter from the command line:
+    python3 event_log.py events.ndjson --kind cycle --since 2026-10-19T08:00
+    python3 event_log.py events.ndjson --where active_pump=backup --json
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class EventLog:
+    """Non-blocking NDJSON event writer with size-based rotation"""
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=5, queue_size=1000,
+                 flush_interval=2.0):
+        """
+        Initialize event log.
+
+        Args:
+            path: Log file path
+            max_bytes: Rotate when the file grows past this size
+            backups: Rotated files to keep
+            queue_size: Records buffered before new ones are dropped
+            flush_interval: Max seconds between writer flushes to disk
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self._file = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer, name='event-log', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write out what is queued and close the file"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+
+    def record(self, kind, **fields):
+        """Queue a record; never blocks"""
+        try:
+            self.queue.put_nowait({'t': round(time.time(), 3), 'k': kind, **fields})
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _write_batch(self, batch):
+        for fields in batch:
+            self._file.write(json.dumps(fields, separators=(',', ':'), default=str) + '\n')
+        self._file.flush()
+        self.written += len(batch)
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _writer(self):
+        try:
+            self._open()
+        except OSError as e:
+            logger.error(f"Cannot open event log {self.path}: {e}")
+            return
+
+        while True:
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+                while True:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except OSError as e:
+                    self.dropped += len(batch)
+                    logger.error(f"Event log write failed: {e}")
+            elif self._stop_event.is_set():
+                break
+
+        self._file.close()
+
+    def get_stats(self):
+        return {
+            'written': self.written,
+            'dropped': self.dropped,
+            'queued': self.queue.qsize()
+        }
+
+
+# ==================== DECODER ====================
+
+def log_files(path):
+    """The log and its rotated files, oldest first"""
+    files = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        files.append(f"{path}.{i}")
+        i += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_records(path, kinds=None, since=None, until=None, where=None):
+    """Yield records across rotated files matching the filters"""
+    where = where or {}
+    for name in log_files(path):
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line after a power cut
+                if kinds and record.get('k') not in kinds:
+                    continue
+                if since is not None and record.get('t', 0) < since:
+                    continue
+                if until is not None and record.get('t', 0) > until:
+                    continue
+                if any(str(record.get(key)) != value for key, value in where.items()):
+                    continue
+                yield record
+
+
+def format_record(record):
+    stamp = datetime.fromtimestamp(record.get('t', 0)).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    fields = ' '.join(f"{key}={value}" for key, value in record.items() if key not in ('t', 'k'))
+    return f"{stamp} {record.get('k', '?'):8s} {fields}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode and filter the cooling tower event log")
+    parser.add_argument('path', help="Event log file (rotated files are included)")
+    parser.add_argument('--kind', action='append', help="Record kind (repeatable)")
+    parser.add_argument('--since', help="ISO timestamp, e.g. 2026-10-19T08:00")
+    parser.add_argument('--until', help="ISO timestamp")
+    parser.add_argument('--where', action='append', default=[], help="field=value (repeatable)")
+    parser.add_argument('--json', action='store_true', help="Print raw NDJSON records")
+    args = parser.parse_args()
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    until = datetime.fromisoformat(args.until).timestamp() if args.until else None
+    where = dict(item.split('=', 1) for item in args.where)
+
+    try:
+        for record in read_records(args.path, args.kind, since, until, where):
+            print(json.dumps(record, separators=(',', ':')) if args.json else format_record(record))
+    except BrokenPipeError:
+        sys.stderr.close()  # Output piped into head
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Temperature-driven fan speed control
+
+PI loop that modulates the fan VFD to hold the basin water temperature
+setpoint. The loop works in airflow fraction: tower heat rejection
+scales roughly with airflow, and by the fan affinity laws airflow is
+proportional to speed while shaft power goes with the cube of speed.
+Inside the deadband the controller trims speed down slowly, because
+every hertz the fan does not need costs power at the cube law.
+"""
+
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FanController:
+    """PI basin temperature controller with min speed and rate limits"""
+
+    def __init__(self, setpoint=85.0, kp=0.04, ki=0.0005, deadband=0.5,
+                 min_frequency=25.0, max_frequency=60.0, rated_frequency=60.0,
+                 rate_limit=0.5, trim_rate=0.05, update_interval=5.0,
+                 start_frequency=45.0, clock=time.monotonic):
+        """
+        Initialize fan controller.
+
+        Args:
+            setpoint: Basin water temperature setpoint in °F
+            kp: Proportional gain (airflow fraction per °F)
+            ki: Integral gain (airflow fraction per °F per second)
+            deadband: Temperature band (°F) around setpoint treated as on target
+            min_frequency: Minimum fan frequency in Hz
+            max_frequency: Maximum fan frequency in Hz
+            rated_frequency: Motor rated frequency (100% airflow) in Hz
+            rate_limit: Maximum frequency change in Hz per second
+            trim_rate: Downward speed trim inside the deadband in Hz per second
+            update_interval: Seconds between fan updates
+            start_frequency: Frequency used when the fan is started
+            clock: Monotonic clock function
+        """
+        self.setpoint = setpoint
+        self.kp = kp
+        self.ki = ki
+        self.deadband = deadband
+        self.min_frequency = min_frequency
+        self.max_frequency = max_frequency
+        self.rated_frequency = rated_frequency
+        self.rate_limit = rate_limit
+        self.trim_rate = trim_rate
+        self.update_interval = update_interval
+        self.start_frequency = start_frequency
+        self.clock = clock
+
+        self.frequency = start_frequency
+        self.integral = start_frequency / rated_frequency
+        self.temperature = None
+        self.last_update = None
+
+    def reset(self, frequency=None):
+        """Re-seed the loop (e.g. when the fan is started)"""
+        self.frequency = self.start_frequency if frequency is None else frequency
+        self.integral = self.frequency / self.rated_frequency
+        self.last_update = None
+
+    def airflow(self, frequency=None):
+        """Relative airflow (affinity law: proportional to speed)"""
+        f = self.frequency if frequency is None else frequency
+        return f / self.rated_frequency
+
+    def power_fraction(self, frequency=None):
+        """Relative fan shaft power (affinity law: cube of speed)"""
+        return self.airflow(frequency) ** 3
+
+    def update(self, temperature):
+        """
+        Run one control update.
+
+        Returns:
+            New fan frequency in Hz, or None if no update is due
+        """
+        now = self.clock()
+        if self.last_update is not None and now - self.last_update < self.update_interval:
+            return None
+        dt = self.update_interval if self.last_update is None else now - self.last_update
+        self.last_update = now
+        self.temperature = temperature
+
+        min_flow = self.airflow(self.min_frequency)
+        max_flow = self.airflow(self.max_frequency)
+
+        error = temperature - self.setpoint  # Positive: water too warm, more airflow
+        if abs(error) <= self.deadband:
+            # On target: bleed speed off slowly to find the cheapest airflow
+            self.integral -= self.trim_rate * dt / self.rated_frequency
+            error = 0.0
+        else:
+            self.integral += self.ki * error * dt
+
+        # Anti-windup: integral alone never leaves the usable airflow range
+        self.integral = max(min_flow, min(max_flow, self.integral))
+
+        demand = max(min_flow, min(max_flow, self.integral + self.kp * error))
+        target = demand * self.rated_frequency
+
+        # Rate limit the speed change
+        max_step = self.rate_limit * dt
+        step = max(-max_step, min(max_step, target - self.frequency))
+        self.frequency = max(self.min_frequency, min(self.max_frequency, self.frequency + step))
+
+        logger.debug(f"Fan loop: T={temperature:.1f}°F SP={self.setpoint:.1f}°F "
+                     f"-> {self.frequency:.1f} Hz ({self.power_fraction() * 100:.0f}% power)")
+        return self.frequency
+
+    def get_status(self):
+        return {
+            'setpoint': self.setpoint,
+            'temperature': self.temperature,
+            'frequency': round(self.frequency, 2),
+            'airflow_pct': round(self.airflow() * 100, 1),
+            'power_pct': round(self.power_fraction() * 100, 1)
+        }
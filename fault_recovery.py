@@ -0,0 +1,237 @@
+"""
+Automatic fault reset and restart
+
+When a drive trips, the fault code is classified (over-current,
+over-voltage, thermal, ...) and the class's retry policy decides what
+happens: wait a settle delay, send the fault reset command, verify
+state word 1 has left Fault, and if the drive was running (and its owner
+still wants it running, e.g. the pump has not been failed over) restart
+it at its last frequency setpoint. A class allows a limited number of attempts
+inside a time window; once they are used up (or for classes that must
+never auto-reset) the drive is locked out and the trip is escalated, e.g.
+to pump failover. The lockout lifts when the drive is seen healthy again
+after an operator reset.
+
+update() advances every sequence by at most one step and never sleeps,
+so it can run in the control scheduler's telemetry lane.
+"""
+
+import time
+import logging
+from collections import deque
+
+from alarm_manager import decode_fault
+
+logger = logging.getLogger(__name__)
+
+STATE_FAULT = 0x0004
+RUNNING_STATES = (0x0001, 0x0002)
+
+# Keypad fault code -> fault class for retry policies
+FAULT_CLASSES = {
+    'OC1': 'overcurrent', 'OC2': 'overcurrent', 'OC3': 'overcurrent',
+    'OV1': 'overvoltage', 'OV2': 'overvoltage', 'OV3': 'overvoltage',
+    'UV': 'undervoltage',
+    'OL1': 'overload', 'OL2': 'overload', 'OL3': 'overload',
+    'OH1': 'thermal', 'OH2': 'thermal',
+    'CE': 'comm', 'PCE': 'comm',
+    'EF': 'external',
+}
+
+
+def fault_class(code):
+    keypad, _ = decode_fault(code)
+    return FAULT_CLASSES.get(keypad, 'default')
+
+
+class DriveRecovery:
+    """Recovery state of one drive"""
+
+    def __init__(self, name, vfd):
+        self.name = name
+        self.vfd = vfd
+        self.phase = None        # None, 'waiting', 'resetting', 'restarting', 'locked_out'
+        self.since = None
+        self.tripped_at = None
+        self.fault_code = 0
+        self.fault_class = None
+        self.was_running = False
+        self.setpoint = None
+        self.last_state = None
+        self.attempts = {}       # fault class -> reset attempt times inside its policy window
+        self.recoveries = 0
+        self.escalations = 0
+        self.last_recovery_time = None
+
+
+class FaultRecovery:
+    """Fault reset / restart engine with per fault class retry policies"""
+
+    def __init__(self, drives, policies, verify_timeout=5.0, lockout_poll=10.0,
+                 on_escalate=None, on_recovered=None, should_restart=None, clock=time.monotonic):
+        """
+        Initialize fault recovery.
+
+        Args:
+            drives: Dict of drive name -> VFDController
+            policies: Dict of fault class -> {'max_attempts', 'delay', 'window'};
+                      a 'default' entry covers unlisted classes, max_attempts 0
+                      means never reset automatically
+            verify_timeout: Seconds to wait for the reset / restart to show in state word 1
+            lockout_poll: Seconds between state reads of a locked-out drive
+            on_escalate: Optional callback(name, vfd, fault_code) when recovery gives up
+            on_recovered: Optional callback(name, vfd) when a drive is healthy again
+            should_restart: Optional should_restart(name, vfd) -> bool, asked before
+                            restarting a drive that was running when it tripped;
+                            False only resets the fault
+            clock: Monotonic clock function
+        """
+        self.drives = {name: DriveRecovery(name, vfd) for name, vfd in drives.items()}
+        self.policies = policies
+        self.verify_timeout = verify_timeout
+        self.lockout_poll = lockout_poll
+        self.on_escalate = on_escalate
+        self.on_recovered = on_recovered
+        self.should_restart = should_restart
+        self.clock = clock
+
+    def _policy(self, fault_class):
+        return self.policies.get(fault_class, self.policies.get('default', {'max_attempts': 0}))
+
+    def is_recovering(self, name):
+        drive = self.drives.get(name)
+        return drive is not None and drive.phase is not None
+
+    def cancel(self):
+        """Drop reset / restart sequences in progress (emergency stop); lockouts stay"""
+        for drive in self.drives.values():
+            if drive.phase in ('waiting', 'resetting', 'restarting'):
+                logger.info(f"[{drive.name}] Fault recovery cancelled")
+                drive.phase = None
+                drive.was_running = False
+
+    def observe(self, name, status):
+        """Feed a status sample; starts a recovery sequence when a drive trips"""
+        drive = self.drives.get(name)
+        if drive is None or status is None or status.get('state') == 'NoComm':
+            return
+        if status['state'] == 'Fault' and drive.phase is None:
+            self._trip(drive, status.get('fault_code', 0), self.clock())
+        elif status['state'] != 'Fault' and drive.phase is None:
+            drive.last_state = status['state']
+
+    def _trip(self, drive, code, now):
+        drive.fault_code = code
+        drive.fault_class = fault_class(code)
+        drive.was_running = drive.last_state in ('Forward', 'Reverse')
+        setpoint = drive.vfd.shadow_values(drive.vfd.REG_FREQ_SET)
+        drive.setpoint = setpoint[0] * 0.01 if setpoint else None
+        drive.tripped_at = now
+        keypad, text = decode_fault(code)
+        logger.warning(f"[{drive.name}] Tripped: {keypad} ({text}), class {drive.fault_class}")
+        self._next_attempt(drive, now)
+
+    def _next_attempt(self, drive, now):
+        policy = self._policy(drive.fault_class)
+        window = policy.get('window', 3600.0)
+        attempts = drive.attempts.setdefault(drive.fault_class, deque())
+        while attempts and now - attempts[0] > window:
+            attempts.popleft()
+
+        if len(attempts) >= policy.get('max_attempts', 0):
+            self._escalate(drive, now)
+            return
+        drive.phase = 'waiting'
+        drive.since = now
+
+    def _escalate(self, drive, now):
+        keypad, _ = decode_fault(drive.fault_code)
+        logger.error(f"[{drive.name}] {keypad}: automatic recovery exhausted "
+                     f"({len(drive.attempts.get(drive.fault_class, ()))} attempt(s)), escalating")
+        drive.phase = 'locked_out'
+        drive.since = now
+        drive.escalations += 1
+        if self.on_escalate:
+            self.on_escalate(drive.name, drive.vfd, drive.fault_code)
+
+    def _read_state(self, drive):
+        return drive.vfd.refresh(drive.vfd.REG_STATE_1, retries=1)
+
+    def _recovered(self, drive, now):
+        drive.recoveries += 1
+        drive.last_recovery_time = now - drive.tripped_at
+        drive.phase = None
+        logger.info(f"[{drive.name}] Recovered from fault {drive.fault_code}")
+        if self.on_recovered:
+            self.on_recovered(drive.name, drive.vfd)
+
+    def update(self):
+        """Advance each drive's recovery sequence by one step"""
+        now = self.clock()
+        for drive in self.drives.values():
+            try:
+                self._step(drive, now)
+            except Exception as e:
+                logger.error(f"[{drive.name}] Fault recovery error: {e}")
+
+    def _step(self, drive, now):
+        if drive.phase == 'waiting':
+            if now - drive.since >= self._policy(drive.fault_class).get('delay', 5.0):
+                drive.attempts[drive.fault_class].append(now)
+                drive.vfd.fault_reset()
+                drive.phase = 'resetting'
+                drive.since = now
+
+        elif drive.phase == 'resetting':
+            state = self._read_state(drive)
+            if state is not None and state != STATE_FAULT:
+                restart = drive.was_running and (self.should_restart is None or
+                                                 self.should_restart(drive.name, drive.vfd))
+                if drive.was_running and not restart:
+                    logger.info(f"[{drive.name}] Fault reset, not restarting (no longer needed)")
+                if restart:
+                    if drive.setpoint is not None:
+                        drive.vfd.set_frequency(drive.setpoint)
+                    drive.vfd.start()
+                    drive.phase = 'restarting'
+                    drive.since = now
+                else:
+                    self._recovered(drive, now)
+            elif now - drive.since >= self.verify_timeout:
+                logger.warning(f"[{drive.name}] Fault reset not accepted")
+                self._next_attempt(drive, now)
+
+        elif drive.phase == 'restarting':
+            state = self._read_state(drive)
+            if state in RUNNING_STATES:
+                self._recovered(drive, now)
+            elif state == STATE_FAULT:
+                logger.warning(f"[{drive.name}] Tripped again on restart")
+                self._next_attempt(drive, now)
+            elif now - drive.since >= self.verify_timeout:
+                logger.warning(f"[{drive.name}] Did not restart after fault reset")
+                self._escalate(drive, now)
+
+        elif drive.phase == 'locked_out':
+            if now - drive.since < self.lockout_poll:
+                return
+            drive.since = now
+            state = self._read_state(drive)
+            if state is not None and state != STATE_FAULT:
+                # Reset by an operator; make the drive available again
+                drive.last_state = None
+                drive.phase = None
+                logger.info(f"[{drive.name}] Fault cleared, lockout lifted")
+                if self.on_recovered:
+                    self.on_recovered(drive.name, drive.vfd)
+
+    def get_status(self):
+        return {name: {
+            'phase': d.phase,
+            'fault_code': d.fault_code if d.phase else 0,
+            'fault_class': d.fault_class if d.phase else None,
+            'attempts': sum(len(a) for a in d.attempts.values()),
+            'recoveries': d.recoveries,
+            'escalations': d.escalations,
+            'last_recovery_s': round(d.last_recovery_time, 1) if d.last_recovery_time is not None else None
+        } for name, d in self.drives.items()}
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+GALT G540 bus speed migration
+
+Moves every drive on one RS-485 bus to a faster baud rate (P14.01) and,
+optionally, another parity (P14.02), with automatic rollback:
+
+  1. Measure link quality at the current settings (all drives must answer)
+  2. Write P14.01/P14.02 to every drive in one FC16 block write each
+  3. Switch the port to the new settings and measure every drive again
+  4. If any drive is missing or the error rate is above the limit, write
+     the old settings back (at the new rate, to the drives that switched),
+     return the port to the old settings and verify
+
+With --step the rate is raised one P14.01 step at a time up to the target,
+stopping at the last step that measured clean, so the chain settles on the
+highest rate its cabling and termination actually carry.
+
+Usage:
+    python3 g540_baud.py status  bus0
+    python3 g540_baud.py migrate bus0 --baudrate 38400 [--parity E] [--step] [--dry-run]
+
+Stop the control daemon first (the tool needs the port) and the drives
+(the comm parameters are not changed on a running drive without --force).
+After a migration, set the bus's baudrate / parity in the config file.
+"""
+
+import sys
+import time
+import argparse
+
+from config import SERIAL_BUSES, TOWERS
+from vfd_controller import MultiVFDManager
+from g540_registers import STATE_BLOCK, STATE_STOPPED
+
+# P14.01 baud rate codes and P14.02 check settings (RTU, 8 data bits)
+BAUD_CODES = {1200: 0, 2400: 1, 4800: 2, 9600: 3, 19200: 4, 38400: 5, 57600: 6, 115200: 7}
+PARITY_CODES = {'N': 0, 'E': 1, 'O': 2}
+REG_COMM_BAUD = 0x1401          # P14.01; P14.02 follows
+
+SAMPLES = 50                    # State block reads per drive per measurement
+MAX_ERROR_RATE = 0.0            # Failed reads tolerated (fraction) before rolling back
+SETTLE_TIME = 0.5               # Seconds for the drives to switch after the write
+
+
+def measure(vfds, samples=SAMPLES):
+    """Link quality per drive: {name: {'ok', 'errors', 'error_rate', 'latency_ms'}}"""
+    results = {}
+    for name, vfd in vfds.items():
+        ok, latencies = 0, []
+        for _ in range(samples):
+            if vfd.read_register(STATE_BLOCK.first, count=STATE_BLOCK.count, retries=1, max_age=0) is not None:
+                ok += 1
+                latencies.append(vfd.last_latency)
+        results[name] = {
+            'ok': ok,
+            'errors': samples - ok,
+            'error_rate': round((samples - ok) / samples, 3),
+            'latency_ms': round(1000 * sum(latencies) / len(latencies), 1) if latencies else None
+        }
+    return results
+
+
+def report(label, results):
+    print(f"  {label}:")
+    for name, r in results.items():
+        latency = f"{r['latency_ms']:.1f} ms" if r['latency_ms'] is not None else "-"
+        print(f"    {name:24s} {r['ok']:3d} ok  {r['errors']:3d} errors  {latency}")
+
+
+def clean(results, max_error_rate=MAX_ERROR_RATE):
+    return all(r['ok'] and r['error_rate'] <= max_error_rate for r in results.values())
+
+
+def write_comm(vfds, baudrate, parity, retries=1):
+    """Write P14.01/P14.02 to every drive; names of the drives that acknowledged"""
+    values = [BAUD_CODES[baudrate], PARITY_CODES[parity]]
+    acked = []
+    for name, vfd in vfds.items():
+        # The reply still comes at the old settings; a lost reply is settled by verification
+        if vfd.write_registers(REG_COMM_BAUD, values, retries=retries):
+            acked.append(name)
+        else:
+            print(f"  ! {name}: no acknowledgement for P14.01={values[0]} P14.02={values[1]}")
+    return acked
+
+
+def migrate(bus, vfds, baudrate, parity, samples=SAMPLES, max_error_rate=MAX_ERROR_RATE):
+    """
+    Move the bus and its drives to new settings, rolling back on failure.
+
+    Returns:
+        True if every drive answers cleanly at the new settings; False if the
+        migration was rolled back (the bus is back at its old settings)
+
+    Raises:
+        RuntimeError: The rollback did not bring every drive back
+    """
+    old_baudrate, old_parity = bus.baudrate, bus.parity
+    print(f"\n{old_baudrate} {old_parity} -> {baudrate} {parity}")
+    write_comm(vfds, baudrate, parity)
+    bus.reconfigure(baudrate, parity)
+    time.sleep(SETTLE_TIME)
+    after = measure(vfds, samples)
+    report(f"at {baudrate} {parity}", after)
+    if clean(after, max_error_rate):
+        print(f"✓ All drives clean at {baudrate} {parity}")
+        return True
+
+    print(f"✗ Link not clean at {baudrate} {parity}, rolling back to {old_baudrate} {old_parity}")
+    # Drives still at the old settings do not hear this; the others switch back,
+    # retrying since the link is known to be poor at this rate
+    write_comm(vfds, old_baudrate, old_parity, retries=5)
+    bus.reconfigure(old_baudrate, old_parity)
+    time.sleep(SETTLE_TIME)
+    restored = measure(vfds, min(samples, 10))
+    report(f"back at {old_baudrate} {old_parity}", restored)
+    lost = [name for name, r in restored.items() if not r['ok']]
+    if lost:
+        raise RuntimeError(f"Rollback incomplete, not answering at {old_baudrate} {old_parity}: "
+                           f"{', '.join(lost)} (find them with g540_scanner.py)")
+    print(f"✓ Rolled back to {old_baudrate} {old_parity}")
+    return False
+
+
+def _running(vfds):
+    running = []
+    for name, vfd in vfds.items():
+        state = vfd.read_register(STATE_BLOCK.first, retries=1, max_age=0)
+        if state != STATE_STOPPED:
+            running.append(name)
+    return running
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GALT G540 bus speed migration")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('status', help="Measure link quality at the current settings")
+    p.add_argument('bus')
+    p.add_argument('--samples', type=int, default=SAMPLES)
+
+    p = sub.add_parser('migrate', help="Move every drive on a bus to new settings")
+    p.add_argument('bus')
+    p.add_argument('--baudrate', type=int, required=True, choices=sorted(BAUD_CODES))
+    p.add_argument('--parity', choices=sorted(PARITY_CODES), help="Default: keep the current parity")
+    p.add_argument('--step', action='store_true', help="Raise one P14.01 step at a time, keep the last clean one")
+    p.add_argument('--samples', type=int, default=SAMPLES)
+    p.add_argument('--max-error-rate', type=float, default=MAX_ERROR_RATE)
+    p.add_argument('--dry-run', action='store_true', help="Measure only, write nothing")
+    p.add_argument('--force', action='store_true', help="Migrate even if a drive is not stopped")
+
+    args = parser.parse_args()
+
+    manager = MultiVFDManager.from_config(SERIAL_BUSES, TOWERS)
+    bus = manager.buses.get(args.bus)
+    if bus is None:
+        print(f"✗ Unknown bus '{args.bus}' (one of {', '.join(manager.buses)})")
+        sys.exit(1)
+    vfds = bus.vfds
+    if not vfds:
+        print(f"✗ No drives configured on {args.bus}")
+        sys.exit(1)
+    if not bus.connect():
+        print(f"✗ Cannot open {bus.port}")
+        sys.exit(1)
+
+    try:
+        print(f"{args.bus}: {bus.port} @ {bus.baudrate} baud, parity {bus.parity}, "
+              f"{len(vfds)} drive(s)")
+        before = measure(vfds, args.samples)
+        report(f"at {bus.baudrate} {bus.parity}", before)
+        if args.command == 'status':
+            sys.exit(0 if clean(before) else 1)
+
+        if not all(r['ok'] for r in before.values()):
+            print("✗ Every drive must answer at the current settings before migrating")
+            sys.exit(1)
+        running = _running(vfds)
+        if running and not args.force:
+            print(f"✗ Drives not stopped: {', '.join(running)} (use --force to override)")
+            sys.exit(1)
+
+        parity = args.parity or bus.parity
+        if args.step:
+            ladder = [rate for rate in sorted(BAUD_CODES) if bus.baudrate < rate <= args.baudrate]
+        else:
+            ladder = [args.baudrate]
+        if not ladder and parity != bus.parity:
+            ladder = [bus.baudrate]  # Parity change only
+        if not ladder or (ladder == [bus.baudrate] and parity == bus.parity):
+            print("Nothing to do")
+            sys.exit(0)
+        if args.dry_run:
+            for rate in ladder:
+                print(f"  would write P14.01={BAUD_CODES[rate]} P14.02={PARITY_CODES[parity]} ({rate} {parity})")
+            sys.exit(0)
+
+        start = (bus.baudrate, bus.parity)
+        for rate in ladder:
+            if not migrate(bus, vfds, rate, parity, args.samples, args.max_error_rate):
+                break
+        if (bus.baudrate, bus.parity) == start:
+            sys.exit(1)
+        print(f"\nBefore starting the control daemon, set in the config file:\n"
+              f"  [serial_buses.{args.bus}]\n  baudrate = {bus.baudrate}\n  parity = \"{bus.parity}\"")
+    except RuntimeError as e:
+        print(f"✗ {e}")
+        sys.exit(2)
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+        sys.exit(1)
+    finally:
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,8 @@ import struct
 import time
 import sys
 
+from g540_registers import BY_NAME, RegisterBlock, IDENT_G500, CMD_FORWARD, CMD_STOP
+
 # ==================== CONFIGURATION ====================
 PORT = '/dev/ttyUSB0'           # USB-RS485 adapter
 BAUD_RATE = 9600                # Found via scanner: 9600 (P14.01=3)
@@ -23,30 +25,17 @@ SLAVE_ADDR = 3                  # Fan VFD address (P14.00=3)
 TIMEOUT = 1.0                   # 1 second timeout
 
 # ==================== REGISTER MAP ====================
-# Control commands (write to 0x2000)
-CMD_FORWARD = 0x0001
-CMD_REVERSE = 0x0002
-CMD_STOP = 0x0005
-CMD_COAST_STOP = 0x0006
-CMD_FAULT_RESET = 0x0007
-
-# Control/monitoring addresses
-REG_CONTROL_CMD = 0x2000        # Control command
-REG_FREQ_SET = 0x2001           # Frequency setting (0.01 Hz units)
-REG_STATE_1 = 0x2100            # State word 1
-REG_STATE_2 = 0x2101            # State word 2
-REG_FAULT_CODE = 0x2102         # Fault code
-REG_IDENT = 0x2103              # Identification code (should be 0x01A1)
+# Control commands (write to 0x2000) and control/monitoring addresses: g540_registers.py
+REG_CONTROL_CMD = BY_NAME['control'].address
+REG_FREQ_SET = BY_NAME['frequency_set'].address
+REG_STATE_1 = BY_NAME['state_1'].address
+REG_STATE_2 = BY_NAME['state_2'].address
+REG_FAULT_CODE = BY_NAME['fault_code'].address
+REG_IDENT = BY_NAME['ident'].address
+REG_SET_FREQ = BY_NAME['set_frequency'].address
 
-# Monitoring addresses
-REG_RUN_FREQ = 0x3000           # Running frequency (0.01 Hz)
-REG_SET_FREQ = 0x3001           # Set frequency (0.01 Hz)
-REG_BUS_VOLTAGE = 0x3002        # Bus voltage (0.1 V)
-REG_OUTPUT_VOLTAGE = 0x3003     # Output voltage (1 V)
-REG_OUTPUT_CURRENT = 0x3004     # Output current (0.1 A)
-REG_ROTATING_SPEED = 0x3005     # Rotating speed (RPM)
-REG_OUTPUT_POWER = 0x3006       # Output power (0.1 %)
-REG_OUTPUT_TORQUE = 0x3007      # Output torque (0.1 %)
+# Monitoring addresses 0x3000-0x3007, read and decoded as one block
+MEASUREMENTS = RegisterBlock(0x3000, 8)
 
 # Parameter addresses (function codes)
 PARAM_CMD_CHANNEL = 0x0001      # P00.01: Running command channel
@@ -235,7 +224,7 @@ def test_basic_communication(ser):
     if result:
         ident = result[0]
         print(f"✓ Identification: 0x{ident:04X}", end="")
-        if ident == 0x01A1:
+        if ident == IDENT_G500:
             print(" (CONFIRMED: GALT G500 series)")
         else:
             print(" (WARNING: Unexpected value)")
@@ -309,28 +298,13 @@ def read_vfd_measurements(ser):
     print("VFD MEASUREMENTS")
     print("="*70)
     
-    measurements = [
-        (REG_RUN_FREQ, "Running Frequency", 0.01, "Hz"),
-        (REG_SET_FREQ, "Set Frequency", 0.01, "Hz"),
-        (REG_BUS_VOLTAGE, "Bus Voltage", 0.1, "V"),
-        (REG_OUTPUT_VOLTAGE, "Output Voltage", 1.0, "V"),
-        (REG_OUTPUT_CURRENT, "Output Current", 0.1, "A"),
-        (REG_ROTATING_SPEED, "Rotating Speed", 1.0, "RPM"),
-        (REG_OUTPUT_POWER, "Output Power", 0.1, "%"),
-        (REG_OUTPUT_TORQUE, "Output Torque", 0.1, "%"),
-    ]
-    
-    for addr, name, scale, unit in measurements:
-        result = read_registers(ser, SLAVE_ADDR, addr, 1)
-        if result:
-            raw = result[0]
-            # Handle signed values for torque and power
-            if raw > 32767:
-                raw = raw - 65536
-            value = raw * scale
-            print(f"{name:20s}: {value:8.2f} {unit}")
+    result = read_registers(ser, SLAVE_ADDR, MEASUREMENTS.first, MEASUREMENTS.count)
+    record = MEASUREMENTS.decode_values(result) if result and len(result) == MEASUREMENTS.count else None
+    for reg in MEASUREMENTS.registers:
+        if record:
+            print(f"{reg.description:20s}: {getattr(record, reg.name):8.2f} {reg.units}")
         else:
-            print(f"{name:20s}: READ FAILED")
+            print(f"{reg.description:20s}: READ FAILED")
 
 def test_control_sequence(ser):
     """Test VFD control via Modbus (REQUIRES P00.01=2, P00.02=0)"""
@@ -353,7 +327,7 @@ def test_control_sequence(ser):
         # Verify
         result = read_registers(ser, SLAVE_ADDR, REG_SET_FREQ, 1)
         if result:
-            freq = result[0] * 0.01
+            freq = result[0] * BY_NAME['set_frequency'].scale
             print(f"✓ Verified: Set frequency = {freq:.2f} Hz")
     else:
         print("✗ FAILED to set frequency")
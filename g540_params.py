@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+GALT G540 VFD Parameter Backup / Restore Tool
+
+Backs up whole function-code groups (P00.xx -> 0x00xx ... P16.xx -> 0x16xx;
+the group digits are the high byte as written, the parameter number is the
+offset in the group) with block FC03 reads, stores them in a compact versioned JSON file, diffs
+a drive or backup against a golden file, and restores only the parameters
+that differ using FC16 block writes.
+
+Group lengths are not fixed across firmware versions, so each group is
+read in chunks until the drive answers with an exception; the readable
+prefix is then found by bisection and recorded in the file.
+
+Usage:
+    python3 g540_params.py backup  tower1.fan -o fan.json
+    python3 g540_params.py diff    tower1.fan --golden golden_fan.json
+    python3 g540_params.py diff    fan.json --golden golden_fan.json
+    python3 g540_params.py restore bus0/3 golden_fan.json [--dry-run]
+
+Restore requires the drive to be stopped. The communication parameters
+P14.00-P14.02 are skipped unless --include-comm is given, since changing
+them mid-restore drops the link.
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime
+
+from config import SERIAL_BUSES, TOWERS
+from vfd_controller import MultiVFDManager
+from g540_registers import BY_NAME, STATE_STOPPED
+
+FILE_FORMAT = 'g540-params'
+FILE_VERSION = 2                # 1: groups P10-P16 were read from the wrong registers
+
+# Function-code groups backed up by default (P07 records and P17+ monitoring are read-only)
+DEFAULT_GROUPS = [g for g in range(0, 17) if g != 7]
+MAX_GROUP_SIZE = 100            # Parameters probed per group
+READ_CHUNK = 32                 # Registers per FC03 read
+WRITE_CHUNK = 16                # Registers per FC16 write
+COMM_PARAMS = range(0x1400, 0x1403)  # P14.00-P14.02: address, baud rate, parity
+REG_IDENT = BY_NAME['ident'].address
+
+
+def group_base(group):
+    """First register of a parameter group: P14 -> 0x1400"""
+    return int(f"{group:02d}", 16) << 8
+
+
+def param_name(register):
+    return f"P{register >> 8:02X}.{register & 0xFF:02d}"
+
+
+def _read_block(vfd, register, count):
+    values = vfd.read_register(register, count=count, retries=1, max_age=0)
+    if values is not None and count == 1:
+        values = [values]
+    return values
+
+
+def read_group(vfd, group, max_size=MAX_GROUP_SIZE, chunk=READ_CHUNK):
+    """Read a parameter group with block reads; stops at the end of the group"""
+    base = group_base(group)
+    values = []
+    while len(values) < max_size:
+        count = min(chunk, max_size - len(values))
+        block = _read_block(vfd, base + len(values), count)
+        if block is not None:
+            values += block
+            continue
+
+        # The group ends inside this chunk: bisect for the readable prefix
+        good, bad, tail = 0, count, []
+        while bad - good > 1:
+            mid = (good + bad) // 2
+            block = _read_block(vfd, base + len(values), mid)
+            if block is not None:
+                good, tail = mid, block
+            else:
+                bad = mid
+        return values + tail
+    return values
+
+
+def backup(vfd, groups=DEFAULT_GROUPS):
+    """Snapshot of the drive's parameters as a backup dict"""
+    ident = _read_block(vfd, REG_IDENT, 1)
+    if ident is None:
+        raise RuntimeError(f"{vfd.description}: no response")
+
+    data = {}
+    for group in groups:
+        values = read_group(vfd, group)
+        print(f"  P{group:02d}: {len(values)} parameters")
+        if values:
+            data[f"{group:02d}"] = values
+
+    return {
+        'format': FILE_FORMAT,
+        'version': FILE_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'drive': {'description': vfd.description, 'address': vfd.address, 'ident': ident[0]},
+        'groups': data
+    }
+
+
+def save(snapshot, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def load(path):
+    with open(path) as f:
+        snapshot = json.load(f)
+    if snapshot.get('format') != FILE_FORMAT:
+        raise ValueError(f"{path}: not a G540 parameter file")
+    if snapshot.get('version', 0) > FILE_VERSION:
+        raise ValueError(f"{path}: file version {snapshot['version']} is newer than this tool")
+    if snapshot.get('version', 0) < 2 and any(int(group) >= 10 for group in snapshot['groups']):
+        raise ValueError(f"{path}: version 1 file, its groups P10 and up were read from the "
+                         f"wrong registers; take a new backup")
+    return snapshot
+
+
+def to_registers(snapshot):
+    """Flatten a backup into {register: value}"""
+    registers = {}
+    for group, values in snapshot['groups'].items():
+        base = group_base(int(group))
+        for index, value in enumerate(values):
+            registers[base + index] = value
+    return registers
+
+
+def diff(golden, current):
+    """(register, golden value, current value) for every parameter both hold that differs"""
+    golden, current = to_registers(golden), to_registers(current)
+    return [(reg, golden[reg], current[reg]) for reg in sorted(golden)
+            if reg in current and golden[reg] != current[reg]]
+
+
+def _runs(registers):
+    """Group sorted registers into contiguous runs of at most WRITE_CHUNK"""
+    runs = []
+    for reg in registers:
+        if runs and reg == runs[-1][-1] + 1 and len(runs[-1]) < WRITE_CHUNK:
+            runs[-1].append(reg)
+        else:
+            runs.append([reg])
+    return runs
+
+
+def restore(vfd, golden, include_comm=False, dry_run=False):
+    """Write only the parameters that differ from the golden backup"""
+    groups = [int(g) for g in golden['groups']]
+    current = backup(vfd, groups)
+    changes = {reg: want for reg, want, _ in diff(golden, current)
+               if include_comm or reg not in COMM_PARAMS}
+
+    if not changes:
+        print("✓ Drive already matches the golden configuration")
+        return True
+
+    failed = []
+    for run in _runs(sorted(changes)):
+        values = [changes[reg] for reg in run]
+        label = param_name(run[0]) + (f"..{param_name(run[-1])}" if len(run) > 1 else "")
+        if dry_run:
+            print(f"  would write {label}: {values}")
+            continue
+        if vfd.write_registers(run[0], values):
+            print(f"✓ {label}")
+            continue
+
+        # A read-only or out-of-range parameter rejects the whole block; retry one by one
+        for reg in run:
+            if vfd.write_register(reg, changes[reg]):
+                print(f"✓ {param_name(reg)}")
+            else:
+                print(f"✗ {param_name(reg)} = {changes[reg]} rejected")
+                failed.append(reg)
+
+    print(f"\n{len(changes) - len(failed)}/{len(changes)} parameters "
+          f"{'to restore' if dry_run else 'restored'}")
+    return not failed
+
+
+def _open_drive(manager, drive):
+    vfd = manager.get_vfd(drive)
+    if vfd is None:
+        print(f"✗ Unknown drive '{drive}' (use a '<tower>.<role>' name or 'bus/slave')")
+        sys.exit(1)
+    if not manager.connect():
+        print("✗ Cannot open serial port")
+        sys.exit(1)
+    return vfd
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GALT G540 parameter backup / restore")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('backup', help="Read parameter groups to a file")
+    p.add_argument('drive', help="'<tower>.<role>' or 'bus/slave'")
+    p.add_argument('-o', '--output', required=True)
+    p.add_argument('--groups', help="Comma-separated group numbers (default: P00-P16 except P07)")
+
+    p = sub.add_parser('diff', help="Compare a drive or backup file against a golden file")
+    p.add_argument('source', help="Drive name/address, or a backup file")
+    p.add_argument('--golden', required=True)
+
+    p = sub.add_parser('restore', help="Write parameters that differ from a golden file")
+    p.add_argument('drive')
+    p.add_argument('golden')
+    p.add_argument('--include-comm', action='store_true', help="Also restore P14.00-P14.02")
+    p.add_argument('--dry-run', action='store_true')
+    p.add_argument('--force', action='store_true', help="Restore even if the drive is not stopped")
+
+    args = parser.parse_args()
+
+    if args.command == 'diff' and os.path.isfile(args.source):
+        golden, current = load(args.golden), load(args.source)
+        manager = None
+    else:
+        manager = MultiVFDManager.from_config(SERIAL_BUSES, TOWERS)
+
+    try:
+        if args.command == 'backup':
+            vfd = _open_drive(manager, args.drive)
+            groups = [int(g) for g in args.groups.split(',')] if args.groups else DEFAULT_GROUPS
+            print(f"Backing up {vfd.description} ({vfd.address})...")
+            snapshot = backup(vfd, groups)
+            save(snapshot, args.output)
+            count = sum(len(v) for v in snapshot['groups'].values())
+            print(f"✓ {count} parameters saved to {args.output}")
+
+        elif args.command == 'diff':
+            if manager:
+                golden = load(args.golden)
+                vfd = _open_drive(manager, args.source)
+                current = backup(vfd, [int(g) for g in golden['groups']])
+            changes = diff(golden, current)
+            for reg, want, have in changes:
+                print(f"{param_name(reg)}: golden={want} current={have}")
+            print(f"{len(changes)} parameter(s) differ")
+            sys.exit(1 if changes else 0)
+
+        elif args.command == 'restore':
+            golden = load(args.golden)
+            vfd = _open_drive(manager, args.drive)
+            state = _read_block(vfd, vfd.REG_STATE_1, 1)
+            if not args.force and (state is None or state[0] != STATE_STOPPED):
+                print("✗ Drive must be stopped to restore parameters (use --force to override)")
+                sys.exit(1)
+            print(f"Restoring {vfd.description} ({vfd.address}) from {args.golden}...")
+            if not restore(vfd, golden, args.include_comm, args.dry_run):
+                sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+        sys.exit(1)
+    finally:
+        if manager:
+            manager.close()
+
+
+if __name__ == "__main__":
+    main()
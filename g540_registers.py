@@ -0,0 +1,104 @@
+"""
+GALT G540 register map
+
+One declarative table of the control, state and monitoring registers
+(address, scale, units, signedness, access), shared by the drive
+controller and the diagnostic and scanner tools. A RegisterBlock compiles
+a contiguous address range into one struct format, so a block read is
+decoded into a typed record by a single struct.unpack_from call instead
+of per-register shifting and scaling. Registers added to REGISTERS show
+up in the decoded records of the block that covers them.
+
+Function-code parameters (Pxx.yy) are not listed here; see g540_params.py.
+"""
+
+import struct
+from collections import namedtuple
+
+Register = namedtuple('Register', 'name address scale units signed access description')
+
+REGISTERS = (
+    # Control (write)
+    Register('control', 0x2000, 1, '', False, 'w', 'Control command'),
+    Register('frequency_set', 0x2001, 0.01, 'Hz', False, 'rw', 'Frequency setting'),
+    # State
+    Register('state_1', 0x2100, 1, '', False, 'r', 'State word 1'),
+    Register('state_2', 0x2101, 1, '', False, 'r', 'State word 2'),
+    Register('fault_code', 0x2102, 1, '', False, 'r', 'Fault code'),
+    Register('ident', 0x2103, 1, '', False, 'r', 'Identification code (0x01A1 for G500)'),
+    # Monitoring
+    Register('run_frequency', 0x3000, 0.01, 'Hz', False, 'r', 'Running frequency'),
+    Register('set_frequency', 0x3001, 0.01, 'Hz', False, 'r', 'Set frequency'),
+    Register('bus_voltage', 0x3002, 0.1, 'V', False, 'r', 'Bus voltage'),
+    Register('output_voltage', 0x3003, 1, 'V', False, 'r', 'Output voltage'),
+    Register('output_current', 0x3004, 0.1, 'A', False, 'r', 'Output current'),
+    Register('rotating_speed', 0x3005, 1, 'RPM', False, 'r', 'Rotating speed'),
+    Register('output_power', 0x3006, 0.1, '%', True, 'r', 'Output power'),    # Negative when regenerating
+    Register('output_torque', 0x3007, 0.1, '%', True, 'r', 'Output torque'),
+)
+
+BY_NAME = {reg.name: reg for reg in REGISTERS}
+BY_ADDRESS = {reg.address: reg for reg in REGISTERS}
+
+# Control commands (written to 'control')
+CMD_FORWARD = 0x0001
+CMD_REVERSE = 0x0002
+CMD_STOP = 0x0005
+CMD_COAST_STOP = 0x0006
+CMD_FAULT_RESET = 0x0007
+
+# State word 1 values
+STATE_NAMES = {
+    0x0001: 'Forward',
+    0x0002: 'Reverse',
+    0x0003: 'Stopped',
+    0x0004: 'Fault',
+    0x0005: 'PowerOff',
+    0x0006: 'PreExcited',
+}
+RUNNING_STATES = (0x0001, 0x0002)  # Forward, Reverse
+STATE_STOPPED = 0x0003
+
+IDENT_G500 = 0x01A1
+
+
+class RegisterBlock:
+    """Precompiled decoder for a contiguous register range"""
+
+    def __init__(self, first, count, registers=REGISTERS):
+        """
+        Initialize register block.
+
+        Args:
+            first: First register address
+            count: Number of registers (the FC03 read length)
+            registers: Register map; addresses in the range without an entry are skipped
+        """
+        self.first = first
+        self.count = count
+        self.registers = tuple(sorted((reg for reg in registers if first <= reg.address < first + count),
+                                      key=lambda reg: reg.address))
+        by_address = {reg.address: reg for reg in self.registers}
+        layout = []
+        for offset in range(count):
+            reg = by_address.get(first + offset)
+            layout.append(('h' if reg.signed else 'H') if reg else '2x')
+        self.struct = struct.Struct('>' + ''.join(layout))
+        self.words = struct.Struct(f'>{count}H')
+        self.record = namedtuple('Record', [reg.name for reg in self.registers])
+        self.scales = tuple(reg.scale for reg in self.registers)
+
+    def decode(self, payload, offset=0):
+        """Typed, scaled record from raw big-endian register bytes (an FC03 payload)"""
+        raw = self.struct.unpack_from(payload, offset)
+        return self.record._make(value if scale == 1 else value * scale
+                                 for value, scale in zip(raw, self.scales))
+
+    def decode_values(self, values):
+        """Record from unsigned register values as read (e.g. the shadow cache)"""
+        return self.decode(self.words.pack(*values))
+
+
+# Blocks the controller polls for status
+STATE_BLOCK = RegisterBlock(0x2100, 3)      # state words 1/2, fault code
+MONITOR_BLOCK = RegisterBlock(0x3000, 7)    # run frequency .. output power
@@ -9,11 +9,13 @@ import struct
 import time
 import sys
 
+from g540_registers import BY_NAME, STATE_NAMES, IDENT_G500
+
 PORT = '/dev/ttyUSB0'
 TIMEOUT = 0.5  # Shorter timeout for scanning
 
 # Register to test - Identification should return 0x01A1 for G500
-TEST_REGISTER = 0x2103
+TEST_REGISTER = BY_NAME['ident'].address
 
 def crc16(data):
     """Calculate Modbus RTU CRC-16"""
@@ -149,7 +151,7 @@ def main():
                         print(f"Slave Address: {slave}")
                         print(f"Identification: 0x{result:04X}", end="")
                         
-                        if result == 0x01A1:
+                        if result == IDENT_G500:
                             print(" (CONFIRMED: GALT G500 series)")
                         else:
                             print(" (Unknown device)")
@@ -170,30 +172,16 @@ def main():
                         print("\nAttempting to read additional parameters...")
                         
                         # Try to read state word 1 (0x2100)
-                        state1 = test_connection(ser, slave, 0x2100)
+                        state1 = test_connection(ser, slave, BY_NAME['state_1'].address)
                         if state1 is not None:
-                            states = {
-                                0x0001: "Forward running",
-                                0x0002: "Reverse running", 
-                                0x0003: "Stopped",
-                                0x0004: "Fault",
-                                0x0005: "Power off",
-                                0x0006: "Pre-excited"
-                            }
-                            state_str = states.get(state1, f"Unknown (0x{state1:04X})")
+                            state_str = STATE_NAMES.get(state1, f"Unknown (0x{state1:04X})")
                             print(f"  VFD State: {state_str}")
                         
-                        # Try to read running frequency (0x3000)
-                        freq = test_connection(ser, slave, 0x3000)
-                        if freq is not None:
-                            freq_hz = freq * 0.01
-                            print(f"  Running Frequency: {freq_hz:.2f} Hz")
-                        
-                        # Try to read bus voltage (0x3002)
-                        bus_v = test_connection(ser, slave, 0x3002)
-                        if bus_v is not None:
-                            voltage = bus_v * 0.1
-                            print(f"  Bus Voltage: {voltage:.1f} V")
+                        # Try to read running frequency (0x3000) and bus voltage (0x3002)
+                        for reg in (BY_NAME['run_frequency'], BY_NAME['bus_voltage']):
+                            raw = test_connection(ser, slave, reg.address)
+                            if raw is not None:
+                                print(f"  {reg.description}: {raw * reg.scale:.2f} {reg.units}")
                         
                         ser.close()
                         print("\n" + "="*70)
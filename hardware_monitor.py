@@ -0,0 +1,109 @@
+"""
+Background hardware bring-up and hotplug
+
+The control daemon starts without waiting for its hardware: serial buses
+and the ADS1115 are brought up by this thread, retried until they appear,
+and serial adapters that are unplugged and plugged back in are reopened.
+Until then the daemon serves degraded status (drives read as NoComm,
+sensors unavailable) instead of failing.
+"""
+
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HardwareMonitor(threading.Thread):
+    """Retries hardware bring-up and follows USB serial hotplug"""
+
+    def __init__(self, vfd_manager, sensor_factory, interval=2.0, on_change=None):
+        """
+        Initialize hardware monitor.
+
+        Args:
+            vfd_manager: MultiVFDManager whose buses are opened / reopened
+            sensor_factory: Function returning a SensorManager; raises while the ADC is absent
+            interval: Seconds between checks
+            on_change: Optional callback(status) when a bus or the sensors come or go
+        """
+        super().__init__(name='hardware', daemon=True)
+        self.vfd_manager = vfd_manager
+        self.sensor_factory = sensor_factory
+        self.interval = interval
+        self.on_change = on_change
+
+        self.sensors = None
+        self.sensor_error = None
+        self.buses = {}
+        self.attached_at = {}  # bus name / 'sensors' -> time it last came up
+        self._stop_event = threading.Event()
+
+    @property
+    def ready(self):
+        """All buses open and sensors up"""
+        return self.sensors is not None and bool(self.buses) and all(self.buses.values())
+
+    def check(self):
+        """One bring-up / hotplug pass; returns True if anything changed"""
+        changed = False
+        try:
+            buses = self.vfd_manager.check_buses()
+        except Exception as e:
+            logger.error(f"Serial bus check failed: {e}")
+            buses = {name: False for name in self.vfd_manager.buses}
+        for name, connected in buses.items():
+            if connected != self.buses.get(name):
+                changed = True
+                if connected:
+                    self.attached_at[name] = time.time()
+                    logger.info(f"Bus '{name}' attached")
+                elif name in self.buses:
+                    logger.warning(f"Bus '{name}' detached")
+        self.buses = buses
+
+        if self.sensors is None:
+            try:
+                self.sensors = self.sensor_factory()
+                self.sensor_error = None
+                self.attached_at['sensors'] = time.time()
+                changed = True
+                logger.info("Sensors attached")
+            except Exception as e:
+                if self.sensor_error is None:
+                    changed = True
+                self.sensor_error = str(e)
+
+        if changed and self.on_change:
+            self.on_change(self.get_status())
+        return changed
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.check()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+    def errors(self):
+        """Human-readable list of hardware that is not up"""
+        errors = [f"Serial bus '{name}' ({self.vfd_manager.buses[name].port}) not connected"
+                  for name, connected in self.buses.items() if not connected]
+        if self.sensors is None:
+            errors.append(f"Sensors not available: {self.sensor_error or 'not initialized'}")
+        return errors
+
+    def get_status(self):
+        return {
+            'ready': self.ready,
+            'buses': {name: {
+                'port': self.vfd_manager.buses[name].port,
+                'connected': connected,
+                'reconnects': self.vfd_manager.buses[name].reconnects
+            } for name, connected in self.buses.items()},
+            'sensors': self.sensors is not None,
+            'sensor_error': self.sensor_error,
+            'attached_at': dict(self.attached_at)
+        }
@@ -0,0 +1,463 @@
+"""
+Validated, hot-reloadable configuration overrides
+
+config.py holds the defaults. An optional TOML file overrides any of its
+dict sections, using the lower-case section name as the table:
+
+    [control_params]
+    target_pressure = 16.0
+
+    [towers.tower1.vfds.pump_backup]
+    device_id = 4
+
+The merged configuration is type- and range-checked as a whole; a file
+with any error is rejected and the running values stay untouched. Valid
+changes are written into the config.py dicts in place (every module sees
+them through `from config import *`) and pushed into the live control
+objects. The check runs in the control scheduler's telemetry lane, i.e.
+between control cycles, so a cycle never sees half a reload. Serial
+buses, the gateway and the scheduler itself are only read at startup;
+changes to them are reported as needing a restart.
+"""
+
+import os
+import copy
+import logging
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+import config
+from pressure_autotune import TUNING_RULES
+
+logger = logging.getLogger(__name__)
+
+
+class Field:
+    """Type and range rule for one config value"""
+
+    def __init__(self, kind, min_value=None, max_value=None, optional=False):
+        self.kind = kind
+        self.min_value = min_value
+        self.max_value = max_value
+        self.optional = optional
+
+    def check(self, path, value):
+        if value is None and self.optional:
+            return None
+        if self.kind is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if self.kind is not bool and isinstance(value, bool) or not isinstance(value, self.kind):
+            return f"{path}: expected {self.kind.__name__}, got {type(value).__name__}"
+        if self.min_value is not None and value < self.min_value:
+            return f"{path}: {value} is below {self.min_value}"
+        if self.max_value is not None and value > self.max_value:
+            return f"{path}: {value} is above {self.max_value}"
+        return None
+
+
+HZ = Field(float, 0.0, 120.0)
+SECONDS = Field(float, 0.0, 86400.0)
+
+# Sections applied live, and the fields they may contain
+LIVE_SCHEMA = {
+    'CONTROL_PARAMS': {
+        'target_pressure': Field(float, 0.0, 100.0),
+        'pressure_tolerance': Field(float, 0.0, 50.0),
+        'kp': Field(float, 0.0, 100.0),
+        'ki': Field(float, 0.0, 10.0),
+        'min_frequency': HZ,
+        'max_frequency': HZ,
+    },
+    'ESTOP': {
+        'command': Field(int, 5, 6),
+        'repeats': Field(int, 1, 5),
+        'deadline': Field(float, 0.5, 30.0),
+        'read_timeout': Field(float, 0.05, 2.0),
+    },
+    'SEQUENCES': {
+        'poll_interval': Field(float, 0.05, 5.0),
+        'command_timeout': Field(float, 5.0, 600.0),
+        'start': list,     # Checked by _check_sequences
+        'stop': list,
+    },
+    'AUTOTUNE': {
+        'relay_amplitude': Field(float, 0.5, 30.0),
+        'hysteresis': Field(float, 0.0, 10.0),
+        'max_deviation': Field(float, 1.0, 50.0),
+        'cycles': Field(int, 2, 20),
+        'max_cycles': Field(int, 3, 100),
+        'max_duration': Field(float, 10.0, 3600.0),
+        'rule': Field(str),
+        'max_kp': Field(float, 0.0, 100.0),
+        'max_ki': Field(float, 0.0, 10.0),
+        'apply': Field(bool),
+    },
+    'FAN_CONTROL': {
+        'enabled': Field(bool),
+        'temperature_setpoint': Field(float, 32.0, 120.0),
+        'kp': Field(float, 0.0, 10.0),
+        'ki': Field(float, 0.0, 1.0),
+        'deadband': Field(float, 0.0, 20.0),
+        'min_frequency': HZ,
+        'max_frequency': HZ,
+        'rated_frequency': Field(float, 1.0, 120.0),
+        'rate_limit': Field(float, 0.01, 60.0),
+        'trim_rate': Field(float, 0.0, 60.0),
+        'update_interval': Field(float, 0.1, 3600.0),
+        'start_frequency': HZ,
+    },
+    'PUMP_FAILOVER': {
+        'health_check_interval': Field(float, 0.1, 3600.0),
+        'max_consecutive_errors': Field(int, 1, 1000),
+        'auto_failover_enabled': Field(bool),
+    },
+    'PUMP_ROTATION': {
+        'enabled': Field(bool),
+        'rotation_hours': Field(float, 0.1, 10000.0),
+        'handover_ramp_time': SECONDS,
+        'runtime_file': Field(str),
+        'save_interval': SECONDS,
+    },
+    'PUMP_STAGING': {
+        'enabled': Field(bool),
+        'stage_frequency': HZ,
+        'stage_delay': SECONDS,
+        'destage_frequency': HZ,
+        'destage_delay': SECONDS,
+        'stage_ramp_time': SECONDS,
+    },
+    'ALARMS': {
+        'enabled': Field(bool),
+        'raise_delay': SECONDS,
+        'clear_delay': SECONDS,
+        'history_size': Field(int, 1, 100000),
+        'long_poll_timeout': Field(float, 1.0, 300.0),
+    },
+    'FAULT_RECOVERY': {
+        'enabled': Field(bool),
+        'verify_timeout': Field(float, 0.5, 600.0),
+        'lockout_poll': Field(float, 0.5, 3600.0),
+        'policies': dict,  # Checked by _check_policies
+    },
+    'TOWERS': dict,        # Checked by _check_towers
+}
+
+# Sections read once at startup
+RESTART_SECTIONS = (
+    'SERIAL_BUSES', 'REGISTER_CACHE', 'ADAPTIVE_POLLING', 'MODBUS_GATEWAY',
+    'CONTROL_SCHEDULER', 'PUMP_HEALTH', 'ENERGY_METER', 'SENSOR_CONFIG', 'EVENT_LOG',
+    'CONTROL_DAEMON', 'HARDWARE', 'CAPTURE', 'BUS_CAPTURE',
+)
+
+POLICY_SCHEMA = {
+    'max_attempts': Field(int, 0, 100),
+    'delay': SECONDS,
+    'window': SECONDS,
+}
+
+STEP_SCHEMA = {
+    'step': Field(str),
+    'action': Field(str, optional=True),
+    'after': Field(list),
+    'drives': Field(list),
+    'until': dict,         # Checked by _check_sequences
+    'timeout': Field(float, 0.1, 3600.0),
+}
+
+UNTIL_SCHEMA = {
+    'state': Field(str),
+    'min_frequency': HZ,
+    'max_frequency': HZ,
+}
+
+SEQUENCE_DRIVES = ('fan', 'lead_pump', 'pump_primary', 'pump_backup')
+
+VFD_SCHEMA = {
+    'device_id': Field(int, 1, 247),
+    'address': Field(str),
+    'bus': Field(str),
+    'description': Field(str),
+    'type': Field(str),
+    'rated_power_kw': Field(float, 0.0, 1000.0),
+}
+
+
+def deep_merge(base, overrides):
+    """Copy of base with overrides merged in (nested dicts merge, other values replace)"""
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def update_in_place(target, source):
+    """Make target equal to source without replacing the nested dict objects"""
+    for key in list(target):
+        if key not in source:
+            del target[key]
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            update_in_place(target[key], value)
+        else:
+            target[key] = value
+
+
+def _check_fields(path, values, schema, errors):
+    for key, value in values.items():
+        field = schema.get(key)
+        if field is None:
+            errors.append(f"{path}.{key}: unknown setting")
+        elif isinstance(field, Field):
+            error = field.check(f"{path}.{key}", value)
+            if error:
+                errors.append(error)
+
+
+def _check_policies(policies, errors):
+    if not isinstance(policies, dict):
+        errors.append("FAULT_RECOVERY.policies: expected a table")
+        return
+    for name, policy in policies.items():
+        if not isinstance(policy, dict):
+            errors.append(f"FAULT_RECOVERY.policies.{name}: expected a table")
+            continue
+        _check_fields(f"FAULT_RECOVERY.policies.{name}", policy, POLICY_SCHEMA, errors)
+
+
+def _check_sequences(sequences, errors):
+    for name in ('start', 'stop'):
+        steps = sequences[name]
+        if not isinstance(steps, list):
+            errors.append(f"SEQUENCES.{name}: expected an array of tables")
+            continue
+        names = set()
+        for index, step in enumerate(steps):
+            path = f"SEQUENCES.{name}[{index}]"
+            if not isinstance(step, dict) or 'step' not in step:
+                errors.append(f"{path}: expected a table with a 'step' name")
+                continue
+            _check_fields(path, step, STEP_SCHEMA, errors)
+            if step['step'] in names:
+                errors.append(f"{path}: duplicate step '{step['step']}'")
+            names.add(step['step'])
+            for drive in step.get('drives', []):
+                if drive not in SEQUENCE_DRIVES:
+                    errors.append(f"{path}.drives: unknown drive '{drive}'")
+            until = step.get('until', {})
+            if not isinstance(until, dict):
+                errors.append(f"{path}.until: expected a table")
+                continue
+            _check_fields(f"{path}.until", until, UNTIL_SCHEMA, errors)
+            if until.get('state', 'running') not in ('running', 'stopped'):
+                errors.append(f"{path}.until.state: expected 'running' or 'stopped'")
+        for index, step in enumerate(steps):
+            after = step.get('after', []) if isinstance(step, dict) else []
+            for dependency in (after if isinstance(after, list) else []):
+                if dependency not in names:
+                    errors.append(f"SEQUENCES.{name}[{index}].after: unknown step '{dependency}'")
+
+
+def _check_towers(towers, buses, errors):
+    if config.CONTROL_TOWER not in towers:
+        errors.append(f"TOWERS: control tower '{config.CONTROL_TOWER}' missing")
+    for tower, tower_cfg in towers.items():
+        vfds = tower_cfg.get('vfds') if isinstance(tower_cfg, dict) else None
+        if not isinstance(vfds, dict):
+            errors.append(f"TOWERS.{tower}.vfds: expected a table")
+            continue
+        addresses = set()
+        for role, cfg in vfds.items():
+            path = f"TOWERS.{tower}.vfds.{role}"
+            if not isinstance(cfg, dict):
+                errors.append(f"{path}: expected a table")
+                continue
+            _check_fields(path, cfg, VFD_SCHEMA, errors)
+            if 'address' in cfg:
+                bus, _, slave = str(cfg['address']).partition('/')
+                if not slave.isdigit():
+                    errors.append(f"{path}.address: expected 'bus/slave'")
+                    continue
+            else:
+                bus, slave = cfg.get('bus', next(iter(buses), None)), cfg.get('device_id')
+            if bus not in buses:
+                errors.append(f"{path}: unknown bus '{bus}'")
+            if (bus, str(slave)) in addresses:
+                errors.append(f"{path}: duplicate address {bus}/{slave}")
+            addresses.add((bus, str(slave)))
+        if tower == config.CONTROL_TOWER:
+            for role in ('fan', 'pump_primary', 'pump_backup'):
+                if role not in vfds:
+                    errors.append(f"TOWERS.{tower}.vfds: '{role}' is required")
+
+
+def validate(candidate):
+    """List of problems with a merged configuration (empty if valid)"""
+    errors = []
+    for section, schema in LIVE_SCHEMA.items():
+        values = candidate[section]
+        if isinstance(schema, dict):
+            _check_fields(section, values, schema, errors)
+
+    _check_policies(candidate['FAULT_RECOVERY'].get('policies', {}), errors)
+    _check_towers(candidate['TOWERS'], candidate['SERIAL_BUSES'], errors)
+    _check_sequences(candidate['SEQUENCES'], errors)
+    if errors:
+        return errors  # Cross-field checks assume well-typed values
+
+    for section in ('CONTROL_PARAMS', 'FAN_CONTROL'):
+        values = candidate[section]
+        if values['min_frequency'] >= values['max_frequency']:
+            errors.append(f"{section}: min_frequency must be below max_frequency")
+    staging = candidate['PUMP_STAGING']
+    if staging['destage_frequency'] >= staging['stage_frequency']:
+        errors.append("PUMP_STAGING: destage_frequency must be below stage_frequency")
+    autotune = candidate['AUTOTUNE']
+    if autotune['rule'] not in TUNING_RULES:
+        errors.append(f"AUTOTUNE.rule: unknown tuning rule '{autotune['rule']}'")
+    if autotune['max_cycles'] <= autotune['cycles']:
+        errors.append("AUTOTUNE: max_cycles must be above cycles")
+    return errors
+
+
+class ConfigManager:
+    """Loads the override file and applies valid changes between control cycles"""
+
+    def __init__(self, path, on_reload=None):
+        """
+        Args:
+            path: TOML override file (may not exist yet)
+            on_reload: Optional callback(changed live sections) after a reload is applied
+        """
+        self.path = path
+        self.on_reload = on_reload
+        sections = tuple(LIVE_SCHEMA) + RESTART_SECTIONS
+        self.defaults = {name: copy.deepcopy(getattr(config, name)) for name in sections}
+        self.applied = copy.deepcopy(self.defaults)
+        self._mtime = None
+        self.reloads = 0
+        self.last_error = None
+        self.pending_restart = []
+
+    def _read(self):
+        if tomllib is None:
+            raise RuntimeError("TOML support needs Python 3.11+ or the 'tomli' package")
+        with open(self.path, 'rb') as f:
+            data = tomllib.load(f)
+        overrides = {}
+        for table, values in data.items():
+            section = table.upper()
+            if section not in self.defaults:
+                raise ValueError(f"[{table}]: unknown section")
+            if not isinstance(values, dict):
+                raise ValueError(f"{table}: expected a table")
+            overrides[section] = values
+        return overrides
+
+    def load(self, force=False):
+        """
+        Apply the override file if it changed since the last call.
+
+        Returns:
+            True if new settings were applied
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime if os.path.exists(self.path) else None
+        except OSError:
+            mtime = None
+        if not force and mtime == self._mtime:
+            return False
+        self._mtime = mtime
+
+        try:
+            overrides = self._read() if mtime is not None else {}
+        except Exception as e:
+            self.last_error = [f"{self.path}: {e}"]
+            logger.error(f"Config reload rejected: {e}")
+            return False
+
+        candidate = {name: deep_merge(self.defaults[name], overrides.get(name, {}))
+                     for name in self.defaults}
+        errors = validate(candidate)
+        if errors:
+            self.last_error = errors
+            logger.error(f"Config reload rejected ({len(errors)} error(s)): {'; '.join(errors)}")
+            return False
+        self.last_error = None
+
+        changed = [name for name in LIVE_SCHEMA if candidate[name] != self.applied[name]]
+        restart = [name for name in RESTART_SECTIONS if candidate[name] != self.applied[name]]
+        if self.reloads == 0:
+            # First load happens before anything is built; startup sections apply too
+            changed, restart = changed + restart, []
+        elif restart:
+            logger.warning(f"Config changes to {', '.join(restart)} take effect after a restart")
+        self.pending_restart = sorted(set(self.pending_restart) | set(restart))
+
+        for name in changed:
+            update_in_place(getattr(config, name), candidate[name])
+            self.applied[name] = candidate[name]
+        self.reloads += 1
+
+        if changed and self.reloads > 1:
+            logger.info(f"Config reloaded: {', '.join(changed)}")
+            if self.on_reload:
+                self.on_reload(changed)
+        return bool(changed)
+
+    def get_status(self):
+        return {
+            'path': self.path,
+            'loaded': self._mtime is not None,
+            'reloads': self.reloads,
+            'errors': self.last_error,
+            'pending_restart': self.pending_restart
+        }
+
+
+def apply_sections(sections, fan_control=None, pump_manager=None, alarms=None,
+                   recovery=None, vfd_manager=None):
+    """Push reloaded config sections into the running control objects"""
+    if fan_control and 'FAN_CONTROL' in sections:
+        cfg = config.FAN_CONTROL
+        fan_control.setpoint = cfg['temperature_setpoint']
+        for key in ('kp', 'ki', 'deadband', 'min_frequency', 'max_frequency', 'rated_frequency',
+                    'rate_limit', 'trim_rate', 'update_interval', 'start_frequency'):
+            setattr(fan_control, key, cfg[key])
+
+    if pump_manager:
+        if 'CONTROL_PARAMS' in sections:
+            pump_manager.min_frequency = config.CONTROL_PARAMS['min_frequency']
+        if 'PUMP_FAILOVER' in sections:
+            pump_manager.max_errors = config.PUMP_FAILOVER['max_consecutive_errors']
+            pump_manager.check_interval = config.PUMP_FAILOVER['health_check_interval']
+        if 'PUMP_ROTATION' in sections:
+            cfg = config.PUMP_ROTATION
+            pump_manager.rotation_hours = cfg['rotation_hours'] if cfg['enabled'] else None
+            pump_manager.handover_ramp_time = cfg['handover_ramp_time']
+            pump_manager.save_interval = cfg['save_interval']
+        if 'PUMP_STAGING' in sections:
+            cfg = config.PUMP_STAGING
+            pump_manager.stage_frequency = cfg['stage_frequency'] if cfg['enabled'] else None
+            for key in ('stage_delay', 'destage_frequency', 'destage_delay', 'stage_ramp_time'):
+                setattr(pump_manager, key, cfg[key])
+
+    if alarms and 'ALARMS' in sections:
+        alarms.raise_delay = config.ALARMS['raise_delay']
+        alarms.clear_delay = config.ALARMS['clear_delay']
+
+    if recovery and 'FAULT_RECOVERY' in sections:
+        recovery.policies = config.FAULT_RECOVERY['policies']
+        recovery.verify_timeout = config.FAULT_RECOVERY['verify_timeout']
+        recovery.lockout_poll = config.FAULT_RECOVERY['lockout_poll']
+
+    if vfd_manager and 'TOWERS' in sections:
+        vfd_manager.apply_towers(config.TOWERS)
@@ -1,26 +1,45 @@
 #!/usr/bin/env python3
 """
 Main control system for Cooling Tower with 3 GALT G540 VFDs
-- Fan motor (constant speed)
+- Fan motor (basin temperature control)
 - Primary pump (pressure control)
 - Backup pump (automatic failover)
+
+Headless alternative to control_daemon.py (no web dashboard); only one
+of the two may run, as both open the RS-485 bus.
 """
 
-import time
+import queue
 import logging
-from vfd_controller import MultiVFDManager
+import logging.handlers
+from vfd_controller import MultiVFDManager, RegisterCachePolicy
 from sensor_manager import SensorManager
 from pump_failover import PumpFailoverManager
+from pump_health import PumpHealthMonitor
+from fan_control import FanController
+from energy_meter import EnergyMeter
+from modbus_gateway import ModbusGateway
+from control_scheduler import ControlScheduler
+from pressure_control import BIAS_FREQUENCY, PressureController
+from sequencer import Sequencer, SequenceError
+from event_log import EventLog
+from bus_capture import BusCapture
+from alarm_manager import AlarmManager
+from fault_recovery import FaultRecovery
+from live_config import ConfigManager, apply_sections
 from config import *
 
-# Configure logging
+# Configure logging (file and console writes happen on a listener thread,
+# never on the control thread)
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+_log_handlers = [logging.FileHandler(LOG_FILE), logging.StreamHandler()]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+_log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(_log_queue, *_log_handlers)
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL),
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
@@ -28,49 +47,310 @@ class CoolingTowerController:
     """Main controller for cooling tower system with 3 VFDs"""
     
     def __init__(self):
-        # Initialize VFD manager with G540 settings
-        self.vfd_manager = MultiVFDManager(
-            port=SERIAL_PORT,
-            baudrate=SERIAL_BAUDRATE,
-            parity=SERIAL_PARITY,
-            stopbits=SERIAL_STOPBITS,
-            bytesize=SERIAL_BYTESIZE
-        )
+        # Apply config file overrides before anything reads the config
+        self.config = ConfigManager(CONFIG_FILE, on_reload=self._apply_config)
+        self.config.load()
+        
+        # Initialize VFD manager (one worker-polled RS-485 bus per SERIAL_BUSES entry)
+        cache_policy = None
+        if REGISTER_CACHE['enabled']:
+            cache_policy = RegisterCachePolicy(REGISTER_CACHE['policies'], REGISTER_CACHE['default_max_age'])
+        self.vfd_manager = MultiVFDManager.from_config(SERIAL_BUSES, TOWERS, cache_policy=cache_policy)
         
-        # Add VFDs
-        for name, cfg in VFD_CONFIG.items():
-            self.vfd_manager.add_vfd(name, cfg['device_id'], cfg['description'])
+        # Optional capture of the control tower's traffic for replay.py
+        self.capture = None
+        if CAPTURE['enabled']:
+            self.capture = EventLog(
+                CAPTURE['path'],
+                max_bytes=CAPTURE['max_bytes'],
+                backups=CAPTURE['backups'],
+                queue_size=CAPTURE['queue_size'],
+                flush_interval=CAPTURE['flush_interval']
+            )
+            self.vfd_manager.set_recorder(self.capture.record, tower=CONTROL_TOWER)
         
-        # Get VFD references
-        self.fan_vfd = self.vfd_manager.get_vfd('fan')
-        pump_primary = self.vfd_manager.get_vfd('pump_primary')
-        pump_backup = self.vfd_manager.get_vfd('pump_backup')
+        # Optional raw frame capture of every bus (bus_capture.py decode)
+        self.bus_capture = None
+        if BUS_CAPTURE['enabled']:
+            self.bus_capture = BusCapture(
+                BUS_CAPTURE['path'],
+                SERIAL_BUSES,
+                ring_size=BUS_CAPTURE['ring_size'],
+                max_bytes=BUS_CAPTURE['max_bytes'],
+                backups=BUS_CAPTURE['backups'],
+                flush_interval=BUS_CAPTURE['flush_interval']
+            )
+            self.vfd_manager.set_bus_capture(self.bus_capture)
+        
+        # Get VFD references for the tower this controller runs
+        vfds = self.vfd_manager.get_tower(CONTROL_TOWER)
+        self.fan_vfd = vfds['fan']
+        pump_primary = vfds['pump_primary']
+        pump_backup = vfds['pump_backup']
+        
+        self.fan_control = FanController(
+            setpoint=FAN_CONTROL['temperature_setpoint'],
+            kp=FAN_CONTROL['kp'],
+            ki=FAN_CONTROL['ki'],
+            deadband=FAN_CONTROL['deadband'],
+            min_frequency=FAN_CONTROL['min_frequency'],
+            max_frequency=FAN_CONTROL['max_frequency'],
+            rated_frequency=FAN_CONTROL['rated_frequency'],
+            rate_limit=FAN_CONTROL['rate_limit'],
+            trim_rate=FAN_CONTROL['trim_rate'],
+            update_interval=FAN_CONTROL['update_interval'],
+            start_frequency=FAN_CONTROL['start_frequency']
+        )
         
         # Initialize pump failover manager
+        health_monitor = None
+        if PUMP_HEALTH['enabled']:
+            health_monitor = PumpHealthMonitor(
+                rated_current=PUMP_HEALTH['rated_current'],
+                current_warn_ratio=PUMP_HEALTH['current_warn_ratio'],
+                current_slope_limit=PUMP_HEALTH['current_slope_limit'],
+                trend_window=PUMP_HEALTH['trend_window'],
+                latency_nominal=PUMP_HEALTH['latency_nominal'],
+                latency_limit=PUMP_HEALTH['latency_limit'],
+                failover_score=PUMP_HEALTH['failover_score'],
+                recover_score=PUMP_HEALTH['recover_score'],
+                trip_samples=PUMP_HEALTH['trip_samples'],
+                recover_time=PUMP_HEALTH['recover_time']
+            )
+        
         self.pump_manager = PumpFailoverManager(
             pump_primary,
             pump_backup,
             max_errors=PUMP_FAILOVER['max_consecutive_errors'],
-            check_interval=PUMP_FAILOVER['health_check_interval']
+            check_interval=PUMP_FAILOVER['health_check_interval'],
+            health_monitor=health_monitor,
+            rotation_hours=PUMP_ROTATION['rotation_hours'] if PUMP_ROTATION['enabled'] else None,
+            handover_ramp_time=PUMP_ROTATION['handover_ramp_time'],
+            min_frequency=CONTROL_PARAMS['min_frequency'],
+            runtime_file=PUMP_ROTATION['runtime_file'],
+            save_interval=PUMP_ROTATION['save_interval'],
+            stage_frequency=PUMP_STAGING['stage_frequency'] if PUMP_STAGING['enabled'] else None,
+            stage_delay=PUMP_STAGING['stage_delay'],
+            destage_frequency=PUMP_STAGING['destage_frequency'],
+            destage_delay=PUMP_STAGING['destage_delay'],
+            stage_ramp_time=PUMP_STAGING['stage_ramp_time']
         )
         
+        self.gateway = None
+        self.energy = None
+        if ENERGY_METER['enabled']:
+            self.energy = EnergyMeter(
+                {name: cfg['rated_power_kw'] for name, cfg in TOWERS[CONTROL_TOWER]['vfds'].items()},
+                data_file=ENERGY_METER['data_file'],
+                save_interval=ENERGY_METER['save_interval'],
+                max_gap=ENERGY_METER['max_gap']
+            )
+        
         # Initialize sensors (ADS1115)
         self.sensors = SensorManager(
             i2c_address=SENSOR_CONFIG['i2c_address'],
             gain=SENSOR_CONFIG['ads_gain']
         )
         
+        # Pressure loop at a fixed rate; status polling runs in its slack
+        self.scheduler = ControlScheduler(
+            self._control_step,
+            period=CONTROL_SCHEDULER['control_period'],
+            telemetry_rate=CONTROL_SCHEDULER['telemetry_rate'],
+            deadline_tolerance=CONTROL_SCHEDULER['deadline_tolerance'],
+            max_overdue=CONTROL_SCHEDULER['telemetry_max_overdue']
+        )
+        status_interval = CONTROL_SCHEDULER['vfd_status_interval']
+        self.scheduler.add_telemetry('fan', self._poll_fan, status_interval)
+        self.scheduler.add_telemetry('pumps', self._poll_pumps, status_interval)
+        
+        # Config file changes are applied here, between control cycles
+        if CONFIG_RELOAD['enabled']:
+            self.scheduler.add_telemetry('config', self.config.load, CONFIG_RELOAD['check_interval'])
+        
+        # Trip reset / restart, escalating to pump failover
+        self.recovery = None
+        if FAULT_RECOVERY['enabled']:
+            self.recovery = FaultRecovery(
+                {'fan': self.fan_vfd, 'pump_primary': pump_primary, 'pump_backup': pump_backup},
+                FAULT_RECOVERY['policies'],
+                verify_timeout=FAULT_RECOVERY['verify_timeout'],
+                lockout_poll=FAULT_RECOVERY['lockout_poll'],
+                on_escalate=self._on_fault_escalated,
+                on_recovered=self._on_fault_recovered,
+                should_restart=self._should_restart
+            )
+            self.scheduler.add_telemetry('recovery', self.recovery.update, CONTROL_SCHEDULER['control_period'])
+        
+        self.events = None
+        if EVENT_LOG['enabled']:
+            self.events = EventLog(
+                EVENT_LOG['path'],
+                max_bytes=EVENT_LOG['max_bytes'],
+                backups=EVENT_LOG['backups'],
+                queue_size=EVENT_LOG['queue_size'],
+                flush_interval=EVENT_LOG['flush_interval']
+            )
+        # Per-cycle detail goes to the event log from the control step; keep an occasional text line
+        log_interval = EVENT_LOG['summary_interval'] if self.events else CONTROL_SCHEDULER['control_period']
+        self.scheduler.add_telemetry('log', self._log_status, log_interval)
+        
+        self.alarms = None
+        if ALARMS['enabled']:
+            self.alarms = AlarmManager(
+                raise_delay=ALARMS['raise_delay'],
+                clear_delay=ALARMS['clear_delay'],
+                history_size=ALARMS['history_size'],
+                on_change=self._on_alarm
+            )
+        
+        self.pressure = 0.0
+        self.temperature = 0.0
+        self.pressure_control = PressureController()
+        self.output_hz = BIAS_FREQUENCY
+        self.fan_status = {'output_frequency': 0.0}
+        self.pump_status = None
+        
         self.running = False
+    
+    def _control_step(self):
+        """One pressure control cycle: fresh sensor read, health check, write"""
+        sensors_ok = True
+        try:
+            sensor_data = self.sensors.read_all()
+            self.pressure = sensor_data['pressure_psi']
+            self.temperature = sensor_data['temperature_f']
+        except Exception as e:
+            logger.error(f"Sensor read error: {e}")
+            sensors_ok = False
+            self.pressure = 0.0  # Temperature keeps its last good value
+        if self.capture:
+            self.capture.record('sensors', pressure_psi=self.pressure, temperature_f=self.temperature)
+        
+        # Check pump health and failover if needed
+        if PUMP_FAILOVER['auto_failover_enabled']:
+            self.pump_manager.check_health()
+        
+        # Control Logic (PI controller for pump, clamped to safe range)
+        self.output_hz = self.pressure_control.update(self.pressure, CONTROL_PARAMS)
+        
+        # Update pump frequency
+        self.pump_manager.set_frequency(self.output_hz)
+        
+        # Fan loop (slower; only writes when an update is due). A failed read
+        # must not look like cold water, so the fan holds its speed instead
+        if FAN_CONTROL['enabled'] and sensors_ok:
+            fan_hz = self.fan_control.update(self.temperature)
+            if fan_hz is not None:
+                self.fan_vfd.set_frequency(fan_hz)
+        
+        # Once per period on the control lane: only a queue put, the writer thread does the I/O
+        if self.events:
+            self._record_cycle()
+    
+    def _on_alarm(self, event, alarm):
+        if self.events:
+            self.events.record('alarm', event=event, id=alarm.id, drive=alarm.drive,
+                               code=alarm.code, severity=alarm.severity, message=alarm.message)
+    
+    def _apply_config(self, sections):
+        apply_sections(sections, fan_control=self.fan_control, pump_manager=self.pump_manager,
+                       alarms=self.alarms, recovery=self.recovery, vfd_manager=self.vfd_manager)
+        if self.events:
+            self.events.record('config', sections=sections)
+        if self.capture and ('CONTROL_PARAMS' in sections or 'FAN_CONTROL' in sections):
+            self._record_mode()
+    
+    def _record_mode(self):
+        """Capture operator state for replay (always auto when headless)"""
+        self.capture.record('mode', running=self.running, auto=self.running,
+                            control_params=dict(CONTROL_PARAMS), fan_setpoint=self.fan_control.setpoint)
+    
+    def _on_fault_escalated(self, name, vfd, fault_code):
+        if self.events:
+            self.events.record('escalate', drive=name, fault_code=fault_code)
+        if name.startswith('pump_'):
+            self.pump_manager.pump_failed(vfd)
+    
+    def _on_fault_recovered(self, name, vfd):
+        if self.events:
+            self.events.record('recovered', drive=name)
+        if name.startswith('pump_'):
+            self.pump_manager.pump_restored(vfd)
+    
+    def _should_restart(self, name, vfd):
+        if name.startswith('pump_'):
+            return self.pump_manager.needs_running(vfd)
+        return self.running
+    
+    def _poll_fan(self):
+        self.fan_status = self.fan_vfd.get_status()
+        if self.recovery:
+            self.recovery.observe('fan', self.fan_status)
+        if self.alarms:
+            self.alarms.observe(f"{CONTROL_TOWER}.fan", self.fan_status)
+        if self.energy:
+            self.energy.record('fan', self.fan_status)
+    
+    def _poll_pumps(self):
+        self.pump_status = self.pump_manager.get_status()
+        # Both pumps: a pump that tripped and was failed over still needs its reset / alarms
+        for name, status in self.pump_status['vfd_status'].items():
+            if self.alarms:
+                self.alarms.observe(f"{CONTROL_TOWER}.pump_{name}", status)
+            if self.recovery:
+                self.recovery.observe(f"pump_{name}", status)
+        if self.energy:
+            # Both pumps, so a pump that stopped (destaged, failed over) drops back to 0 kW
+            for name, status in self.pump_status['vfd_status'].items():
+                self.energy.record(f'pump_{name}', status)
+    
+    def _pump_summary(self):
+        return self.pump_status or {
+            'active_pump': self.pump_manager.active_pump.value,
+            'primary_errors': self.pump_manager.primary.error_count,
+            'backup_errors': self.pump_manager.backup.error_count
+        }
+    
+    def _record_cycle(self):
+        pump_status = self._pump_summary()
+        self.events.record(
+            'cycle',
+            pressure=round(self.pressure, 2),
+            temperature=round(self.temperature, 1),
+            active_pump=pump_status['active_pump'],
+            pump_hz=round(self.output_hz, 2),
+            fan_hz=round(self.fan_status['output_frequency'], 2),
+            primary_errors=pump_status['primary_errors'],
+            backup_errors=pump_status['backup_errors'],
+            power_kw=self.energy.get_status()['power_kw'] if self.energy else 0.0,
+            missed=self.scheduler.missed_deadlines
+        )
+    
+    def _log_status(self):
+        pump_status = self._pump_summary()
+        power_kw = self.energy.get_status()['power_kw'] if self.energy else 0.0
+        logger.info(
+            f"P: {self.pressure:5.2f}psi | T: {self.temperature:5.1f}°F | "
+            f"Pump: {pump_status['active_pump']:7s} @ {self.output_hz:4.1f}Hz | "
+            f"Fan: {self.fan_status['output_frequency']:4.1f}Hz | "
+            f"Err: P{pump_status['primary_errors']}/B{pump_status['backup_errors']} | "
+            f"kW: {power_kw:4.1f} | "
+            f"Missed: {self.scheduler.missed_deadlines}"
+        )
         
     def run(self):
         """Main control loop"""
         logger.info("="*60)
         logger.info("Starting Cooling Tower Control System (GALT G540)")
         logger.info("Configuration:")
-        logger.info(f"  Serial: {SERIAL_PORT} @ {SERIAL_BAUDRATE} baud, {SERIAL_PARITY},8,{SERIAL_STOPBITS}")
-        logger.info(f"  Fan VFD: Device ID {VFD_CONFIG['fan']['device_id']}")
-        logger.info(f"  Pump Primary: Device ID {VFD_CONFIG['pump_primary']['device_id']}")
-        logger.info(f"  Pump Backup: Device ID {VFD_CONFIG['pump_backup']['device_id']}")
+        for name, bus in SERIAL_BUSES.items():
+            logger.info(f"  Serial {name}: {bus['port']} @ {bus['baudrate']} baud, "
+                        f"{bus['parity']},{bus['bytesize']},{bus['stopbits']}")
+        logger.info(f"  Control tower: {CONTROL_TOWER}")
+        logger.info(f"  Fan VFD: {self.fan_vfd.address}")
+        logger.info(f"  Pump Primary: {self.pump_manager.primary.address}")
+        logger.info(f"  Pump Backup: {self.pump_manager.backup.address}")
         logger.info(f"  Target Pressure: {CONTROL_PARAMS['target_pressure']} psi")
         logger.info(f"  ADS1115: 0x{SENSOR_CONFIG['i2c_address']:02X}")
         logger.info("="*60)
@@ -78,89 +358,112 @@ class CoolingTowerController:
         if not self.vfd_manager.connect():
             logger.error("Failed to connect to Modbus")
             return
+        
+        if self.bus_capture:
+            self.bus_capture.start()
+        
+        if self.events:
+            self.events.start()
+            self.events.record('start', tower=CONTROL_TOWER, lead=self.pump_manager.active_pump.value,
+                               target_pressure=CONTROL_PARAMS['target_pressure'])
+        
+        if MODBUS_GATEWAY['enabled']:
+            self.gateway = ModbusGateway(
+                self.vfd_manager,
+                MODBUS_GATEWAY['unit_map'],
+                host=MODBUS_GATEWAY['host'],
+                port=MODBUS_GATEWAY['port'],
+                poll_blocks=MODBUS_GATEWAY['poll_blocks'],
+                poll_interval=MODBUS_GATEWAY['poll_interval'],
+                max_age=MODBUS_GATEWAY['max_age'],
+                writable=MODBUS_GATEWAY['writable'],
+                write_timeout=MODBUS_GATEWAY['write_timeout'],
+                queue_size=MODBUS_GATEWAY['queue_size']
+            )
+            self.gateway.start()
+        
+        if self.capture:
+            self.capture.start()
+            self.capture.record('capture', version=1, tower=CONTROL_TOWER,
+                                control_period=CONTROL_SCHEDULER['control_period'],
+                                vfd_status_interval=CONTROL_SCHEDULER['vfd_status_interval'])
 
         try:
             self.running = True
+            if self.capture:
+                self._record_mode()
             
-            # Start fan (constant speed operation)
-            logger.info("Starting fan motor...")
-            self.fan_vfd.set_frequency(45.0)  # Set frequency first
-            self.fan_vfd.start()
-            time.sleep(1.0)
-            
-            # Start primary pump
-            logger.info("Starting primary pump...")
-            active_pump = self.pump_manager.get_active_vfd()
-            active_pump.set_frequency(30.0)  # Initial frequency
-            active_pump.start()
-            time.sleep(1.0)
+            # Fan and lead pump ramp together (fan speed then follows basin temperature)
+            logger.info(f"Starting fan and {self.pump_manager.active_pump.value} pump...")
+            self._sequence('start', {'start_fan': self._start_fan, 'start_pump': self._start_pump})
             
             logger.info("System running - entering control loop")
             
-            while self.running:
-                # Read sensors
-                try:
-                    sensor_data = self.sensors.read_all()
-                    pressure = sensor_data['pressure_psi']
-                    temp = sensor_data['temperature_c']
-                except Exception as e:
-                    logger.error(f"Sensor read error: {e}")
-                    pressure = 0.0
-                    temp = 0.0
-                
-                # Check pump health and failover if needed
-                if PUMP_FAILOVER['auto_failover_enabled']:
-                    self.pump_manager.check_health()
-                
-                # Control Logic (Simple P-Controller for pump)
-                error = CONTROL_PARAMS['target_pressure'] - pressure
-                output_hz = 30.0 + (error * CONTROL_PARAMS['kp'])
-                
-                # Clamp frequency to safe range
-                output_hz = max(
-                    CONTROL_PARAMS['min_frequency'],
-                    min(CONTROL_PARAMS['max_frequency'], output_hz)
-                )
-                
-                # Update pump frequency
-                self.pump_manager.set_frequency(output_hz)
-                
-                # Get status
-                fan_status = self.fan_vfd.get_status()
-                pump_status = self.pump_manager.get_status()
-                
-                # Log status
-                logger.info(
-                    f"P: {pressure:5.2f}psi | T: {temp:5.1f}°C | "
-                    f"Pump: {pump_status['active_pump']:7s} @ {output_hz:4.1f}Hz | "
-                    f"Fan: {fan_status['output_frequency']:4.1f}Hz | "
-                    f"Err: P{pump_status['primary_errors']}/B{pump_status['backup_errors']}"
-                )
-                
-                time.sleep(1.0)
-                
+            self.scheduler.run()
+            
         except KeyboardInterrupt:
             logger.info("Stopping system (Ctrl+C)...")
+        except SequenceError as e:
+            logger.error(f"Start sequence failed: {e}")
         except Exception as e:
             logger.error(f"Unexpected error: {e}", exc_info=True)
         finally:
             self._shutdown()
     
+    def _sequence(self, name, actions):
+        """Run a start / stop sequence from SEQUENCES; raises SequenceError on failure"""
+        drives = {
+            'fan': self.fan_vfd,
+            'lead_pump': self.pump_manager.get_active_vfd(),
+            'pump_primary': self.pump_manager.primary,
+            'pump_backup': self.pump_manager.backup,
+        }
+        return Sequencer(name, SEQUENCES[name], actions, drives,
+                         poll_interval=SEQUENCES['poll_interval']).run()
+    
+    def _start_fan(self):
+        self.fan_control.reset()
+        self.fan_vfd.set_frequency(self.fan_control.frequency)  # Set frequency first
+        return self.fan_vfd.start()
+    
+    def _start_pump(self):
+        self.pressure_control.reset()
+        return self.pump_manager.start(BIAS_FREQUENCY)
+    
     def _shutdown(self):
         """Graceful shutdown"""
+        self.running = False
+        self.scheduler.stop()
         logger.info("Shutting down...")
         try:
-            self.pump_manager.stop()
-            time.sleep(0.5)
-            self.fan_vfd.stop()
-            time.sleep(0.5)
-            self.vfd_manager.stop_all()
+            try:
+                self._sequence('stop', {'stop_pumps': self.pump_manager.stop, 'stop_fan': self.fan_vfd.stop})
+            except SequenceError as e:
+                logger.warning(f"Drives not confirmed stopped, stopping all: {e}")
+                self.vfd_manager.stop_all()
         except Exception as e:
             logger.error(f"Shutdown error: {e}")
         finally:
+            if self.gateway:
+                self.gateway.stop()
+            if self.energy:
+                self.energy.save()
             self.vfd_manager.close()
+            if self.bus_capture:
+                self.bus_capture.stop()
+            if self.events:
+                self.events.record('stop', cycles=self.scheduler.cycles,
+                                   missed=self.scheduler.missed_deadlines)
+                self.events.stop()
+            if self.capture:
+                self._record_mode()
+                self.capture.stop()
             logger.info("System stopped")
 
 if __name__ == "__main__":
-    controller = CoolingTowerController()
-    controller.run()
+    log_listener.start()
+    try:
+        controller = CoolingTowerController()
+        controller.run()
+    finally:
+        log_listener.stop()
@@ -0,0 +1,251 @@
+"""
+Modbus TCP gateway for plant SCADA
+
+Serves drive registers to Modbus TCP clients from the shadow values the
+local RS-485 poller already holds, so a SCADA read never causes a bus
+transaction. A gateway poll worker keeps the configured register blocks
+fresh at a fixed rate regardless of how many clients read them. Writes
+(FC06/FC16) are queued and forwarded one at a time through the local
+serial client; the client gets its response once the drive has answered.
+"""
+
+import queue
+import socket
+import struct
+import threading
+import socketserver
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Modbus exception codes
+EXC_ILLEGAL_FUNCTION = 0x01
+EXC_ILLEGAL_ADDRESS = 0x02
+EXC_ILLEGAL_VALUE = 0x03
+EXC_DEVICE_FAILURE = 0x04
+EXC_DEVICE_BUSY = 0x06
+EXC_PATH_UNAVAILABLE = 0x0A
+EXC_TARGET_NO_RESPONSE = 0x0B
+
+
+class _GatewayServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _ModbusTCPHandler(socketserver.BaseRequestHandler):
+    """One SCADA connection: MBAP-framed requests until the client closes"""
+
+    def _recv_exact(self, n):
+        data = b''
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def handle(self):
+        gateway = self.server.gateway
+        self.request.settimeout(gateway.client_timeout)
+        try:
+            while True:
+                header = self._recv_exact(7)
+                if header is None:
+                    return
+                tid, proto, length, unit = struct.unpack('>HHHB', header)
+                if proto != 0 or length < 2 or length > 254:
+                    return
+                pdu = self._recv_exact(length - 1)
+                if pdu is None:
+                    return
+
+                response = gateway.handle_pdu(unit, pdu)
+                self.request.sendall(struct.pack('>HHHB', tid, 0, len(response) + 1, unit) + response)
+        except (socket.timeout, ConnectionError):
+            return
+
+
+class ModbusGateway:
+    """Modbus TCP server front-end over the local RS-485 drives"""
+
+    def __init__(self, vfd_manager, unit_map, host='0.0.0.0', port=5020,
+                 poll_blocks=((0x2100, 3), (0x3000, 8)), poll_interval=2.0,
+                 max_age=30.0, writable=((0x2000, 0x2001),), write_timeout=5.0,
+                 queue_size=32, client_timeout=60.0):
+        """
+        Initialize Modbus TCP gateway.
+
+        Args:
+            vfd_manager: MultiVFDManager owning the serial buses
+            unit_map: Dict of Modbus TCP unit id -> drive name or 'bus/slave'
+            host: Listen address
+            port: Listen port
+            poll_blocks: (start register, count) blocks kept fresh per drive
+            poll_interval: Seconds between gateway poll rounds
+            max_age: Seconds a cached value may be served before it is stale
+            writable: Inclusive (first, last) register ranges clients may write
+            write_timeout: Seconds a client waits for a queued write
+            queue_size: Maximum queued writes before clients get 'busy'
+            client_timeout: Idle seconds before a client connection is dropped
+        """
+        self.vfd_manager = vfd_manager
+        self.units = {}
+        for unit, drive in unit_map.items():
+            vfd = vfd_manager.get_vfd(drive)
+            if vfd is None:
+                raise ValueError(f"Gateway unit {unit}: unknown drive '{drive}'")
+            self.units[int(unit)] = vfd
+
+        self.host = host
+        self.port = port
+        self.poll_blocks = poll_blocks
+        self.poll_interval = poll_interval
+        self.max_age = max_age
+        self.writable = writable
+        self.write_timeout = write_timeout
+        self.client_timeout = client_timeout
+
+        self.write_queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self.server = None
+
+        # Statistics
+        self.reads_served = 0
+        self.reads_stale = 0
+        self.writes_forwarded = 0
+        self.writes_failed = 0
+        self.bus_polls = 0
+
+    def start(self):
+        self.server = _GatewayServer((self.host, self.port), _ModbusTCPHandler)
+        self.server.gateway = self
+
+        for target, name in [(self.server.serve_forever, 'gateway-tcp'),
+                             (self._poll_worker, 'gateway-poll'),
+                             (self._write_worker, 'gateway-write')]:
+            threading.Thread(target=target, name=name, daemon=True).start()
+        logger.info(f"Modbus TCP gateway listening on {self.host}:{self.port} "
+                    f"(units: {', '.join(str(u) for u in sorted(self.units))})")
+
+    def stop(self):
+        self._stop_event.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _poll_worker(self):
+        """Refresh the served register blocks once per poll interval"""
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            for vfd in self.units.values():
+                for register, count in self.poll_blocks:
+                    if self._stop_event.is_set():
+                        return
+                    vfd.read_register(register, count=count)
+                    self.bus_polls += 1
+            self._stop_event.wait(max(0.0, self.poll_interval - (time.monotonic() - start)))
+
+    def _write_worker(self):
+        """Forward queued client writes through the serial client, in order"""
+        while not self._stop_event.is_set():
+            try:
+                vfd, register, values, done = self.write_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if len(values) == 1:
+                ok = vfd.write_register(register, values[0])
+            else:
+                ok = vfd.write_registers(register, values)
+            if ok:
+                self.writes_forwarded += 1
+            else:
+                self.writes_failed += 1
+            done['ok'] = ok
+            done['event'].set()
+
+    def _is_writable(self, register, count):
+        return any(first <= register and register + count - 1 <= last
+                   for first, last in self.writable)
+
+    @staticmethod
+    def _exception(function, code):
+        return bytes([function | 0x80, code])
+
+    def handle_pdu(self, unit, pdu):
+        """Build the response PDU for one request PDU"""
+        function = pdu[0]
+        vfd = self.units.get(unit)
+        if vfd is None:
+            return self._exception(function, EXC_PATH_UNAVAILABLE)
+
+        if function in (0x03, 0x04):
+            return self._read(vfd, function, pdu)
+        if function in (0x06, 0x10):
+            return self._write(vfd, function, pdu)
+        return self._exception(function, EXC_ILLEGAL_FUNCTION)
+
+    def _read(self, vfd, function, pdu):
+        if len(pdu) != 5:
+            return self._exception(function, EXC_ILLEGAL_VALUE)
+        register, count = struct.unpack('>HH', pdu[1:5])
+        if not 1 <= count <= 125:
+            return self._exception(function, EXC_ILLEGAL_VALUE)
+
+        now = time.monotonic()
+        values = []
+        for address in range(register, register + count):
+            entry = vfd.shadow.get(address)
+            if entry is None:
+                return self._exception(function, EXC_ILLEGAL_ADDRESS)
+            value, stamp = entry
+            if now - stamp > self.max_age:
+                self.reads_stale += 1
+                return self._exception(function, EXC_TARGET_NO_RESPONSE)
+            values.append(value)
+
+        self.reads_served += 1
+        return bytes([function, count * 2]) + struct.pack(f'>{count}H', *values)
+
+    def _write(self, vfd, function, pdu):
+        if function == 0x06:
+            if len(pdu) != 5:
+                return self._exception(function, EXC_ILLEGAL_VALUE)
+            register, value = struct.unpack('>HH', pdu[1:5])
+            values = [value]
+            echo = pdu[:5]
+        else:
+            if len(pdu) < 6:
+                return self._exception(function, EXC_ILLEGAL_VALUE)
+            register, count, byte_count = struct.unpack('>HHB', pdu[1:6])
+            if not 1 <= count <= 123 or byte_count != count * 2 or len(pdu) != 6 + byte_count:
+                return self._exception(function, EXC_ILLEGAL_VALUE)
+            values = list(struct.unpack(f'>{count}H', pdu[6:]))
+            echo = pdu[:5]
+
+        if not self._is_writable(register, len(values)):
+            return self._exception(function, EXC_ILLEGAL_ADDRESS)
+
+        done = {'ok': False, 'event': threading.Event()}
+        try:
+            self.write_queue.put_nowait((vfd, register, values, done))
+        except queue.Full:
+            return self._exception(function, EXC_DEVICE_BUSY)
+
+        if not done['event'].wait(self.write_timeout):
+            return self._exception(function, EXC_TARGET_NO_RESPONSE)
+        if not done['ok']:
+            return self._exception(function, EXC_DEVICE_FAILURE)
+        return echo
+
+    def get_stats(self):
+        return {
+            'port': self.port,
+            'reads_served': self.reads_served,
+            'reads_stale': self.reads_stale,
+            'writes_forwarded': self.writes_forwarded,
+            'writes_failed': self.writes_failed,
+            'writes_queued': self.write_queue.qsize(),
+            'bus_polls': self.bus_polls
+        }
@@ -0,0 +1,781 @@
+#!/usr/bin/env python3
+"""
+Closed-loop plant simulator
+
+Models the tower so control settings and failover logic can be tested
+without running real pumps:
+
+- Pumps follow the affinity laws (shut-off pressure goes with speed
+  squared) against a system curve whose resistance swings with daily
+  demand; parallel pumps are solved for a common discharge pressure
+- Pipe dynamics are a first-order lag on pressure plus sensor noise
+- Basin temperature settles towards wet bulb + approach / airflow, with a
+  thermal time constant and a daily load and wet-bulb cycle
+- Drives ramp their output frequency, trip on injected or random faults
+  and can stop answering (comm loss)
+
+SimulatedVFD is a VFDController whose Modbus transactions are answered by
+the drive model, and SimulatedSensors stands in for SensorManager, so the
+real PumpFailoverManager, FanController, PumpHealthMonitor and
+FaultRecovery run unchanged on a VirtualClock. A day simulates in
+seconds.
+
+sweep() runs the pressure loop for many gain sets at once as NumPy
+arrays (one element per set); without NumPy it loops over the sets.
+
+    python3 plant_simulator.py --hours 24
+    python3 plant_simulator.py --hours 24 --fault 6h:pump_primary:OC3 --fault 12h:pump_backup:comm:120
+    python3 plant_simulator.py --hours 2 --sweep-kp 0.2:4.0:40
+    python3 plant_simulator.py --hours 24 --autotune
+"""
+
+import sys
+import csv
+import math
+import time
+import random
+import struct
+import argparse
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from vfd_controller import VFDController
+from pump_failover import PumpFailoverManager
+from pump_health import PumpHealthMonitor
+from fan_control import FanController
+from fault_recovery import FaultRecovery
+from pressure_control import BIAS_FREQUENCY, PressureController, pressure_output
+from pressure_autotune import RelayAutotuner, AutotuneAborted
+from alarm_manager import FAULT_CODES
+from config import *
+
+logger = logging.getLogger(__name__)
+
+
+
+class VirtualClock:
+    """Simulated time; only moves when the simulation advances it"""
+
+    def __init__(self, start=None):
+        self.epoch = time.time() if start is None else start
+        self.elapsed = 0.0
+
+    def monotonic(self):
+        return self.elapsed
+
+    def time(self):
+        return self.epoch + self.elapsed
+
+    def advance(self, seconds):
+        self.elapsed += seconds
+
+    sleep = advance
+
+
+# ==================== PLANT MODEL ====================
+
+class _ScalarOps:
+    """math counterparts of the NumPy functions the model uses"""
+    sqrt = staticmethod(math.sqrt)
+    maximum = staticmethod(max)
+    minimum = staticmethod(min)
+    abs = staticmethod(abs)
+
+
+def daily_cycle(seconds, start_hour, peak_hour=15.0):
+    """-1..1 over a day, peaking at peak_hour"""
+    hour = (start_hour + seconds / 3600.0) % 24.0
+    return math.cos(2 * math.pi * (hour - peak_hour) / 24.0)
+
+
+def system_resistance(params, seconds):
+    """System curve coefficient (psi per gpm²); demand peaks lower it"""
+    return params['system_resistance'] * (1.0 - params['demand_swing'] * daily_cycle(seconds, params['start_hour']))
+
+
+def pump_pressure(speed, resistance, params, ops=_ScalarOps):
+    """Discharge pressure of one pump at speed (fraction of rated) against the system curve"""
+    shutoff = params['shutoff_pressure'] * speed * speed
+    flow_sq = ops.maximum(0.0, (shutoff - params['static_pressure']) / (resistance + params['pump_curve_k']))
+    return ops.minimum(shutoff, params['static_pressure'] + resistance * flow_sq)
+
+
+class SimulatedDrive:
+    """G540 drive model: run command, ramped output frequency and fault latch"""
+
+    def __init__(self, name, rated_current, load, params, clock):
+        """
+        Args:
+            name: Drive name ('fan', 'pump_primary', ...)
+            rated_current: Motor current in A at rated speed
+            load: Output power fraction at rated speed
+            params: SIMULATOR config
+            clock: VirtualClock
+        """
+        self.name = name
+        self.rated_current = rated_current
+        self.load = load
+        self.rated_frequency = params['rated_frequency']
+        self.rated_voltage = params['rated_voltage']
+        self.accel_rate = params['accel_rate']
+        self.clock = clock
+
+        self.running = False
+        self.setpoint = 0.0
+        self.frequency = 0.0
+        self.fault = 0
+        self.comm_down_until = None
+        self.trips = 0
+
+    @property
+    def speed(self):
+        return self.frequency / self.rated_frequency
+
+    def comm_ok(self):
+        return self.comm_down_until is None or self.clock.monotonic() >= self.comm_down_until
+
+    def trip(self, code):
+        """Latch a fault; the motor coasts and the output drops at once"""
+        self.fault = code
+        self.running = False
+        self.frequency = 0.0
+        self.trips += 1
+
+    def lose_comm(self, seconds):
+        self.comm_down_until = self.clock.monotonic() + seconds
+
+    def write(self, register, values):
+        if not self.comm_ok():
+            return False
+        for address, value in enumerate(values, register):
+            if address == 0x2000:
+                if value == 0x0001 and not self.fault:
+                    self.running = True
+                elif value == 0x0005:
+                    self.running = False
+                elif value == 0x0007:
+                    self.fault = 0
+            elif address == 0x2001:
+                self.setpoint = min(value * 0.01, self.rated_frequency)
+        return True
+
+    def read(self, register, count):
+        if not self.comm_ok():
+            return None
+        registers = self.registers()
+        return [registers.get(address, 0) for address in range(register, register + count)]
+
+    def registers(self):
+        speed = self.speed
+        current = self.rated_current * (0.3 + 0.7 * speed * speed) if self.frequency > 0 else 0.0
+        return {
+            0x2100: 0x0004 if self.fault else (0x0001 if self.running else 0x0003),
+            0x2101: 0x0041,                      # ready, communication control
+            0x2102: self.fault,
+            0x3000: int(self.frequency * 100),
+            0x3001: int(self.setpoint * 100),
+            0x3002: 650,                         # DC bus voltage
+            0x3003: int(self.rated_voltage * speed),
+            0x3004: int(current * 10),
+            0x3005: int(1800 * speed),           # motor speed, rpm
+            0x3006: int(self.load * speed ** 3 * 1000),  # output power, 0.1 %
+        }
+
+    def step(self, dt):
+        target = self.setpoint if self.running else 0.0
+        limit = self.accel_rate * dt
+        self.frequency += max(-limit, min(limit, target - self.frequency))
+
+
+class Plant:
+    """Hydraulics, basin thermal model and drives of one tower cell"""
+
+    def __init__(self, params, clock, seed=None):
+        """
+        Initialize plant model.
+
+        Args:
+            params: SIMULATOR config
+            clock: VirtualClock
+            seed: Random seed for sensor noise and random trips
+        """
+        self.params = params
+        self.clock = clock
+        self.rng = random.Random(seed)
+        self.drives = {
+            'fan': SimulatedDrive('fan', params['fan_rated_current'], params['fan_load'], params, clock),
+            'pump_primary': SimulatedDrive('pump_primary', params['pump_rated_current'],
+                                           params['pump_load'], params, clock),
+            'pump_backup': SimulatedDrive('pump_backup', params['pump_rated_current'],
+                                          params['pump_load'], params, clock),
+        }
+        self.pressure = 0.0
+        self.temperature = params['initial_temperature']
+        self.events = []  # (time, drive, fault code or 'comm', comm loss seconds), sorted
+
+    def schedule(self, at, drive, fault, duration=60.0):
+        """Inject a fault code (or 'comm' for a comm loss of duration seconds) at simulated time"""
+        self.events.append((at, drive, fault, duration))
+        self.events.sort(key=lambda event: event[0])
+
+    def _inject(self, dt):
+        now = self.clock.monotonic()
+        while self.events and self.events[0][0] <= now:
+            _, name, fault, duration = self.events.pop(0)
+            if fault == 'comm':
+                self.drives[name].lose_comm(duration)
+            else:
+                self.drives[name].trip(fault)
+            logger.info(f"[sim {now:.0f}s] Injected {fault} on {name}")
+
+        rate = self.params['trip_rate'] * dt / 3600.0
+        for drive in self.drives.values():
+            if drive.running and rate and self.rng.random() < rate:
+                drive.trip(self.rng.choice(self.params['random_faults']))
+
+    def _parallel_pressure(self, speeds, resistance):
+        """Common discharge pressure of several pumps (bisection on pressure)"""
+        p = self.params
+        low, high = 0.0, p['shutoff_pressure'] * max(speeds) ** 2
+        for _ in range(30):
+            mid = (low + high) / 2
+            pump_flow = sum(math.sqrt(max(0.0, (p['shutoff_pressure'] * s * s - mid) / p['pump_curve_k']))
+                            for s in speeds)
+            system_flow = math.sqrt(max(0.0, (mid - p['static_pressure']) / resistance))
+            low, high = (mid, high) if pump_flow > system_flow else (low, mid)
+        return low
+
+    def equilibrium_pressure(self):
+        speeds = [self.drives[name].speed for name in ('pump_primary', 'pump_backup')
+                  if self.drives[name].speed > 0]
+        if not speeds:
+            return 0.0
+        resistance = system_resistance(self.params, self.clock.monotonic())
+        if len(speeds) == 1:
+            return pump_pressure(speeds[0], resistance, self.params)
+        return self._parallel_pressure(speeds, resistance)
+
+    def basin_equilibrium(self):
+        p = self.params
+        cycle = daily_cycle(self.clock.monotonic(), p['start_hour'])
+        wet_bulb = p['wet_bulb'] + p['wet_bulb_swing'] * cycle
+        load = 1.0 + p['load_swing'] * cycle
+        airflow = p['natural_draft'] + (1.0 - p['natural_draft']) * self.drives['fan'].speed
+        return wet_bulb + p['approach'] * load / airflow
+
+    def step(self, dt):
+        self._inject(dt)
+        for drive in self.drives.values():
+            drive.step(dt)
+        p = self.params
+        self.pressure += (self.equilibrium_pressure() - self.pressure) * (1.0 - math.exp(-dt / p['pipe_time_constant']))
+        self.temperature += ((self.basin_equilibrium() - self.temperature)
+                             * (1.0 - math.exp(-dt / p['thermal_time_constant'])))
+
+
+# ==================== HARDWARE STAND-INS ====================
+
+def decode_write(request):
+    """Register and values of an FC06 / FC16 request frame (without CRC)"""
+    register = (request[2] << 8) | request[3]
+    if request[1] == 0x06:
+        return register, [(request[4] << 8) | request[5]]
+    return register, list(struct.unpack_from(f'>{request[5]}H', request, 7))  # 0x10
+
+
+class SimulatedVFD(VFDController):
+    """VFDController whose Modbus transactions are answered by a SimulatedDrive"""
+
+    def __init__(self, drive, device_id, latency=0.2):
+        super().__init__(None, device_id, drive.name)
+        self.drive = drive
+        self.latency = latency
+
+    def _read_register(self, register, count, retries):
+        values = self.drive.read(register, count)
+        if values is None:
+            self.error_count += 1
+            return None
+        self.last_latency = self.latency
+        self.error_count = max(0, self.error_count - 1)
+        self._update_shadow(register, values)
+        return values if count > 1 else values[0]
+
+    def _write_request(self, request, retries):
+        register, values = decode_write(request)
+        if not self.drive.write(register, values):
+            self.error_count += 1
+            return False
+        self.last_latency = self.latency
+        self.error_count = max(0, self.error_count - 1)
+        return True
+
+
+class SimulatedSensors:
+    """SensorManager stand-in reading the plant, with measurement noise"""
+
+    def __init__(self, plant):
+        self.plant = plant
+
+    def read_pressure(self):
+        noise = self.plant.rng.gauss(0.0, self.plant.params['pressure_noise'])
+        return max(0.0, min(100.0, self.plant.pressure + noise))
+
+    def read_temperature(self):
+        return self.plant.temperature + self.plant.rng.gauss(0.0, self.plant.params['temperature_noise'])
+
+    def read_all(self):
+        return {
+            'pressure_psi': self.read_pressure(),
+            'temperature_f': self.read_temperature()
+        }
+
+
+# ==================== CLOSED LOOP ====================
+
+class ControlLoop:
+    """
+    The real pump / fan / recovery logic on a virtual clock, wired like
+    CoolingTowerSystem, for drives and sensors that are not hardware
+    (the plant model here, a recorded capture in replay.py)
+    """
+
+    def __init__(self, vfds, clock, control_params=None, pump_rated_current=None):
+        """
+        Initialize control loop.
+
+        Args:
+            vfds: Dict of 'fan' / 'pump_primary' / 'pump_backup' -> VFDController
+            clock: VirtualClock
+            control_params: Pressure loop settings (default config CONTROL_PARAMS)
+            pump_rated_current: Pump current for the health monitor (default PUMP_HEALTH)
+        """
+        self.vfds = vfds
+        self.clock = clock
+        self.control_params = control_params or CONTROL_PARAMS
+
+        self.fan_control = FanController(
+            setpoint=FAN_CONTROL['temperature_setpoint'],
+            kp=FAN_CONTROL['kp'],
+            ki=FAN_CONTROL['ki'],
+            deadband=FAN_CONTROL['deadband'],
+            min_frequency=FAN_CONTROL['min_frequency'],
+            max_frequency=FAN_CONTROL['max_frequency'],
+            rated_frequency=FAN_CONTROL['rated_frequency'],
+            rate_limit=FAN_CONTROL['rate_limit'],
+            trim_rate=FAN_CONTROL['trim_rate'],
+            update_interval=FAN_CONTROL['update_interval'],
+            start_frequency=FAN_CONTROL['start_frequency'],
+            clock=self.clock.monotonic
+        )
+        health_monitor = None
+        if PUMP_HEALTH['enabled']:
+            health_monitor = PumpHealthMonitor(
+                rated_current=pump_rated_current or PUMP_HEALTH['rated_current'],
+                current_warn_ratio=PUMP_HEALTH['current_warn_ratio'],
+                current_slope_limit=PUMP_HEALTH['current_slope_limit'],
+                trend_window=PUMP_HEALTH['trend_window'],
+                latency_nominal=PUMP_HEALTH['latency_nominal'],
+                latency_limit=PUMP_HEALTH['latency_limit'],
+                failover_score=PUMP_HEALTH['failover_score'],
+                recover_score=PUMP_HEALTH['recover_score'],
+                trip_samples=PUMP_HEALTH['trip_samples'],
+                recover_time=PUMP_HEALTH['recover_time'],
+                clock=self.clock.time
+            )
+        self.pump_manager = PumpFailoverManager(
+            self.vfds['pump_primary'],
+            self.vfds['pump_backup'],
+            max_errors=PUMP_FAILOVER['max_consecutive_errors'],
+            check_interval=PUMP_FAILOVER['health_check_interval'],
+            health_monitor=health_monitor,
+            rotation_hours=PUMP_ROTATION['rotation_hours'] if PUMP_ROTATION['enabled'] else None,
+            handover_ramp_time=PUMP_ROTATION['handover_ramp_time'],
+            min_frequency=self.control_params['min_frequency'],
+            stage_frequency=PUMP_STAGING['stage_frequency'] if PUMP_STAGING['enabled'] else None,
+            stage_delay=PUMP_STAGING['stage_delay'],
+            destage_frequency=PUMP_STAGING['destage_frequency'],
+            destage_delay=PUMP_STAGING['destage_delay'],
+            stage_ramp_time=PUMP_STAGING['stage_ramp_time'],
+            clock=self.clock.monotonic
+        )
+        self.pressure_control = PressureController(clock=self.clock.monotonic)
+        self.recovery = None
+        if FAULT_RECOVERY['enabled']:
+            self.recovery = FaultRecovery(
+                self.vfds,
+                FAULT_RECOVERY['policies'],
+                verify_timeout=FAULT_RECOVERY['verify_timeout'],
+                lockout_poll=FAULT_RECOVERY['lockout_poll'],
+                on_escalate=self._on_escalate,
+                on_recovered=self._on_recovered,
+                should_restart=self._should_restart,
+                clock=self.clock.monotonic
+            )
+
+    def _on_escalate(self, name, vfd, fault_code):
+        if name.startswith('pump_'):
+            self.pump_manager.pump_failed(vfd)
+
+    def _on_recovered(self, name, vfd):
+        if name.startswith('pump_'):
+            self.pump_manager.pump_restored(vfd)
+
+    def _should_restart(self, name, vfd):
+        if name.startswith('pump_'):
+            return self.pump_manager.needs_running(vfd)
+        return self.pump_manager.running
+
+    def start(self):
+        """Same sequence as CoolingTowerSystem.start_system"""
+        self.fan_control.reset()
+        self.vfds['fan'].set_frequency(self.fan_control.frequency)
+        self.vfds['fan'].start()
+        self.pressure_control.reset()
+        self.pump_manager.start(BIAS_FREQUENCY)
+
+    def stop(self):
+        """Same sequence as CoolingTowerSystem.stop_system"""
+        self.pump_manager.stop()
+        self.vfds['fan'].stop()
+
+    def control_step(self, sensors):
+        """Same cycle as CoolingTowerSystem.control_step in auto mode"""
+        output_hz = self.pressure_control.update(sensors['pressure_psi'], self.control_params)
+        self.pump_manager.set_frequency(output_hz)
+        if PUMP_FAILOVER['auto_failover_enabled']:
+            self.pump_manager.check_health()
+        if FAN_CONTROL['enabled']:
+            fan_hz = self.fan_control.update(sensors['temperature_f'])
+            if fan_hz is not None:
+                self.vfds['fan'].set_frequency(fan_hz)
+
+    def poll_drives(self):
+        """Telemetry lane: status of every drive into failover health and recovery"""
+        for name, vfd in self.vfds.items():
+            status = vfd.get_status()
+            if name != 'fan':
+                self.pump_manager.observe(vfd, status)
+            if self.recovery:
+                self.recovery.observe(name, status)
+
+
+class Simulation(ControlLoop):
+    """The control loop running against the plant model"""
+
+    def __init__(self, params=None, control_params=None, seed=None, trace_interval=10.0):
+        """
+        Initialize simulation.
+
+        Args:
+            params: Plant parameters (default config SIMULATOR)
+            control_params: Pressure loop settings (default config CONTROL_PARAMS)
+            seed: Random seed
+            trace_interval: Simulated seconds between trace samples
+        """
+        self.params = params or SIMULATOR
+        self.trace_interval = trace_interval
+        clock = VirtualClock()
+        self.plant = Plant(self.params, clock, seed)
+        self.sensors = SimulatedSensors(self.plant)
+        vfds = {name: SimulatedVFD(drive, i + 1, self.params['latency'])
+                for i, (name, drive) in enumerate(self.plant.drives.items())}
+        super().__init__(vfds, clock, control_params, self.params['pump_rated_current'])
+
+        self.trace = []
+        self.stats = {'iae': 0.0, 'sq_error': 0.0, 'max_error': 0.0, 'temp_sq_error': 0.0,
+                      'energy_kwh': {name: 0.0 for name in self.vfds}, 'lead_changes': 0, 'seconds': 0.0}
+        self._lead = None
+
+    def start(self):
+        super().start()
+        self._lead = self.pump_manager.active_pump
+
+    def _account(self, dt, sensors):
+        error = abs(self.control_params['target_pressure'] - self.plant.pressure)
+        self.stats['iae'] += error * dt
+        self.stats['sq_error'] += error * error * dt
+        self.stats['max_error'] = max(self.stats['max_error'], error)
+        self.stats['temp_sq_error'] += (self.plant.temperature - self.fan_control.setpoint) ** 2 * dt
+        self.stats['seconds'] += dt
+        for name, drive in self.plant.drives.items():
+            kw = drive.load * drive.speed ** 3 * TOWERS[CONTROL_TOWER]['vfds'][name]['rated_power_kw']
+            self.stats['energy_kwh'][name] += kw * dt / 3600.0
+        if self.pump_manager.active_pump != self._lead:
+            self.stats['lead_changes'] += 1
+            self._lead = self.pump_manager.active_pump
+
+    def run(self, duration, warmup=300.0):
+        """Advance the closed loop by duration simulated seconds; returns summary()"""
+        dt = CONTROL_SCHEDULER['control_period']
+        poll_every = max(1, round(CONTROL_SCHEDULER['vfd_status_interval'] / dt))
+        trace_every = max(1, round(self.trace_interval / dt))
+        wall = time.monotonic()
+        for step in range(int(duration / dt)):
+            self.clock.advance(dt)
+            self.plant.step(dt)
+            sensors = self.sensors.read_all()
+            self.control_step(sensors)
+            if step % poll_every == 0:
+                self.poll_drives()
+            if self.recovery:
+                self.recovery.update()
+            if self.clock.monotonic() > warmup:
+                self._account(dt, sensors)
+            if step % trace_every == 0:
+                self.trace.append(self.sample(sensors))
+        self.stats['wall_seconds'] = time.monotonic() - wall
+        return self.summary()
+
+    def autotune(self, settle=300.0):
+        """Settle, run the relay autotune on the plant and adopt its gains; returns the test status"""
+        self.run(settle)
+        cp = self.control_params
+        tuner = RelayAutotuner(
+            cp['target_pressure'], self.pump_manager.frequency, self.pump_manager.active_pump.value,
+            cp['min_frequency'], cp['max_frequency'],
+            amplitude=AUTOTUNE['relay_amplitude'],
+            hysteresis=AUTOTUNE['hysteresis'],
+            max_deviation=AUTOTUNE['max_deviation'],
+            cycles=AUTOTUNE['cycles'],
+            max_cycles=AUTOTUNE['max_cycles'],
+            max_duration=AUTOTUNE['max_duration'],
+            rule=AUTOTUNE['rule'],
+            max_kp=AUTOTUNE['max_kp'],
+            max_ki=AUTOTUNE['max_ki'],
+            clock=self.clock.monotonic
+        )
+        dt = CONTROL_SCHEDULER['control_period']
+        output_hz = tuner.output
+        while output_hz is not None:
+            self.pump_manager.set_frequency(output_hz)
+            self.clock.advance(dt)
+            self.plant.step(dt)
+            try:
+                output_hz = tuner.update(self.sensors.read_all()['pressure_psi'],
+                                         self.pump_manager.active_pump.value)
+            except AutotuneAborted:
+                break
+        self.pressure_control.reset(tuner.center)
+        if tuner.result:
+            self.control_params = {**cp, **tuner.result['recommended']}
+        return tuner.get_status()
+
+    def sample(self, sensors):
+        drives = self.plant.drives
+        return {
+            't': round(self.clock.monotonic(), 1),
+            'pressure': round(self.plant.pressure, 2),
+            'pressure_measured': round(sensors['pressure_psi'], 2),
+            'temperature': round(self.plant.temperature, 2),
+            'fan_hz': round(drives['fan'].frequency, 2),
+            'primary_hz': round(drives['pump_primary'].frequency, 2),
+            'backup_hz': round(drives['pump_backup'].frequency, 2),
+            'active_pump': self.pump_manager.active_pump.value,
+            'faults': '/'.join(str(d.fault) for d in drives.values())
+        }
+
+    def summary(self):
+        seconds = self.stats['seconds'] or 1.0
+        return {
+            'simulated_hours': round(self.clock.monotonic() / 3600.0, 2),
+            'wall_seconds': round(self.stats.get('wall_seconds', 0.0), 2),
+            'pressure_iae': round(self.stats['iae'], 1),
+            'pressure_rms_error': round(math.sqrt(self.stats['sq_error'] / seconds), 3),
+            'pressure_max_error': round(self.stats['max_error'], 2),
+            'temperature_rms_error': round(math.sqrt(self.stats['temp_sq_error'] / seconds), 3),
+            'energy_kwh': {name: round(kwh, 2) for name, kwh in self.stats['energy_kwh'].items()},
+            'lead_changes': self.stats['lead_changes'],
+            'active_pump': self.pump_manager.active_pump.value,
+            'locked_out': sorted(self.pump_manager.locked_out),
+            'trips': {name: drive.trips for name, drive in self.plant.drives.items()},
+            'recovery': self.recovery.get_status() if self.recovery else None
+        }
+
+
+# ==================== PARAMETER SWEEP ====================
+
+def sweep(kp, target_pressure=None, duration=3600.0, params=None, control_params=None, seed=0,
+          warmup=300.0):
+    """
+    Run the lead-pump pressure loop for many gain sets at once.
+
+    Args:
+        kp: Sequence of proportional gains, one per set
+        target_pressure: Optional sequence of targets (default CONTROL_PARAMS value for all)
+        duration: Simulated seconds per set
+        params: Plant parameters (default config SIMULATOR)
+        control_params: Frequency limits (default config CONTROL_PARAMS)
+        seed: Seed for the sensor noise, shared by every set so they compare fairly
+        warmup: Seconds excluded from the metrics
+
+    Returns:
+        Dict of metric name -> list (one value per set): 'kp', 'target',
+        'iae', 'rms_error', 'max_error', 'power' (mean pump power fraction)
+        and 'travel' (total frequency movement in Hz, actuator wear)
+    """
+    params = params or SIMULATOR
+    control_params = control_params or CONTROL_PARAMS
+    kp = list(kp)
+    target = list(target_pressure) if target_pressure is not None else [control_params['target_pressure']] * len(kp)
+    dt = CONTROL_SCHEDULER['control_period']
+    rng = random.Random(seed)
+    noise = [rng.gauss(0.0, params['pressure_noise']) for _ in range(int(duration / dt))]
+
+    if np is not None:
+        result = _sweep_run(np.asarray(kp, dtype=float), np.asarray(target, dtype=float), noise,
+                            dt, params, control_params, warmup, np)
+        return {key: [float(v) for v in np.broadcast_to(values, (len(kp),))] for key, values in result.items()}
+
+    runs = [_sweep_run(k, t, noise, dt, params, control_params, warmup, _ScalarOps)
+            for k, t in zip(kp, target)]
+    return {key: [run[key] for run in runs] for key in runs[0]} if runs else {}
+
+
+def _sweep_run(kp, target, noise, dt, params, control_params, warmup, ops):
+    """Pressure loop on floats or arrays (ops is numpy or _ScalarOps)"""
+    frequency = kp * 0.0 + BIAS_FREQUENCY
+    pressure = kp * 0.0
+    iae = sq_error = max_error = power = travel = kp * 0.0
+    alpha = 1.0 - math.exp(-dt / params['pipe_time_constant'])
+    ramp = params['accel_rate'] * dt
+    counted = 0
+    for step, n in enumerate(noise):
+        seconds = (step + 1) * dt
+        command = pressure_output(pressure + n, target, kp, control_params['min_frequency'],
+                                  control_params['max_frequency'], ops.minimum, ops.maximum)
+        move = ops.minimum(ramp, ops.maximum(-ramp, command - frequency))
+        frequency = frequency + move
+        speed = frequency / params['rated_frequency']
+        resistance = system_resistance(params, seconds)
+        pressure = pressure + (pump_pressure(speed, resistance, params, ops) - pressure) * alpha
+        if seconds > warmup:
+            error = ops.abs(target - pressure)
+            iae = iae + error * dt
+            sq_error = sq_error + error * error * dt
+            max_error = ops.maximum(max_error, error)
+            power = power + params['pump_load'] * speed ** 3
+            travel = travel + ops.abs(move)
+            counted += 1
+    counted = counted or 1
+    return {
+        'kp': kp,
+        'target': target,
+        'iae': iae,
+        'rms_error': ops.sqrt(sq_error / (counted * dt)),
+        'max_error': max_error,
+        'power': power / counted,
+        'travel': travel
+    }
+
+
+# ==================== COMMAND LINE ====================
+
+def parse_seconds(text):
+    """'90', '90s', '15m' or '6h' -> seconds"""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if text[-1:] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def parse_fault(text):
+    """'<time>:<drive>:<keypad code, fault number or comm>[:<comm loss duration>]'"""
+    parts = text.split(':')
+    if len(parts) not in (3, 4):
+        raise argparse.ArgumentTypeError(f"Bad fault '{text}' (expected time:drive:code[:duration])")
+    at, drive, code = parse_seconds(parts[0]), parts[1], parts[2]
+    if code != 'comm':
+        by_keypad = {keypad: number for number, (keypad, _) in FAULT_CODES.items()}
+        code = by_keypad[code] if code in by_keypad else int(code)
+    duration = parse_seconds(parts[3]) if len(parts) == 4 else 60.0
+    return at, drive, code, duration
+
+
+def parse_range(text):
+    """'start:stop:count' -> evenly spaced values"""
+    start, stop, count = text.split(':')
+    start, stop, count = float(start), float(stop), int(count)
+    if count < 2:
+        return [start]
+    return [start + (stop - start) * i / (count - 1) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate the cooling tower plant and control loops")
+    parser.add_argument('--hours', type=float, default=24.0, help="Simulated hours")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--kp', type=float, help="Pressure loop gain (default CONTROL_PARAMS)")
+    parser.add_argument('--ki', type=float, help="Pressure loop integral gain (default CONTROL_PARAMS)")
+    parser.add_argument('--target', type=float, help="Target pressure in psi (default CONTROL_PARAMS)")
+    parser.add_argument('--autotune', action='store_true',
+                        help="Run the relay autotune first and simulate with the gains it finds")
+    parser.add_argument('--fault', type=parse_fault, action='append', default=[],
+                        help="Inject time:drive:code[:duration], e.g. 6h:pump_primary:OC3 or 2h:fan:comm:120")
+    parser.add_argument('--trace', help="Write a CSV trace to this file")
+    parser.add_argument('--sweep-kp', type=parse_range, metavar='START:STOP:N',
+                        help="Sweep the pressure gain instead of running the closed loop")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Show controller log messages")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(levelname)s %(name)s: %(message)s')
+    control_params = dict(CONTROL_PARAMS)
+    if args.kp is not None:
+        control_params['kp'] = args.kp
+    if args.ki is not None:
+        control_params['ki'] = args.ki
+    if args.target is not None:
+        control_params['target_pressure'] = args.target
+
+    if args.sweep_kp:
+        start = time.monotonic()
+        result = sweep(args.sweep_kp, duration=args.hours * 3600.0, control_params=control_params,
+                       seed=args.seed)
+        print(f"{len(args.sweep_kp)} gain sets x {args.hours:g} h in {time.monotonic() - start:.2f} s "
+              f"({'NumPy' if np is not None else 'pure Python'})")
+        print(f"{'kp':>8} {'IAE':>10} {'RMS':>8} {'max':>8} {'power':>7} {'travel':>9}")
+        rows = zip(result['kp'], result['iae'], result['rms_error'], result['max_error'],
+                   result['power'], result['travel'])
+        for kp, iae, rms, max_error, power, travel in rows:
+            print(f"{kp:8.3f} {iae:10.1f} {rms:8.3f} {max_error:8.2f} {power:7.3f} {travel:9.1f}")
+        best = min(range(len(result['kp'])), key=lambda i: result['iae'][i])
+        print(f"Lowest IAE: kp={result['kp'][best]:.3f}")
+        return
+
+    sim = Simulation(control_params=control_params, seed=args.seed)
+    for at, drive, code, duration in args.fault:
+        if drive not in sim.plant.drives:
+            parser.error(f"Unknown drive '{drive}' (one of {', '.join(sim.plant.drives)})")
+        sim.plant.schedule(at, drive, code, duration)
+    sim.start()
+    if args.autotune:
+        status = sim.autotune()
+        if status['error']:
+            print(f"Autotune failed: {status['error']}")
+        else:
+            result = status['result']
+            print(f"Autotune: Ku={result['ultimate_gain']} Hz/psi, Tu={result['ultimate_period']} s "
+                  f"-> {result['rule']} kp={result['recommended']['kp']} ki={result['recommended']['ki']}")
+    summary = sim.run(args.hours * 3600.0)
+
+    speedup = summary['simulated_hours'] * 3600.0 / max(summary['wall_seconds'], 1e-6)
+    print(f"Simulated {summary['simulated_hours']} h in {summary['wall_seconds']} s ({speedup:,.0f}x)")
+    for key, value in summary.items():
+        if key not in ('simulated_hours', 'wall_seconds'):
+            print(f"  {key}: {value}")
+
+    if args.trace:
+        with open(args.trace, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(sim.trace[0]))
+            writer.writeheader()
+            writer.writerows(sim.trace)
+        print(f"Trace: {len(sim.trace)} samples -> {args.trace}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
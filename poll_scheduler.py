@@ -0,0 +1,225 @@
+"""
+Adaptive drive polling for the RS-485 buses
+
+Instead of reading every drive's full status at a fixed interval, each
+(drive, register block) pair is polled at its own rate. The poller keeps a
+smoothed change probability for every register: blocks whose values keep
+moving (running frequency, output current) drift towards the minimum
+interval, blocks that never change (fault code on a healthy drive, the
+monitoring block of a stopped drive) drift towards the maximum. The sum
+of transaction time over interval across all blocks is the bus
+utilization; when it exceeds the budget every interval is stretched by
+the same factor so polling never crowds out control traffic.
+"""
+
+import time
+import threading
+import logging
+
+from g540_registers import BY_NAME, RUNNING_STATES
+
+logger = logging.getLogger(__name__)
+
+STATE_REGISTER = BY_NAME['state_1'].address
+
+# Modbus RTU framing: 11 bits per character, FC03 request is 8 bytes,
+# response is 5 bytes + 2 per register, plus 3.5 character gaps either side
+_BITS_PER_CHAR = 11
+_TURNAROUND = 0.01
+
+
+class RegisterStats:
+    """Change history of one register"""
+
+    def __init__(self):
+        self.value = None
+        self.polls = 0
+        self.changes = 0
+        self.change_rate = 0.0  # Smoothed probability of a change per poll
+        self.last_change = None
+
+
+class PollItem:
+    """One register block on one drive, polled at its own interval"""
+
+    def __init__(self, name, vfd, register, count, cost, interval):
+        self.name = name
+        self.vfd = vfd
+        self.register = register
+        self.count = count
+        self.cost = cost          # Seconds of bus time per poll
+        self.interval = interval  # Desired interval before the budget is applied
+        self.next_due = 0.0
+        self.last_poll = None
+        self.polls = 0
+        self.failures = 0
+        self.registers = {register + i: RegisterStats() for i in range(count)}
+
+    def change_rate(self):
+        return max(r.change_rate for r in self.registers.values())
+
+
+class AdaptivePoller(threading.Thread):
+    """Worker thread polling one bus by register change rate within a utilization budget"""
+
+    def __init__(self, bus, callback, skip=None, blocks=((0x2100, 3), (0x3000, 7)),
+                 min_interval=1.0, max_interval=10.0, bus_budget=0.3, deadbands=None,
+                 smoothing=0.2, clock=time.monotonic):
+        """
+        Initialize adaptive poller.
+
+        Args:
+            bus: ModbusBus to poll
+            callback: Called as callback(name, status) after each block poll
+            skip: Optional skip(name) -> bool to leave a drive out
+            blocks: (start register, count) blocks polled per drive
+            min_interval: Shortest poll interval for a block in seconds
+            max_interval: Longest poll interval for a block in seconds
+                          (before the budget stretches it)
+            bus_budget: Fraction of bus time polling may use
+            deadbands: Dict of register -> raw change that still counts as unchanged
+            smoothing: Weight of the newest sample in the change rate (0-1)
+            clock: Monotonic clock function
+        """
+        super().__init__(name=f"poll-{bus.name}", daemon=True)
+        self.bus = bus
+        self.callback = callback
+        self.skip = skip
+        self.blocks = blocks
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.bus_budget = bus_budget
+        self.deadbands = deadbands or {}
+        self.smoothing = smoothing
+        self.clock = clock
+
+        self.items = []
+        self._known = set()
+        self.scale = 1.0
+        self.utilization = 0.0
+        self._stop_event = threading.Event()
+
+    def _estimate_cost(self, count):
+        chars = 8 + 5 + 2 * count + 7  # Request, response, two 3.5 char gaps
+        return chars * _BITS_PER_CHAR / self.bus.baudrate + _TURNAROUND
+
+    def _sync_items(self):
+        """Pick up drives added to the bus since the last round"""
+        for name, vfd in list(self.bus.vfds.items()):
+            if name in self._known:
+                continue
+            self._known.add(name)
+            for register, count in self.blocks:
+                self.items.append(PollItem(name, vfd, register, count,
+                                           self._estimate_cost(count), self.min_interval))
+
+    def _is_running(self, vfd):
+        state = vfd.shadow.get(STATE_REGISTER)
+        return state is not None and state[0] in RUNNING_STATES
+
+    def _desired_interval(self, item):
+        # Measurements of a stopped drive don't move; only its state block matters
+        if item.register != STATE_REGISTER and not self._is_running(item.vfd):
+            return self.max_interval
+        rate = item.change_rate()
+        return self.max_interval - (self.max_interval - self.min_interval) * rate
+
+    def _update_budget(self):
+        active = [item for item in self.items if not (self.skip and self.skip(item.name))]
+        self.utilization = sum(item.cost / item.interval for item in active)
+        self.scale = max(1.0, self.utilization / self.bus_budget) if self.bus_budget > 0 else 1.0
+
+    def _record(self, item, values, now):
+        for i, value in enumerate(values):
+            stats = item.registers[item.register + i]
+            changed = (stats.value is not None and
+                       abs(value - stats.value) > self.deadbands.get(item.register + i, 0))
+            if stats.value is None or changed:
+                stats.value = value
+            stats.polls += 1
+            if changed:
+                stats.changes += 1
+                stats.last_change = now
+            stats.change_rate += self.smoothing * ((1.0 if changed else 0.0) - stats.change_rate)
+
+    def _poll(self, item, now):
+        start = self.clock()
+        values = item.vfd.refresh(item.register, count=item.count, retries=1)
+        elapsed = self.clock() - start
+
+        item.polls += 1
+        item.last_poll = now
+        item.cost += self.smoothing * (elapsed - item.cost)
+
+        if values is None:
+            # Don't hammer a silent drive; its timeouts cost the most bus time
+            item.failures += 1
+            item.interval = self.max_interval
+            status = item.vfd.decode_status(None, None)
+        else:
+            if item.count == 1:
+                values = [values]
+            self._record(item, values, now)
+            item.interval = self._desired_interval(item)
+            status = item.vfd.cached_status()
+
+        try:
+            self.callback(item.name, status)
+        except Exception as e:
+            logger.error(f"[{self.bus.name}] Poll callback error for '{item.name}': {e}")
+
+    def _next_item(self, now):
+        """The most overdue item; blocks invalidated by a write are due early"""
+        best = None
+        for item in self.items:
+            if self.skip and self.skip(item.name):
+                continue  # Polled elsewhere; its writes must not make it due here
+            due = item.next_due
+            if (item.last_poll is not None and now - item.last_poll >= self.min_interval
+                    and item.vfd.needs_refresh(item.register, item.count)):
+                due = now
+            if best is None or due < best[0]:
+                best = (due, item)
+        return best
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._sync_items()
+            now = self.clock()
+            best = self._next_item(now)
+            if best is None:
+                # No drives yet, or every drive is skipped for now
+                self._stop_event.wait(self.min_interval)
+                continue
+
+            due, item = best
+            if due > now:
+                self._stop_event.wait(min(due - now, self.min_interval))
+                continue
+
+            try:
+                self._poll(item, now)
+            except Exception as e:
+                logger.error(f"[{self.bus.name}] Poll error for '{item.name}': {e}")
+            self._update_budget()
+            item.next_due = now + item.interval * self.scale
+
+    def stop(self):
+        self._stop_event.set()
+
+    def get_stats(self):
+        return {
+            'utilization': round(self.utilization, 3),
+            'budget': self.bus_budget,
+            'scale': round(self.scale, 2),
+            'items': [{
+                'drive': item.name,
+                'register': f"0x{item.register:04X}",
+                'count': item.count,
+                'interval': round(item.interval * self.scale, 2),
+                'change_rate': round(item.change_rate(), 3),
+                'cost_ms': round(item.cost * 1000, 1),
+                'polls': item.polls,
+                'failures': item.failures
+            } for item in self.items]
+        }
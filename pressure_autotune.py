@@ -0,0 +1,198 @@
+"""
+Relay-feedback autotune of the pump pressure loop
+
+Åström-Hägglund relay experiment: the pressure loop is replaced by an
+on/off relay that drives the active pump a fixed amplitude above the
+frequency it was running at while pressure is below the level it held
+there, and the same amount below while pressure is above. Switching
+around that operating point (rather than the target, which a P-only loop
+never quite reaches) keeps the cycle symmetric. The loop settles into a
+limit cycle whose period is the ultimate period Tu, and whose pressure
+amplitude a gives the ultimate gain
+
+    Ku = 4 d / (pi * sqrt(a^2 - h^2))     (d: relay amplitude, h: hysteresis)
+
+from which the usual tuning rules give PI gains. The test is bounded:
+it aborts, handing the pump back to the pressure loop, if pressure leaves
+a band around target, if it runs too long or the cycles do not settle,
+or if a failover changes the pump under test.
+"""
+
+import math
+import time
+import logging
+import statistics
+
+logger = logging.getLogger(__name__)
+
+# (kp / Ku, Ti / Tu); Ti = None for no integral action
+TUNING_RULES = {
+    'ziegler_nichols': (0.45, 1.0 / 1.2),
+    'tyreus_luyben': (1.0 / 3.2, 2.2),
+    'p_only': (0.5, None),
+}
+
+
+class AutotuneAborted(Exception):
+    """The relay experiment was stopped before it produced a result"""
+
+
+class RelayAutotuner:
+    """Bounded relay experiment on the pressure loop"""
+
+    def __init__(self, target, center, pump, min_frequency, max_frequency, amplitude=5.0,
+                 hysteresis=0.3, max_deviation=8.0, cycles=4, max_cycles=10, max_duration=600.0,
+                 rule='tyreus_luyben', max_kp=10.0, max_ki=2.0, clock=time.monotonic):
+        """
+        Initialize relay autotuner.
+
+        Args:
+            target: Pressure setpoint in psi (the safety band is around it)
+            center: Pump frequency in Hz the relay steps above and below
+            pump: Active pump when the test starts ('primary' / 'backup')
+            min_frequency: Lowest relay output in Hz
+            max_frequency: Highest relay output in Hz
+            amplitude: Relay step d in Hz
+            hysteresis: Switching band h in psi (keep above sensor noise)
+            max_deviation: Abort if pressure is further than this from target (psi)
+            cycles: Oscillation cycles averaged for the estimate
+            max_cycles: Abort if the periods have not settled after this many
+            max_duration: Abort after this many seconds
+            rule: Tuning rule for the recommended gains (see TUNING_RULES)
+            max_kp: Upper limit on the recommended proportional gain
+            max_ki: Upper limit on the recommended integral gain
+            clock: Monotonic clock function
+        """
+        if rule not in TUNING_RULES:
+            raise ValueError(f"Unknown tuning rule '{rule}' (one of {', '.join(TUNING_RULES)})")
+        self.target = target
+        self.center = center
+        self.pump = pump
+        self.high = min(max_frequency, center + amplitude)
+        self.low = max(min_frequency, center - amplitude)
+        if self.high - self.low < amplitude:
+            raise ValueError(f"Pump at {center:.1f} Hz leaves no room for a ±{amplitude:.1f} Hz relay "
+                             f"within {min_frequency:.0f}-{max_frequency:.0f} Hz")
+        self.hysteresis = hysteresis
+        self.max_deviation = max_deviation
+        self.cycles = cycles
+        self.max_cycles = max_cycles
+        self.max_duration = max_duration
+        self.rule = rule
+        self.max_kp = max_kp
+        self.max_ki = max_ki
+        self.clock = clock
+
+        self.started = self.clock()
+        self.level = None      # pressure the relay switches around (first sample)
+        self.output = self.high
+        self.rises = []        # times the relay switched up (one per cycle)
+        self.peaks = []        # (max, min) pressure per completed cycle
+        self._high = -math.inf
+        self._low = math.inf
+        self.result = None
+        self.error = None
+
+    @property
+    def done(self):
+        return self.result is not None or self.error is not None
+
+    def cancel(self, reason='Cancelled'):
+        """Stop the test from outside (operator, auto mode off, system stop)"""
+        if not self.done:
+            self.error = reason
+            logger.info(f"Pressure autotune cancelled: {reason}")
+
+    def _abort(self, reason):
+        self.error = reason
+        logger.warning(f"Pressure autotune aborted: {reason}")
+        raise AutotuneAborted(reason)
+
+    def update(self, pressure, pump):
+        """
+        Feed one pressure sample.
+
+        Args:
+            pressure: Measured pressure in psi
+            pump: Currently active pump
+
+        Returns:
+            Relay output frequency in Hz, or None once the result is ready
+
+        Raises:
+            AutotuneAborted: A safety limit was hit; restore the previous frequency
+        """
+        now = self.clock()
+        if self.level is None:
+            self.level = pressure
+        if pump != self.pump:
+            self._abort(f"Active pump changed to {pump}")
+        if abs(pressure - self.target) > self.max_deviation:
+            self._abort(f"Pressure {pressure:.1f} psi outside {self.target:.1f} ± {self.max_deviation:.1f}")
+        if now - self.started > self.max_duration:
+            self._abort(f"No stable oscillation within {self.max_duration:.0f} s")
+
+        self._high = max(self._high, pressure)
+        self._low = min(self._low, pressure)
+        if self.output == self.high and pressure > self.level + self.hysteresis:
+            self.output = self.low
+        elif self.output == self.low and pressure < self.level - self.hysteresis:
+            self.output = self.high
+            self.rises.append(now)
+            if len(self.rises) > 1:
+                self.peaks.append((self._high, self._low))
+            self._high = -math.inf
+            self._low = math.inf
+            if self._settled():
+                self.result = self._estimate()
+                return None
+            if len(self.peaks) >= self.max_cycles:
+                self._abort(f"Oscillation did not settle in {self.max_cycles} cycles")
+        return self.output
+
+    def _settled(self):
+        """Last cycles agree in period and amplitude to within 10 %"""
+        if len(self.peaks) < self.cycles + 1:  # The first cycle is a transient
+            return False
+        periods = [b - a for a, b in zip(self.rises[-self.cycles - 1:], self.rises[-self.cycles:])]
+        amplitudes = [(high - low) / 2 for high, low in self.peaks[-self.cycles:]]
+        return (statistics.pstdev(periods) <= 0.1 * statistics.mean(periods) and
+                statistics.pstdev(amplitudes) <= 0.1 * statistics.mean(amplitudes))
+
+    def _estimate(self):
+        periods = [b - a for a, b in zip(self.rises[-self.cycles - 1:], self.rises[-self.cycles:])]
+        amplitude = statistics.mean((high - low) / 2 for high, low in self.peaks[-self.cycles:])
+        tu = statistics.mean(periods)
+        d = (self.high - self.low) / 2
+        ku = 4 * d / (math.pi * math.sqrt(max(amplitude ** 2 - self.hysteresis ** 2, 1e-6)))
+
+        candidates = {}
+        for rule, (kp_ratio, ti_ratio) in TUNING_RULES.items():
+            kp = min(self.max_kp, kp_ratio * ku)
+            ki = min(self.max_ki, kp / (ti_ratio * tu)) if ti_ratio else 0.0
+            candidates[rule] = {'kp': round(kp, 4), 'ki': round(ki, 5)}
+        logger.info(f"Pressure autotune: Ku={ku:.3f} Hz/psi, Tu={tu:.1f} s, "
+                    f"{self.rule} -> kp={candidates[self.rule]['kp']}, ki={candidates[self.rule]['ki']}")
+        return {
+            'ultimate_gain': round(ku, 4),
+            'ultimate_period': round(tu, 2),
+            'amplitude_psi': round(amplitude, 3),
+            'cycles': len(self.peaks),
+            'duration': round(self.clock() - self.started, 1),
+            'candidates': candidates,
+            'rule': self.rule,
+            'recommended': candidates[self.rule]
+        }
+
+    def get_status(self):
+        return {
+            'active': not self.done,
+            'pump': self.pump,
+            'center': self.center,
+            'level': self.level,
+            'output': self.output,
+            'cycles': len(self.peaks),
+            'elapsed': round(self.clock() - self.started, 1),
+            'result': self.result,
+            'error': self.error
+        }
@@ -0,0 +1,59 @@
+"""
+Pump pressure control law
+
+PI control on discharge pressure: the integral term is the pump frequency
+at zero error, seeded with a fixed bias frequency. With ki = 0 it never
+moves, which is plain proportional control around the bias. Shared by the
+control daemon, main_control.py, the plant simulator and capture replay,
+so a replay or simulation runs exactly the law that runs on the tower.
+"""
+
+import time
+
+BIAS_FREQUENCY = 30.0  # Hz at zero pressure error (also the pump start frequency)
+
+
+def pressure_output(pressure, target, kp, min_frequency, max_frequency, minimum=min, maximum=max):
+    """P-only pump frequency for a measured pressure (pass NumPy's minimum/maximum for arrays)"""
+    return minimum(max_frequency, maximum(min_frequency, BIAS_FREQUENCY + (target - pressure) * kp))
+
+
+class PressureController:
+    """PI pressure loop; gains and limits are read from the settings on every update"""
+
+    def __init__(self, clock=time.monotonic):
+        """
+        Initialize pressure controller.
+
+        Args:
+            clock: Monotonic clock function
+        """
+        self.clock = clock
+        self.integral = BIAS_FREQUENCY
+        self.last_update = None
+
+    def reset(self, frequency=BIAS_FREQUENCY):
+        """Re-seed the loop (pump start, auto mode on, end of an autotune test)"""
+        self.integral = frequency
+        self.last_update = None
+
+    def update(self, pressure, params):
+        """
+        Run one control update.
+
+        Args:
+            pressure: Measured pressure in psi
+            params: CONTROL_PARAMS-style dict (target_pressure, kp, ki, min/max_frequency)
+
+        Returns:
+            Pump frequency in Hz
+        """
+        now = self.clock()
+        error = params['target_pressure'] - pressure
+        ki = params.get('ki', 0.0)
+        if ki and self.last_update is not None:
+            self.integral += ki * error * (now - self.last_update)
+            # Anti-windup: integral alone never leaves the frequency range
+            self.integral = max(params['min_frequency'], min(params['max_frequency'], self.integral))
+        self.last_update = now
+        return max(params['min_frequency'], min(params['max_frequency'], self.integral + params['kp'] * error))
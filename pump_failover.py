@@ -1,3 +1,5 @@
+import os
+import json
 import time
 import logging
 from enum import Enum
@@ -13,7 +15,11 @@ class PumpState(Enum):
 class PumpFailoverManager:
     """Manages automatic failover between primary and backup pump motors"""
     
-    def __init__(self, primary_vfd, backup_vfd, max_errors=3, check_interval=5.0):
+    def __init__(self, primary_vfd, backup_vfd, max_errors=3, check_interval=5.0,
+                 health_monitor=None, rotation_hours=None, handover_ramp_time=10.0,
+                 min_frequency=20.0, runtime_file=None, save_interval=300.0,
+                 stage_frequency=None, stage_delay=60.0, destage_frequency=35.0,
+                 destage_delay=120.0, stage_ramp_time=10.0, clock=time.monotonic):
         """
         Initialize pump failover manager.
         
@@ -22,14 +28,57 @@ class PumpFailoverManager:
             backup_vfd: VFDController for backup pump
             max_errors: Maximum consecutive errors before failover
             check_interval: Health check interval in seconds
+            health_monitor: Optional PumpHealthMonitor for predictive failover
+            rotation_hours: Lead run hours before rotating lead/lag (None disables)
+            handover_ramp_time: Seconds for each ramp of a staged handover
+            min_frequency: Frequency the incoming/outgoing pump ramps from/to
+            runtime_file: JSON file for persisted run-hour counters
+            save_interval: Seconds between run-hour saves
+            stage_frequency: Lead frequency that calls for the lag pump (None disables)
+            stage_delay: Seconds demand must stay at stage_frequency before staging
+            destage_frequency: Parallel frequency below which the lag pump is dropped
+            destage_delay: Seconds demand must stay low before destaging
+            stage_ramp_time: Seconds to ramp the lag pump in or out
+            clock: Monotonic clock function
         """
         self.primary = primary_vfd
         self.backup = backup_vfd
         self.max_errors = max_errors
         self.check_interval = check_interval
+        self.health_monitor = health_monitor
+        self._observed = {}  # pump -> shadow timestamp of the last sample fed to health
+        self.rotation_hours = rotation_hours
+        self.handover_ramp_time = handover_ramp_time
+        self.min_frequency = min_frequency
+        self.runtime_file = runtime_file
+        self.save_interval = save_interval
+        self.stage_frequency = stage_frequency
+        self.stage_delay = stage_delay
+        self.destage_frequency = destage_frequency
+        self.destage_delay = destage_delay
+        self.stage_ramp_time = stage_ramp_time
+        self.clock = clock
         
         self.active_pump = PumpState.PRIMARY
-        self.last_check = time.time()
+        self.last_check = self.clock()
+        
+        # Lead/lag run-hour bookkeeping
+        self.running = False
+        self.frequency = None
+        self.handover = None
+        self.run_hours = {'primary': 0.0, 'backup': 0.0}
+        self.lead_start_hours = 0.0
+        self._runtime_mark = None
+        self._last_save = self.clock()
+        self._load_runtime()
+        
+        # Pumps taken out of service after a trip that could not be reset
+        self.locked_out = set()
+        
+        # Parallel staging of the lag pump
+        self.staged = None
+        self._stage_since = None
+        self._destage_since = None
         
         logger.info("Pump Failover Manager initialized")
         logger.info(f"Primary: {primary_vfd.description}")
@@ -43,50 +92,379 @@ class PumpFailoverManager:
             return self.backup
         return None
     
+    def needs_running(self, vfd):
+        """True if the pump should be running now: the lead, or the lag while staged or in a handover"""
+        if not self.running or self.active_pump == PumpState.FAILED:
+            return False
+        if vfd is self.get_active_vfd():
+            return True
+        return bool(self.staged or self.handover)
+    
+    def _vfd_for(self, state):
+        return self.primary if state == PumpState.PRIMARY else self.backup
+    
+    def _other(self, state):
+        return PumpState.BACKUP if state == PumpState.PRIMARY else PumpState.PRIMARY
+    
+    def _load_runtime(self):
+        """Load persisted run-hour counters and lead pump"""
+        if not self.runtime_file or not os.path.exists(self.runtime_file):
+            return
+        try:
+            with open(self.runtime_file) as f:
+                data = json.load(f)
+            self.run_hours['primary'] = float(data.get('primary_hours', 0.0))
+            self.run_hours['backup'] = float(data.get('backup_hours', 0.0))
+            if self.rotation_hours:
+                self.active_pump = PumpState(data.get('lead', 'primary'))
+                self.lead_start_hours = float(data.get('lead_start_hours', 0.0))
+            logger.info(f"Loaded pump run hours: primary={self.run_hours['primary']:.1f}h, "
+                        f"backup={self.run_hours['backup']:.1f}h, lead={self.active_pump.value}")
+        except Exception as e:
+            logger.error(f"Failed to load pump run hours: {e}")
+    
+    def _save_runtime(self):
+        """Persist run-hour counters atomically"""
+        self._last_save = self.clock()
+        if not self.runtime_file:
+            return
+        data = {
+            'primary_hours': self.run_hours['primary'],
+            'backup_hours': self.run_hours['backup'],
+            'lead': self.active_pump.value if self.active_pump != PumpState.FAILED else 'primary',
+            'lead_start_hours': self.lead_start_hours
+        }
+        try:
+            tmp = self.runtime_file + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.runtime_file)
+        except Exception as e:
+            logger.error(f"Failed to save pump run hours: {e}")
+    
+    def _update_runtime(self):
+        """Accumulate run hours for every pump currently running"""
+        now = self.clock()
+        if self.running and self._runtime_mark is not None:
+            hours = (now - self._runtime_mark) / 3600.0
+            if self.active_pump != PumpState.FAILED:
+                self.run_hours[self.active_pump.value] += hours
+            if self.handover:
+                self.run_hours[self.handover['outgoing_state'].value] += hours
+            elif self.staged and self.active_pump != PumpState.FAILED:
+                self.run_hours[self._other(self.active_pump).value] += hours
+        self._runtime_mark = now
+        
+        if now - self._last_save >= self.save_interval:
+            self._save_runtime()
+    
+    def _set_lead(self, state):
+        """Make `state` the lead pump and restart its rotation clock"""
+        self.active_pump = state
+        if state != PumpState.FAILED:
+            self.lead_start_hours = self.run_hours[state.value]
+        self._save_runtime()
+    
+    def lead_hours(self):
+        """Run hours the current lead pump has accumulated since taking the lead"""
+        if self.active_pump == PumpState.FAILED:
+            return 0.0
+        return self.run_hours[self.active_pump.value] - self.lead_start_hours
+    
+    def start(self, hz):
+        """Start the lead pump at the given frequency"""
+        active = self.get_active_vfd()
+        if not active:
+            return False
+        self.frequency = hz
+        active.set_frequency(hz)
+        ok = active.start()
+        self.running = True
+        self._runtime_mark = self.clock()
+        return ok
+    
+    def switch_lead(self):
+        """Hand the lead to the other pump (staged while running)"""
+        if self.handover or self.staged:
+            return False
+        if self.active_pump == PumpState.FAILED:
+            return False
+        if not self.running:
+            self._set_lead(self._other(self.active_pump))
+            logger.info(f"Lead pump set to {self.active_pump.value}")
+            return True
+        return self._begin_handover()
+    
+    def _begin_handover(self):
+        """Start the lag pump at minimum speed; it ramps up before the lead ramps down"""
+        outgoing_state = self.active_pump
+        incoming_state = self._other(outgoing_state)
+        incoming = self._vfd_for(incoming_state)
+        
+        logger.info(f"ROTATION: Handing over from {outgoing_state.value} to {incoming_state.value} "
+                    f"(run hours P{self.run_hours['primary']:.1f}/B{self.run_hours['backup']:.1f})")
+        
+        incoming.set_frequency(self.min_frequency)
+        if not incoming.start():
+            logger.error(f"Handover aborted: {incoming_state.value} pump failed to start")
+            incoming.stop()
+            return False
+        
+        self._update_runtime()
+        self.handover = {
+            'outgoing_state': outgoing_state,
+            'phase': 'ramp_up',
+            'phase_start': self.clock()
+        }
+        self._set_lead(incoming_state)
+        return True
+    
+    def _advance_handover(self, hz):
+        """Drive both pumps through the handover ramps for this control cycle"""
+        outgoing = self._vfd_for(self.handover['outgoing_state'])
+        incoming = self.get_active_vfd()
+        hz = max(hz, self.min_frequency)
+        
+        now = self.clock()
+        progress = min(1.0, (now - self.handover['phase_start']) / self.handover_ramp_time)
+        
+        complete = False
+        if self.handover['phase'] == 'ramp_up':
+            # Outgoing holds the demand while incoming ramps up to it
+            incoming_hz = self.min_frequency + (hz - self.min_frequency) * progress
+            outgoing_hz = hz
+            if progress >= 1.0:
+                self.handover['phase'] = 'ramp_down'
+                self.handover['phase_start'] = now
+        else:
+            # Incoming carries the demand while outgoing ramps down
+            incoming_hz = hz
+            outgoing_hz = hz - (hz - self.min_frequency) * progress
+            complete = progress >= 1.0
+        
+        ok = incoming.set_frequency(incoming_hz)
+        outgoing.set_frequency(outgoing_hz)
+        
+        if complete:
+            self._update_runtime()
+            outgoing.stop()
+            logger.info(f"ROTATION: Handover to {self.active_pump.value} complete")
+            self.handover = None
+            self._save_runtime()
+        return ok
+    
+    def _update_staging(self, hz):
+        """Run the lag pump in parallel while demand stays at the top of the range"""
+        lead = self.get_active_vfd()
+        lag_state = self._other(self.active_pump)
+        lag = self._vfd_for(lag_state)
+        now = self.clock()
+        
+        if self.staged is None:
+            if hz >= self.stage_frequency:
+                if self._stage_since is None:
+                    self._stage_since = now
+                elif (now - self._stage_since >= self.stage_delay
+                        and lag.is_healthy(self.max_errors)
+                        and not self._predicted_failure(lag_state.value)):
+                    self._stage_lag(lag_state)
+            else:
+                self._stage_since = None
+            return lead.set_frequency(hz)
+        
+        hz = max(hz, self.min_frequency)
+        progress = min(1.0, (now - self.staged['phase_start']) / self.stage_ramp_time)
+        
+        destaged = False
+        if self.staged['phase'] == 'ramp_up':
+            lag_hz = self.min_frequency + (hz - self.min_frequency) * progress
+            if progress >= 1.0:
+                self.staged['phase'] = 'parallel'
+                logger.info(f"STAGING: Both pumps in parallel at {hz:.1f} Hz")
+        elif self.staged['phase'] == 'parallel':
+            # Identical pumps in parallel share load equally at equal speed
+            lag_hz = hz
+            if hz <= self.destage_frequency:
+                if self._destage_since is None:
+                    self._destage_since = now
+                elif now - self._destage_since >= self.destage_delay:
+                    logger.info(f"STAGING: Demand low ({hz:.1f} Hz), destaging {lag_state.value} pump")
+                    self.staged = {'phase': 'ramp_down', 'phase_start': now}
+            else:
+                self._destage_since = None
+        else:
+            # Lead picks the load back up as the pressure loop raises its speed
+            lag_hz = hz - (hz - self.min_frequency) * progress
+            destaged = progress >= 1.0
+        
+        ok = lead.set_frequency(hz)
+        lag.set_frequency(lag_hz)
+        
+        if destaged:
+            self._destage()
+        return ok
+    
+    def _stage_lag(self, lag_state):
+        """Start the lag pump at minimum speed for parallel operation"""
+        lag = self._vfd_for(lag_state)
+        logger.info(f"STAGING: Sustained high demand, starting {lag_state.value} pump in parallel")
+        lag.set_frequency(self.min_frequency)
+        if not lag.start():
+            logger.error(f"Staging aborted: {lag_state.value} pump failed to start")
+            lag.stop()
+            self._stage_since = None
+            return False
+        self._update_runtime()
+        self.staged = {'phase': 'ramp_up', 'phase_start': self.clock()}
+        self._stage_since = None
+        self._destage_since = None
+        return True
+    
+    def _destage(self):
+        """Stop the lag pump and return to single-pump operation"""
+        self._update_runtime()
+        lag = self._vfd_for(self._other(self.active_pump))
+        lag.stop()
+        self.staged = None
+        self._destage_since = None
+        logger.info(f"STAGING: Back to single pump ({self.active_pump.value})")
+    
+    def observe(self, vfd, status):
+        """Feed a pump status sample to the health monitor"""
+        if not self.health_monitor:
+            return
+        name = 'primary' if vfd is self.primary else 'backup'
+        # A status served from the register cache is a sample we have already seen
+        stamp = vfd.shadow.get(vfd.REG_STATE_1, (None, None))[1]
+        if stamp is not None and self._observed.get(name) == stamp:
+            return
+        self._observed[name] = stamp
+        self.health_monitor.record(name, status, vfd.last_latency, vfd.error_count)
+    
+    def _predicted_failure(self, name):
+        """True if the health monitor expects this pump to trip (or it is locked out)"""
+        if name in self.locked_out:
+            return True
+        return self.health_monitor is not None and self.health_monitor.is_degraded(name)
+    
+    def pump_failed(self, vfd):
+        """
+        Take a tripped pump out of service (fault recovery gave up).
+        
+        The pump is skipped for failback, staging and rotation until
+        pump_restored() is called.
+        """
+        name = 'primary' if vfd is self.primary else 'backup'
+        self.locked_out.add(name)
+        state = PumpState(name)
+        if self.handover:
+            outgoing_state = self.handover['outgoing_state']
+            self._update_runtime()
+            self.handover = None
+            if outgoing_state == state:
+                # The incoming pump already holds the lead; it carries the demand alone
+                logger.warning(f"ROTATION: Handover aborted, outgoing {name} pump failed")
+                vfd.stop()
+            else:
+                logger.warning(f"ROTATION: Handover aborted, incoming {name} pump failed")
+        if self.staged and self.active_pump != state:
+            self._destage()
+        elif self.active_pump == state:
+            other = self._other(state)
+            if other.value in self.locked_out:
+                logger.error("CRITICAL: Both pumps locked out")
+                self._set_lead(PumpState.FAILED)
+            elif state == PumpState.PRIMARY:
+                self._failover_to_backup()
+            else:
+                self._failback_to_primary()
+    
+    def pump_restored(self, vfd):
+        """A locked-out pump is healthy again"""
+        name = 'primary' if vfd is self.primary else 'backup'
+        if name in self.locked_out:
+            self.locked_out.discard(name)
+            logger.info(f"{name.capitalize()} pump back in service")
+    
     def check_health(self):
         """Check health and perform failover if needed"""
-        now = time.time()
+        now = self.clock()
         if now - self.last_check < self.check_interval:
             return  # Not time to check yet
         
         self.last_check = now
+        self._update_runtime()
+        
+        if self.handover:
+            return  # Both pumps running; let the handover finish
+        
+        if self.staged and self.active_pump != PumpState.FAILED:
+            lag_state = self._other(self.active_pump)
+            if not self._vfd_for(lag_state).is_healthy(self.max_errors) or self._predicted_failure(lag_state.value):
+                logger.warning(f"Staged {lag_state.value} pump unhealthy, destaging")
+                self._destage()
         
         if self.active_pump == PumpState.PRIMARY:
             if not self.primary.is_healthy(self.max_errors):
                 logger.warning(f"Primary pump unhealthy (errors: {self.primary.error_count})")
                 self._failover_to_backup()
+            elif self._predicted_failure('primary') and not self._predicted_failure('backup'):
+                logger.warning(f"Primary pump degrading (health score "
+                               f"{self.health_monitor.score('primary'):.0f}), failing over early")
+                self._failover_to_backup()
         
         elif self.active_pump == PumpState.BACKUP:
-            # Check if primary has recovered
-            if self.primary.is_healthy(self.max_errors):
+            primary_ok = self.primary.is_healthy(self.max_errors) and not self._predicted_failure('primary')
+            if self.rotation_hours:
+                # Backup is a normal lead under rotation; only leave it if it fails
+                if not self.backup.is_healthy(self.max_errors) and primary_ok:
+                    logger.warning(f"Backup pump unhealthy (errors: {self.backup.error_count})")
+                    self._failback_to_primary()
+            # Check if primary has recovered (health score must clear its recovery threshold)
+            elif primary_ok:
                 logger.info("Primary pump recovered, switching back")
                 self._failback_to_primary()
+        
+        if (self.rotation_hours and self.running and not self.staged
+                and self.active_pump != PumpState.FAILED
+                and self.lead_hours() >= self.rotation_hours):
+            lag = self._other(self.active_pump)
+            if self._vfd_for(lag).is_healthy(self.max_errors) and not self._predicted_failure(lag.value):
+                self._begin_handover()
     
     def _failover_to_backup(self):
         """Switch from primary to backup pump"""
         logger.warning("FAILOVER: Switching to backup pump")
+        self._update_runtime()
+        self.staged = None
         
         # Stop primary
         self.primary.stop()
         
         # Start backup
+        if self.frequency is not None:
+            self.backup.set_frequency(self.frequency)
         if self.backup.start():
-            self.active_pump = PumpState.BACKUP
+            self._set_lead(PumpState.BACKUP)
             logger.info("Backup pump activated successfully")
         else:
             logger.error("CRITICAL: Backup pump failed to start!")
-            self.active_pump = PumpState.FAILED
+            self._set_lead(PumpState.FAILED)
     
     def _failback_to_primary(self):
         """Switch from backup back to primary pump"""
         logger.info("FAILBACK: Switching to primary pump")
+        self._update_runtime()
+        self.staged = None
         
         # Stop backup
         self.backup.stop()
         
         # Start primary
+        if self.frequency is not None:
+            self.primary.set_frequency(self.frequency)
         if self.primary.start():
-            self.active_pump = PumpState.PRIMARY
+            self._set_lead(PumpState.PRIMARY)
             self.primary.error_count = 0  # Reset error count
             logger.info("Primary pump reactivated successfully")
         else:
@@ -95,25 +473,50 @@ class PumpFailoverManager:
     
     def set_frequency(self, hz):
         """Set frequency on the active pump"""
+        self.frequency = hz
+        if self.handover:
+            return self._advance_handover(hz)
+        if self.stage_frequency and self.running and self.active_pump != PumpState.FAILED:
+            return self._update_staging(hz)
         active = self.get_active_vfd()
         if active:
             return active.set_frequency(hz)
         return False
     
-    def stop(self):
-        """Stop both pumps"""
+    def stop(self, send=True):
+        """Stop both pumps (send=False: bookkeeping only, the drives were already stopped)"""
         logger.info("Stopping all pumps")
-        self.primary.stop()
-        self.backup.stop()
+        self._update_runtime()
+        self.running = False
+        self.handover = None
+        self.staged = None
+        self._stage_since = None
+        self._save_runtime()
+        if send:
+            self.primary.stop()
+            self.backup.stop()
     
     def get_status(self):
-        """Get status of pump system"""
+        """Get status of pump system (both pumps are read and health-scored)"""
         active = self.get_active_vfd()
+        # The standby is scored too, so a degraded backup is not failed over to
+        vfd_status = {}
+        for name, vfd in (('primary', self.primary), ('backup', self.backup)):
+            vfd_status[name] = vfd.get_status()
+            self.observe(vfd, vfd_status[name])
+        active_status = vfd_status[self.active_pump.value] if active else None
         return {
             "active_pump": self.active_pump.value,
             "primary_healthy": self.primary.is_healthy(self.max_errors),
             "backup_healthy": self.backup.is_healthy(self.max_errors),
             "primary_errors": self.primary.error_count,
             "backup_errors": self.backup.error_count,
-            "active_vfd_status": active.get_status() if active else None
+            "active_vfd_status": active_status,
+            "vfd_status": vfd_status,
+            "run_hours": {name: round(hours, 2) for name, hours in self.run_hours.items()},
+            "lead_hours": round(self.lead_hours(), 2),
+            "handover": self.handover['phase'] if self.handover else None,
+            "staged": self.staged['phase'] if self.staged else None,
+            "locked_out": sorted(self.locked_out),
+            "health": self.health_monitor.get_status() if self.health_monitor else None
         }
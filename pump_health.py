@@ -0,0 +1,211 @@
+"""
+Predictive pump health scoring
+
+Scores each pump 0-100 from the telemetry the G540 already exposes:
+output current level and trend (0x3004), fault code (0x2102), the
+overload alarm bit in state word 2 (0x2101) and Modbus transaction
+latency. A pump is marked degraded after its score stays below the
+failover threshold for several samples, and only counts as recovered
+once it stays above a higher threshold for a minimum time.
+"""
+
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+STATE2_OVERLOAD = 0x0010  # Bit 4: Overload alarm
+
+
+class PumpHealth:
+    """Health score history and hysteresis state for one pump"""
+
+    def __init__(self, name, history_size=720):
+        self.name = name
+        self.score = 100.0
+        self.degraded = False
+        self.reasons = []
+
+        self.current_samples = deque(maxlen=120)   # (time, amps)
+        self.latency_avg = None
+        self.history = deque(maxlen=history_size)   # (time, score)
+
+        self.low_count = 0
+        self.recover_since = None
+
+    def get_status(self):
+        return {
+            'score': round(self.score, 1),
+            'degraded': self.degraded,
+            'reasons': list(self.reasons),
+            'latency_ms': round(self.latency_avg * 1000, 1) if self.latency_avg is not None else None
+        }
+
+
+class PumpHealthMonitor:
+    """Scores pump health from drive telemetry with hysteresis"""
+
+    def __init__(self, rated_current=10.0, current_warn_ratio=0.9,
+                 current_slope_limit=0.5, trend_window=300.0,
+                 latency_nominal=0.2, latency_limit=0.6,
+                 failover_score=50.0, recover_score=75.0,
+                 trip_samples=3, recover_time=300.0, clock=time.time):
+        """
+        Initialize pump health monitor.
+
+        Args:
+            rated_current: Motor rated current in A
+            current_warn_ratio: Fraction of rated current where penalties begin
+            current_slope_limit: Current rise (A/min) that costs the full trend penalty
+            trend_window: Seconds of current samples used for the trend
+            latency_nominal: Expected Modbus transaction time in seconds
+            latency_limit: Transaction time that costs the full latency penalty
+            failover_score: Score below which a pump is considered degrading
+            recover_score: Score a degraded pump must hold to recover
+            trip_samples: Consecutive low samples before marking degraded
+            recover_time: Seconds above recover_score before clearing degraded
+            clock: Time source
+        """
+        self.rated_current = rated_current
+        self.current_warn_ratio = current_warn_ratio
+        self.current_slope_limit = current_slope_limit
+        self.trend_window = trend_window
+        self.latency_nominal = latency_nominal
+        self.latency_limit = latency_limit
+        self.failover_score = failover_score
+        self.recover_score = recover_score
+        self.trip_samples = trip_samples
+        self.recover_time = recover_time
+        self.clock = clock
+
+        self.pumps = {}
+
+    def _get(self, name):
+        if name not in self.pumps:
+            self.pumps[name] = PumpHealth(name)
+        return self.pumps[name]
+
+    def current_trend(self, name):
+        """Least-squares slope of output current in A/min over the trend window"""
+        health = self._get(name)
+        now = self.clock()
+        samples = [(t, a) for t, a in health.current_samples if now - t <= self.trend_window]
+        if len(samples) < 3:
+            return 0.0
+
+        n = len(samples)
+        mean_t = sum(t for t, _ in samples) / n
+        mean_a = sum(a for _, a in samples) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in samples)
+        if var_t == 0:
+            return 0.0
+        cov = sum((t - mean_t) * (a - mean_a) for t, a in samples)
+        return cov / var_t * 60.0
+
+    def record(self, name, status, latency=None, error_count=0):
+        """
+        Record a status sample and rescore the pump.
+
+        Args:
+            name: Pump name ('primary' or 'backup')
+            status: Dict from VFDController.get_status()
+            latency: Last Modbus transaction time in seconds
+            error_count: VFD communication error count
+        """
+        health = self._get(name)
+        now = self.clock()
+        reasons = []
+        score = 100.0
+
+        if latency is not None:
+            if health.latency_avg is None:
+                health.latency_avg = latency
+            else:
+                health.latency_avg += 0.2 * (latency - health.latency_avg)
+
+        if status is None or status.get('state') == 'NoComm':
+            score -= 60.0
+            reasons.append('no communication')
+        else:
+            fault = status.get('fault_code', 0)
+            if fault:
+                score -= 60.0
+                reasons.append(f'fault 0x{fault:04X}')
+
+            if status.get('state_word_2', 0) & STATE2_OVERLOAD:
+                score -= 40.0
+                reasons.append('overload alarm')
+
+            current = status.get('output_current', 0.0)
+            health.current_samples.append((now, current))
+
+            warn = self.rated_current * self.current_warn_ratio
+            if current > warn:
+                excess = (current - warn) / (self.rated_current - warn or 1.0)
+                score -= min(30.0, 30.0 * excess)
+                reasons.append(f'current {current:.1f}A')
+
+            slope = self.current_trend(name)
+            if slope > 0 and status.get('output_frequency', 0.0) > 0:
+                penalty = min(20.0, 20.0 * slope / self.current_slope_limit)
+                if penalty >= 5.0:
+                    reasons.append(f'current rising {slope:.2f}A/min')
+                score -= penalty
+
+        if health.latency_avg is not None and health.latency_avg > self.latency_nominal:
+            span = max(self.latency_limit - self.latency_nominal, 1e-3)
+            penalty = min(15.0, 15.0 * (health.latency_avg - self.latency_nominal) / span)
+            if penalty >= 5.0:
+                reasons.append(f'latency {health.latency_avg * 1000:.0f}ms')
+            score -= penalty
+
+        if error_count:
+            score -= min(15.0, 5.0 * error_count)
+            reasons.append(f'{error_count} comm errors')
+
+        health.score = max(0.0, score)
+        health.reasons = reasons
+        health.history.append((now, health.score))
+        self._update_state(health, now)
+        return health.score
+
+    def _update_state(self, health, now):
+        """Apply hysteresis between the failover and recovery thresholds"""
+        if not health.degraded:
+            if health.score < self.failover_score:
+                health.low_count += 1
+                if health.low_count >= self.trip_samples:
+                    health.degraded = True
+                    health.recover_since = None
+                    logger.warning(f"Pump '{health.name}' health degraded "
+                                   f"(score {health.score:.0f}: {', '.join(health.reasons)})")
+            else:
+                health.low_count = 0
+        else:
+            if health.score >= self.recover_score:
+                if health.recover_since is None:
+                    health.recover_since = now
+                elif now - health.recover_since >= self.recover_time:
+                    health.degraded = False
+                    health.low_count = 0
+                    logger.info(f"Pump '{health.name}' health recovered (score {health.score:.0f})")
+            else:
+                health.recover_since = None
+
+    def score(self, name):
+        return self._get(name).score
+
+    def is_degraded(self, name):
+        return self._get(name).degraded
+
+    def get_history(self, name):
+        """Get (timestamp, score) history for a pump"""
+        return list(self._get(name).history)
+
+    def get_status(self):
+        status = {}
+        for name, health in self.pumps.items():
+            status[name] = health.get_status()
+            status[name]['current_trend'] = round(self.current_trend(name), 3)
+        return status
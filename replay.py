@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Controller regression replay
+
+Feeds a capture (CAPTURE in config.py: sensor samples, operator mode
+changes and the control tower's Modbus reads and writes, recorded by the
+control daemon or main_control.py) back through the current control code
+on a VirtualClock, as fast as it runs, and compares the drive commands it
+issues with the recorded ones. Change a setting or the code, replay last
+week's capture and see where, and by how much, the controller would have
+acted differently.
+
+Reads are answered with the register values the drives returned at that
+moment (and fail where they failed), so the replayed controller sees the
+recorded plant. The replay is open loop: the recorded plant did not react
+to the replayed commands, so a difference marks where the controllers
+diverge, not what the plant would have done. Pressure autotune tests in
+the capture are skipped, not compared.
+
+    python3 replay.py capture.ndjson
+    python3 replay.py capture.ndjson --set kp=1.5 --since 2026-10-19T06:00
+    python3 replay.py capture.ndjson --tolerance 0.5 --json   # exit 1 past tolerance
+"""
+
+import sys
+import json
+import time
+import argparse
+import logging
+from datetime import datetime
+
+from vfd_controller import VFDController
+from plant_simulator import VirtualClock, ControlLoop, decode_write
+from event_log import read_records
+from pressure_control import BIAS_FREQUENCY
+from config import *
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_KINDS = ('capture', 'mode', 'sensors', 'rx', 'tx')
+COMMANDS = {0x0001: 'start', 0x0005: 'stop', 0x0007: 'fault_reset'}
+
+
+class ReplayVFD(VFDController):
+    """VFDController answered from the register values recorded for one drive"""
+
+    def __init__(self, name, device_id):
+        super().__init__(None, device_id, name)
+        self.registers = {}          # register -> last recorded raw value
+        self.comm_ok = True          # last recorded transaction succeeded
+        self.recorded_setpoint = None
+        self.setpoint = None         # last set frequency the replayed controller wrote
+        self.recorded_commands = {command: 0 for command in COMMANDS.values()}
+        self.commands = {command: 0 for command in COMMANDS.values()}
+
+    def feed(self, record):
+        """Apply one recorded transaction ('rx' or 'tx' record) of this drive"""
+        values = record.get('values')
+        if record['k'] == 'rx':
+            self.comm_ok = values is not None
+            if values is not None:
+                for address, value in enumerate(values, record['reg']):
+                    self.registers[address] = value
+                self.last_latency = record.get('latency')
+            return
+        self.comm_ok = record.get('ok', True)
+        if not self.comm_ok:
+            return
+        for address, value in enumerate(values, record['reg']):
+            if address == self.REG_FREQ_SET:
+                self.recorded_setpoint = value * 0.01
+            elif address == self.REG_CONTROL and value in COMMANDS:
+                self.recorded_commands[COMMANDS[value]] += 1
+
+    def _read_register(self, register, count, retries):
+        if not self.comm_ok:
+            self.error_count += 1
+            return None
+        values = [self.registers.get(address) for address in range(register, register + count)]
+        if None in values:
+            return None  # Not captured yet: no answer, but not a comm error either
+        self.error_count = max(0, self.error_count - 1)
+        self._update_shadow(register, values)
+        return values if count > 1 else values[0]
+
+    def _write_request(self, request, retries):
+        if not self.comm_ok:
+            self.error_count += 1
+            return False
+        register, values = decode_write(request)
+        for address, value in enumerate(values, register):
+            if address == self.REG_FREQ_SET:
+                self.setpoint = value * 0.01
+            elif address == self.REG_CONTROL and value in COMMANDS:
+                self.commands[COMMANDS[value]] += 1
+        self.error_count = max(0, self.error_count - 1)
+        return True
+
+
+class Replay(ControlLoop):
+    """The control loop driven by a capture instead of hardware"""
+
+    def __init__(self, overrides=None, tolerance=0.5, since=None):
+        """
+        Initialize replay.
+
+        Args:
+            overrides: Settings replacing the recorded ones (CONTROL_PARAMS keys and
+                temperature_setpoint), e.g. {'kp': 1.5}
+            tolerance: Setpoint difference in Hz that counts as a divergence
+            since: Epoch time from which differences are counted (earlier records
+                are still replayed, so the controller state is warm)
+        """
+        self.overrides = overrides or {}
+        self.tolerance = tolerance
+        self.since = since
+        vfds = {name: ReplayVFD(name, i + 1) for i, name in enumerate(('fan', 'pump_primary', 'pump_backup'))}
+        super().__init__(vfds, VirtualClock(start=0.0), dict(CONTROL_PARAMS))
+
+        self.tower = CONTROL_TOWER
+        self.period = CONTROL_SCHEDULER['control_period']
+        self.poll_interval = CONTROL_SCHEDULER['vfd_status_interval']
+        self.running = False
+        self.auto = False
+        self.autotune = None         # relay center frequency while the recorded loop was autotuning
+        self.sensors = None
+        self.diffs = {name: {'steps': 0, 'sum': 0.0, 'max': 0.0, 'max_at': None,
+                             'over': 0, 'first_divergence': None} for name in self.vfds}
+        self.stats = {'records': 0, 'steps': 0, 'auto_steps': 0, 'gaps': 0, 'captures': 0,
+                      'start': None, 'end': None}
+
+    def _apply_settings(self, control_params, fan_setpoint):
+        params = dict(control_params or self.control_params)
+        params.update({key: value for key, value in self.overrides.items() if key in params})
+        self.control_params = params
+        self.pump_manager.min_frequency = params['min_frequency']
+        if fan_setpoint is not None:
+            self.fan_control.setpoint = fan_setpoint
+        if 'temperature_setpoint' in self.overrides:
+            self.fan_control.setpoint = self.overrides['temperature_setpoint']
+
+    def feed(self, record):
+        """Apply one capture record"""
+        self.stats['records'] += 1
+        kind = record['k']
+        if kind in ('rx', 'tx'):
+            drive = record.get('drive', '')
+            prefix = f"{self.tower}."
+            vfd = self.vfds.get(drive[len(prefix):] if drive.startswith(prefix) else drive)
+            if vfd:
+                vfd.feed(record)
+        elif kind == 'sensors':
+            self.sensors = record
+        elif kind == 'mode':
+            self._apply_settings(record.get('control_params'), record.get('fan_setpoint'))
+            if record['running'] and not self.running:
+                self.start()
+            elif self.running and not record['running']:
+                self.stop()
+            elif record['auto'] and not self.auto:
+                self.pressure_control.reset(self.pump_manager.frequency or BIAS_FREQUENCY)
+            autotune = record.get('autotune')
+            if self.autotune is not None and autotune is None:
+                self.pressure_control.reset(self.autotune)  # As the daemon hands back after the test
+            self.running = record['running']
+            self.auto = record['auto']
+            self.autotune = autotune
+        elif kind == 'capture':
+            self.stats['captures'] += 1
+            self.tower = record.get('tower', self.tower)
+            self.period = record.get('control_period', self.period)
+            self.poll_interval = record.get('vfd_status_interval', self.poll_interval)
+
+    def _compare(self, now):
+        for name, vfd in self.vfds.items():
+            if vfd.setpoint is None or vfd.recorded_setpoint is None:
+                continue
+            diff = self.diffs[name]
+            delta = abs(vfd.setpoint - vfd.recorded_setpoint)
+            diff['steps'] += 1
+            diff['sum'] += delta
+            if delta > diff['max']:
+                diff['max'] = delta
+                diff['max_at'] = now
+            if delta > self.tolerance:
+                diff['over'] += 1
+                if diff['first_divergence'] is None:
+                    diff['first_divergence'] = now
+
+    def run(self, records, max_gap=60.0):
+        """Replay a record stream one control period at a time; returns summary()"""
+        wall = time.monotonic()
+        records = iter(records)
+        pending = next(records, None)
+        if pending is None:
+            return self.summary()
+        self.clock.epoch = pending['t']
+        self.stats['start'] = pending['t']
+        last_poll = None
+        while pending is not None:
+            now = self.clock.time()
+            if pending['t'] - now > max_gap:
+                # Capture paused (daemon stopped, bus down): skip ahead, keep state
+                self.clock.advance(pending['t'] - now - self.period)
+                self.stats['gaps'] += 1
+            self.clock.advance(self.period)
+            now = self.clock.time()
+            while pending is not None and pending['t'] <= now:
+                self.feed(pending)
+                pending = next(records, None)
+
+            self.stats['steps'] += 1
+            if self.running and self.auto and self.autotune is None and self.sensors is not None:
+                self.control_step(self.sensors)
+                if self.since is None or now >= self.since:
+                    self.stats['auto_steps'] += 1
+                    self._compare(now)
+            if self.running and (last_poll is None or now - last_poll >= self.poll_interval):
+                last_poll = now
+                self.poll_drives()
+            if self.recovery:
+                self.recovery.update()
+        self.stats['end'] = self.clock.time()
+        self.stats['wall_seconds'] = time.monotonic() - wall
+        return self.summary()
+
+    def summary(self):
+        drives = {}
+        for name, diff in self.diffs.items():
+            vfd = self.vfds[name]
+            drives[name] = {
+                'steps': diff['steps'],
+                'mean_diff_hz': round(diff['sum'] / diff['steps'], 3) if diff['steps'] else 0.0,
+                'max_diff_hz': round(diff['max'], 3),
+                'max_at': diff['max_at'],
+                'over_tolerance_pct': round(100.0 * diff['over'] / diff['steps'], 2) if diff['steps'] else 0.0,
+                'first_divergence': diff['first_divergence'],
+                'commands': {command: {'recorded': vfd.recorded_commands[command], 'replayed': count}
+                             for command, count in vfd.commands.items()}
+            }
+        span = (self.stats['end'] or 0.0) - (self.stats['start'] or 0.0)
+        return {
+            'hours': round(span / 3600.0, 2),
+            'wall_seconds': round(self.stats.get('wall_seconds', 0.0), 2),
+            'records': self.stats['records'],
+            'steps': self.stats['steps'],
+            'auto_steps': self.stats['auto_steps'],
+            'gaps': self.stats['gaps'],
+            'tolerance_hz': self.tolerance,
+            'control_params': self.control_params,
+            'drives': drives,
+            'max_diff_hz': max((d['max_diff_hz'] for d in drives.values()), default=0.0)
+        }
+
+
+def format_time(stamp):
+    return datetime.fromtimestamp(stamp).strftime('%Y-%m-%d %H:%M:%S') if stamp else '-'
+
+
+def parse_setting(text):
+    """'key=value' -> (key, float)"""
+    key, _, value = text.partition('=')
+    if key not in CONTROL_PARAMS and key != 'temperature_setpoint':
+        raise argparse.ArgumentTypeError(
+            f"Unknown setting '{key}' (one of {', '.join(list(CONTROL_PARAMS) + ['temperature_setpoint'])})")
+    return key, float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a control capture through the current controller")
+    parser.add_argument('path', help="Capture file (rotated files are included)")
+    parser.add_argument('--set', type=parse_setting, action='append', default=[], metavar='KEY=VALUE',
+                        help="Replace a recorded setting, e.g. kp=1.5 (repeatable)")
+    parser.add_argument('--since', help="ISO timestamp from which differences are counted")
+    parser.add_argument('--until', help="ISO timestamp to stop at")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="Set frequency difference in Hz counted as divergence (exit 1 past it)")
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Show controller log messages")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(levelname)s %(name)s: %(message)s')
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    until = datetime.fromisoformat(args.until).timestamp() if args.until else None
+
+    replay = Replay(dict(args.set), tolerance=args.tolerance, since=since)
+    summary = replay.run(read_records(args.path, CAPTURE_KINDS, until=until))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        speedup = summary['hours'] * 3600.0 / max(summary['wall_seconds'], 1e-6)
+        print(f"Replayed {summary['hours']} h ({summary['records']:,} records) in "
+              f"{summary['wall_seconds']} s ({speedup:,.0f}x): {summary['auto_steps']:,} auto control steps compared")
+        print(f"{'drive':14} {'steps':>8} {'mean|d|':>8} {'max|d|':>8} {'max at':>20} "
+              f"{'>tol %':>7} {'first divergence':>20}")
+        for name, drive in summary['drives'].items():
+            print(f"{name:14} {drive['steps']:8d} {drive['mean_diff_hz']:8.3f} {drive['max_diff_hz']:8.3f} "
+                  f"{format_time(drive['max_at']):>20} {drive['over_tolerance_pct']:7.2f} "
+                  f"{format_time(drive['first_divergence']):>20}")
+        print("Commands (recorded/replayed):")
+        for name, drive in summary['drives'].items():
+            print(f"{name:14} " + '  '.join(f"{command} {c['recorded']}/{c['replayed']}"
+                                           for command, c in drive['commands'].items()))
+    return 1 if summary['max_diff_hz'] > args.tolerance else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
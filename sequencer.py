@@ -0,0 +1,198 @@
+"""
+Declarative start / stop sequencer
+
+A sequence is a list of steps (SEQUENCES in config.py):
+
+    {'step': 'fan_speed', 'after': ['fan'], 'action': None, 'drives': ['fan'],
+     'until': {'state': 'running', 'min_frequency': 20.0}, 'timeout': 20.0}
+
+A step fires as soon as every step it comes 'after' is done: it runs its
+action (a named function supplied by the owner, e.g. 'start_fan') and is
+done once every one of its drives meets the 'until' condition, read from
+the drive's state word and output frequency. Steps that do not depend on
+each other are in progress at the same time, so the fan and the lead pump
+ramp together instead of one after the other with fixed sleeps between.
+
+Conditions:
+    state: 'running' (forward / reverse) or 'stopped' (anything else that answers)
+    min_frequency / max_frequency: output frequency bounds in Hz
+"""
+
+import time
+import logging
+
+from g540_registers import BY_NAME, RUNNING_STATES
+
+logger = logging.getLogger(__name__)
+
+
+class SequenceError(Exception):
+    """A sequence step failed or timed out"""
+
+
+class Sequencer:
+    """Runs one declarative sequence, polling drive state for step completion"""
+
+    def __init__(self, name, steps, actions, drives, poll_interval=0.2, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+        Initialize sequencer.
+
+        Args:
+            name: Sequence name, for logs ('start', 'stop')
+            steps: List of step dicts (see module docstring)
+            actions: Dict of action name -> function; a False return fails the step
+            drives: Dict of drive name used in steps -> VFDController
+            poll_interval: Seconds between condition polls
+            clock: Monotonic clock function
+            sleep: Sleep function
+
+        Raises:
+            ValueError: Unknown action, drive or dependency, or a dependency cycle
+        """
+        self.name = name
+        self.steps = {step['step']: step for step in steps}
+        self.actions = actions
+        self.drives = drives
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.sleep = sleep
+        self._validate()
+
+        self.status = {name: {'state': 'pending', 'started': None, 'finished': None, 'error': None}
+                       for name in self.steps}
+        self.started = None
+
+    def _validate(self):
+        for name, step in self.steps.items():
+            if step.get('action') and step['action'] not in self.actions:
+                raise ValueError(f"Sequence '{self.name}' step '{name}': unknown action '{step['action']}'")
+            for drive in step.get('drives', ()):
+                if drive not in self.drives:
+                    raise ValueError(f"Sequence '{self.name}' step '{name}': unknown drive '{drive}'")
+            for dependency in step.get('after', ()):
+                if dependency not in self.steps:
+                    raise ValueError(f"Sequence '{self.name}' step '{name}': unknown step '{dependency}'")
+        # Every step must be reachable: resolve in dependency order
+        resolved = set()
+        while len(resolved) < len(self.steps):
+            ready = [name for name, step in self.steps.items()
+                     if name not in resolved and set(step.get('after', ())) <= resolved]
+            if not ready:
+                raise ValueError(f"Sequence '{self.name}': dependency cycle between "
+                                 f"{', '.join(sorted(set(self.steps) - resolved))}")
+            resolved.update(ready)
+
+    def _read(self, vfd):
+        """(state word 1, output frequency in Hz) straight from the drive"""
+        state = vfd.refresh(vfd.REG_STATE_1, retries=1)
+        frequency = vfd.refresh(vfd.REG_RUN_FREQ, retries=1)
+        return state, (frequency * BY_NAME['run_frequency'].scale if frequency is not None else None)
+
+    @staticmethod
+    def _met(until, state, frequency):
+        if state is None:
+            return False  # No answer: nothing is confirmed
+        wanted = until.get('state')
+        if wanted == 'running' and state not in RUNNING_STATES:
+            return False
+        if wanted == 'stopped' and state in RUNNING_STATES:
+            return False
+        if frequency is None and ('min_frequency' in until or 'max_frequency' in until):
+            return False
+        if 'min_frequency' in until and frequency < until['min_frequency']:
+            return False
+        if 'max_frequency' in until and frequency > until['max_frequency']:
+            return False
+        return True
+
+    @staticmethod
+    def _describe(until):
+        parts = [until['state']] if 'state' in until else []
+        if 'min_frequency' in until:
+            parts.append(f">= {until['min_frequency']:.1f} Hz")
+        if 'max_frequency' in until:
+            parts.append(f"<= {until['max_frequency']:.1f} Hz")
+        return ' '.join(parts)
+
+    def _fire(self, name, now):
+        step = self.steps[name]
+        status = self.status[name]
+        status['state'] = 'running'
+        status['started'] = round(now - self.started, 2)
+        action = step.get('action')
+        if action:
+            logger.info(f"Sequence '{self.name}': {name} ({action})")
+            if self.actions[action]() is False:
+                status['error'] = f"Action {action} failed"
+
+    def _check(self, name, now, readings):
+        step = self.steps[name]
+        status = self.status[name]
+        until = step.get('until')
+        if status['error'] is None and until:
+            for drive in step.get('drives', ()):
+                if drive not in readings:
+                    readings[drive] = self._read(self.drives[drive])
+                if not self._met(until, *readings[drive]):
+                    if now - self.started - status['started'] > step.get('timeout', 10.0):
+                        state, frequency = readings[drive]
+                        seen = 'no answer' if state is None else f"state {state}, " + (
+                            f"{frequency:.1f} Hz" if frequency is not None else 'no frequency')
+                        status['error'] = (f"{drive} not {self._describe(until)} after "
+                                           f"{step.get('timeout', 10.0):.0f} s ({seen})")
+                    break
+            else:
+                status['state'] = 'done'
+        elif status['error'] is None:
+            status['state'] = 'done'
+        if status['error']:
+            status['state'] = 'failed'
+        if status['state'] != 'running':
+            status['finished'] = round(now - self.started, 2)
+
+    def run(self):
+        """
+        Run the sequence to completion.
+
+        Returns:
+            Dict with 'ok', 'elapsed' seconds and per-step status
+
+        Raises:
+            SequenceError: A step failed; steps not yet fired are skipped
+        """
+        self.started = self.clock()
+        while True:
+            now = self.clock()
+            done = {name for name, status in self.status.items() if status['state'] == 'done'}
+            for name, step in self.steps.items():
+                if self.status[name]['state'] == 'pending' and set(step.get('after', ())) <= done:
+                    self._fire(name, now)
+
+            readings = {}  # One poll per drive per round, shared by the steps watching it
+            for name, status in self.status.items():
+                if status['state'] == 'running':
+                    self._check(name, self.clock(), readings)
+
+            failed = [name for name, status in self.status.items() if status['state'] == 'failed']
+            if failed:
+                for status in self.status.values():
+                    if status['state'] in ('pending', 'running'):
+                        status['state'] = 'skipped'
+                result = self.get_status()
+                errors = '; '.join(f"{name}: {self.status[name]['error']}" for name in failed)
+                logger.error(f"Sequence '{self.name}' failed after {result['elapsed']} s: {errors}")
+                raise SequenceError(errors)
+            if all(status['state'] == 'done' for status in self.status.values()):
+                result = self.get_status()
+                logger.info(f"Sequence '{self.name}' complete in {result['elapsed']} s")
+                return result
+            self.sleep(self.poll_interval)
+
+    def get_status(self):
+        return {
+            'sequence': self.name,
+            'ok': all(status['state'] == 'done' for status in self.status.values()),
+            'elapsed': round(self.clock() - self.started, 2) if self.started is not None else None,
+            'steps': {name: dict(status) for name, status in self.status.items()}
+        }
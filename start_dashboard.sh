@@ -1,36 +1,48 @@
 #!/bin/bash
 
-# Auto-detect USB serial device and update config
-python3 << 'PYCODE'
-import glob
-
-devices = sorted(glob.glob('/dev/ttyUSB*') + glob.glob('/dev/ttyACM*'))
-if devices:
-    device = devices[0]
-    print(f'Detected USB device: {device}')
-    
-    with open('/home/max/config.py', 'r') as f:
-        config = f.read()
-    
-    lines = config.split('\n')
-    for i, line in enumerate(lines):
-        if line.startswith('SERIAL_PORT ='):
-            lines[i] = f"SERIAL_PORT = '{device}'  # USB-RS485 adapter (auto-detected)"
-            break
-    
-    with open('/home/max/config.py', 'w') as f:
-        f.write('\n'.join(lines))
-    print('Updated config.py')
-else:
-    print('WARNING: No USB serial device found!')
-PYCODE
-
-# Kill existing dashboard
+# Auto-detect USB serial device (passed to config.py via the environment).
+# The /dev/serial/by-id name stays the same when the adapter is replugged.
+DEVICE=$(ls /dev/serial/by-id/* 2>/dev/null | sort | head -n 1)
+if [ -z "$DEVICE" ]; then
+    DEVICE=$(ls /dev/ttyUSB* /dev/ttyACM* 2>/dev/null | sort | head -n 1)
+fi
+if [ -n "$DEVICE" ]; then
+    echo "Detected USB device: $DEVICE"
+    export COOLING_TOWER_SERIAL_PORT="$DEVICE"
+else
+    echo 'WARNING: No USB serial device found! (attached automatically when plugged in)'
+fi
+
+# Kill existing daemon and dashboard (main_control.py also uses the bus)
+if [ -f ~/dashboard.pid ]; then
+    kill "$(cat ~/dashboard.pid)" 2>/dev/null
+    rm -f ~/dashboard.pid
+fi
+pkill -f 'web_dashboard:app'
 pkill -f web_dashboard.py
+pkill -f control_daemon.py
+pkill -f main_control.py
+# gunicorn finishes in-flight requests (up to its 30 s graceful timeout) before releasing the port
+for _ in $(seq 30); do
+    pgrep -f 'web_dashboard:app' > /dev/null || break
+    sleep 1
+done
+sleep 2
+
+# Start the control daemon (owns the RS-485 bus and sensors)
+echo 'Starting control daemon...'
+python3 ~/control_daemon.py > ~/control_daemon.log 2>&1 &
+
+# Session key shared by all dashboard workers
+export COOLING_TOWER_SECRET_KEY=$(python3 -c 'import secrets; print(secrets.token_hex(32))')
 
-# Start dashboard in background
+# Start dashboard in background (gunicorn with several workers if installed)
 echo 'Starting web dashboard on port 8000...'
-python3 ~/web_dashboard.py > ~/dashboard.log 2>&1 &
+if command -v gunicorn > /dev/null; then
+    (cd ~ && gunicorn -w 3 --threads 4 -b 0.0.0.0:8000 --pid ~/dashboard.pid web_dashboard:app > ~/dashboard.log 2>&1 &)
+else
+    python3 ~/web_dashboard.py > ~/dashboard.log 2>&1 &
+fi
 
 # Wait for it to start
 sleep 3
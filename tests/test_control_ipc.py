@@ -0,0 +1,23 @@
+from control_ipc import CommandServer, DaemonClient
+
+
+def test_command_args_do_not_collide_with_call_options(tmp_path):
+    received = []
+
+    def settings(**data):
+        received.append(data)
+        return {'settings': data}
+
+    server = CommandServer(str(tmp_path / 'control.sock'), {'settings': settings})
+    server.start()
+    try:
+        client = DaemonClient(str(tmp_path / 'control.sock'), str(tmp_path / 'state.bin'), timeout=5.0)
+        body = {'cmd': 'estop', 'timeout': 0.000001, 'kp': 2.5}
+
+        reply = client.call('settings', body)
+
+        assert reply['success']
+        assert received == [body]
+        assert client.call('settings')['settings'] == {}
+    finally:
+        server.stop()
@@ -0,0 +1,70 @@
+from control_scheduler import ControlScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def run_for(scheduler, clock, seconds, control_time=0.05):
+    def control():
+        clock.now += control_time
+        if clock.now >= seconds:
+            scheduler.stop()
+    scheduler.control_fn = control
+    scheduler.run()
+
+
+def test_slow_run_does_not_starve_task():
+    clock = FakeClock()
+    scheduler = ControlScheduler(None, period=1.0, telemetry_rate=2.0, max_overdue=5.0,
+                                 clock=clock, sleep=clock.sleep)
+    durations = [3.0]  # One slow run (retries against a silent drive), then normal ones
+
+    def recovery():
+        clock.now += durations.pop(0) if durations else 0.05
+
+    task = scheduler.add_telemetry('recovery', recovery, 1.0)
+    run_for(scheduler, clock, 60.0)
+
+    assert task.runs >= 50
+    assert task.forced <= 1
+    assert task.expected_duration < 0.1
+
+
+def test_expected_duration_capped_at_period():
+    clock = FakeClock()
+    scheduler = ControlScheduler(None, period=1.0, clock=clock, sleep=clock.sleep)
+
+    def slow():
+        clock.now += 3.0
+
+    task = scheduler.add_telemetry('slow', slow, 1.0)
+    run_for(scheduler, clock, 30.0)
+
+    assert task.last_duration == 3.0
+    assert task.expected_duration == 1.0
+    # Each run after the first is forced once it is max_overdue late
+    assert task.runs >= 3
+    assert task.forced == task.runs - 1
+
+
+def test_fast_tasks_run_at_their_interval():
+    clock = FakeClock()
+    scheduler = ControlScheduler(None, period=1.0, telemetry_rate=2.0, clock=clock, sleep=clock.sleep)
+
+    def poll():
+        clock.now += 0.02
+
+    task = scheduler.add_telemetry('poll', poll, 1.0)
+    run_for(scheduler, clock, 60.0)
+
+    assert task.runs >= 58
+    assert task.deferred == 0
+    assert task.forced == 0
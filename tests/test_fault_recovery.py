@@ -0,0 +1,77 @@
+from fault_recovery import FaultRecovery
+
+POLICIES = {'overload': {'max_attempts': 3, 'delay': 10.0, 'window': 3600.0}}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TripVFD:
+    REG_STATE_1 = 0x2100
+    REG_FREQ_SET = 0x2001
+
+    def __init__(self):
+        self.state = 0x0001
+        self.starts = 0
+        self.frequency = None
+
+    def shadow_values(self, register, count=1):
+        return [3980]
+
+    def refresh(self, register, count=1, retries=3):
+        return self.state
+
+    def fault_reset(self):
+        self.state = 0x0003
+
+    def set_frequency(self, hz):
+        self.frequency = hz
+
+    def start(self):
+        self.starts += 1
+        self.state = 0x0001
+
+
+def trip_and_reset(should_restart):
+    clock = FakeClock()
+    vfd = TripVFD()
+    recovered = []
+    recovery = FaultRecovery({'pump_primary': vfd}, POLICIES, should_restart=should_restart,
+                             on_recovered=lambda name, vfd: recovered.append(name), clock=clock)
+    recovery.observe('pump_primary', {'state': 'Forward', 'fault_code': 0})
+    vfd.state = 0x0004
+    recovery.observe('pump_primary', {'state': 'Fault', 'fault_code': 11})  # OL1
+    clock.now += 10.0
+    for _ in range(3):
+        recovery.update()
+        clock.now += 1.0
+    return vfd, recovery, recovered
+
+
+def test_running_drive_restarted_when_still_needed():
+    vfd, recovery, recovered = trip_and_reset(lambda name, vfd: True)
+
+    assert vfd.starts == 1
+    assert round(vfd.frequency, 2) == 39.8
+    assert recovered == ['pump_primary']
+
+
+def test_failed_over_pump_reset_but_not_restarted():
+    asked = []
+
+    def should_restart(name, vfd):
+        asked.append(name)
+        return False
+
+    vfd, recovery, recovered = trip_and_reset(should_restart)
+
+    assert asked == ['pump_primary']
+    assert vfd.starts == 0
+    assert vfd.state == 0x0003
+    assert recovered == ['pump_primary']
+    assert not recovery.is_recovering('pump_primary')
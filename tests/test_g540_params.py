@@ -0,0 +1,65 @@
+import pytest
+
+pytest.importorskip('serial')  # g540_params opens the bus through vfd_controller
+
+import g540_params  # noqa: E402
+from g540_params import backup, diff, group_base, param_name, restore, to_registers  # noqa: E402
+
+
+class ParamVFD:
+    """A drive holding parameter groups; reads past the end of a group are rejected"""
+
+    def __init__(self, groups):
+        self.description = 'Test drive'
+        self.address = 'bus0/1'
+        self.registers = {g540_params.REG_IDENT: 0x01A1}
+        for group, values in groups.items():
+            for index, value in enumerate(values):
+                self.registers[group_base(group) + index] = value
+        self.writes = []
+
+    def read_register(self, register, count=1, retries=1, max_age=None):
+        values = [self.registers.get(register + i) for i in range(count)]
+        if None in values:
+            return None
+        return values if count > 1 else values[0]
+
+    def write_registers(self, register, values, retries=3):
+        self.writes.append((register, list(values)))
+        for i, value in enumerate(values):
+            self.registers[register + i] = value
+        return True
+
+    def write_register(self, register, value, retries=3):
+        return self.write_registers(register, [value])
+
+
+def test_group_addresses_use_hex_digits():
+    assert group_base(0) == 0x0000
+    assert group_base(5) == 0x0500
+    assert group_base(14) == 0x1400
+    assert group_base(16) == 0x1600
+    assert param_name(0x1401) == 'P14.01'
+    assert param_name(0x050A) == 'P05.10'
+
+
+def test_round_trip_group_above_ten():
+    vfd = ParamVFD({14: [3, 4, 1, 0, 5], 10: [7] * 12})
+
+    snapshot = backup(vfd, [10, 14])
+
+    assert snapshot['groups'] == {'10': [7] * 12, '14': [3, 4, 1, 0, 5]}
+    registers = to_registers(snapshot)
+    assert registers[0x1401] == 4
+    assert registers[0x100B] == 7
+    assert all(vfd.registers[reg] == value for reg, value in registers.items())
+
+
+def test_restore_skips_comm_params_of_group_fourteen():
+    golden = backup(ParamVFD({14: [9, 5, 2, 10]}), [14])
+    vfd = ParamVFD({14: [3, 4, 1, 0]})
+
+    assert restore(vfd, golden)
+
+    assert vfd.writes == [(0x1403, [10])]
+    assert diff(golden, backup(vfd, [14])) == [(0x1400, 9, 3), (0x1401, 5, 4), (0x1402, 2, 1)]
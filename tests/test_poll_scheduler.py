@@ -0,0 +1,49 @@
+import time
+from types import SimpleNamespace
+
+from poll_scheduler import AdaptivePoller
+
+
+class DirtyVFD:
+    """A drive whose registers are invalidated by a write every cycle"""
+
+    def __init__(self):
+        self.shadow = {}
+        self.refreshes = 0
+
+    def needs_refresh(self, register, count=1):
+        return True
+
+    def refresh(self, register, count=1, retries=1):
+        self.refreshes += 1
+        return [0] * count if count > 1 else 0
+
+    def decode_status(self, state, monitor):
+        return None
+
+    def cached_status(self):
+        return None
+
+
+def test_skipped_drive_with_dirty_registers_does_not_spin():
+    vfd = DirtyVFD()
+    bus = SimpleNamespace(name='bus0', baudrate=9600, vfds={'tower1.pump_primary': vfd})
+    checks = []
+
+    def skip(name):
+        checks.append(name)
+        return True
+
+    poller = AdaptivePoller(bus, lambda name, status: None, skip=skip, min_interval=0.05)
+    # Polled once before the control scheduler took the drive over
+    poller._sync_items()
+    for item in poller.items:
+        item.last_poll = 0.0
+    poller.start()
+    time.sleep(0.5)
+    poller.stop()
+    poller.join(timeout=1.0)
+
+    assert vfd.refreshes == 0
+    # About one pass over both blocks per min_interval, not a busy loop
+    assert len(checks) < 100
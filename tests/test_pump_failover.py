@@ -0,0 +1,128 @@
+from pump_failover import PumpFailoverManager, PumpState
+from pump_health import PumpHealthMonitor
+
+
+class FakeVFD:
+    REG_STATE_1 = 0x2100
+
+    def __init__(self, description):
+        self.description = description
+        self.running = False
+        self.frequency = 0.0
+        self.fault_code = 0
+        self.error_count = 0
+        self.last_latency = 0.02
+        self.shadow = {}
+        self.reads = 0
+
+    def start(self):
+        self.running = True
+        return True
+
+    def stop(self):
+        self.running = False
+        return True
+
+    def set_frequency(self, hz):
+        self.frequency = hz
+        return True
+
+    def is_healthy(self, max_errors=5):
+        return self.error_count < max_errors
+
+    def get_status(self):
+        self.reads += 1
+        self.shadow[self.REG_STATE_1] = (1 if self.running else 3, float(self.reads))
+        return {
+            'state': 'Forward' if self.running else 'Stopped',
+            'fault_code': self.fault_code,
+            'state_word_2': 0,
+            'output_frequency': self.frequency if self.running else 0.0,
+            'output_current': 5.0 if self.running else 0.0,
+        }
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_manager(**kwargs):
+    clock = FakeClock()
+    primary, backup = FakeVFD('Primary'), FakeVFD('Backup')
+    manager = PumpFailoverManager(primary, backup, check_interval=0.0, clock=clock, **kwargs)
+    return manager, primary, backup, clock
+
+
+def test_status_scores_the_standby_pump():
+    health = PumpHealthMonitor(trip_samples=2, clock=FakeClock())
+    manager, primary, backup, _ = make_manager(health_monitor=health)
+    manager.start(40.0)
+    backup.fault_code = 0x0011
+
+    for _ in range(3):
+        status = manager.get_status()
+
+    assert status['vfd_status']['backup']['fault_code'] == 0x0011
+    assert health.is_degraded('backup')
+    assert not health.is_degraded('primary')
+
+
+def test_degraded_backup_blocks_early_failover():
+    health = PumpHealthMonitor(trip_samples=1, clock=FakeClock())
+    manager, primary, backup, _ = make_manager(health_monitor=health)
+    manager.start(40.0)
+    primary.fault_code = 0x0011
+    backup.fault_code = 0x0011
+
+    manager.get_status()
+    manager.check_health()
+
+    assert manager.active_pump == PumpState.PRIMARY
+    assert primary.running and not backup.running
+
+
+def test_failed_outgoing_pump_stopped_when_handover_aborts():
+    manager, primary, backup, clock = make_manager(rotation_hours=1.0, handover_ramp_time=10.0)
+    manager.start(40.0)
+    assert manager.switch_lead()
+    clock.now += 5.0
+    manager.set_frequency(40.0)
+    assert primary.running and backup.running
+
+    manager.pump_failed(primary)
+
+    assert manager.handover is None
+    assert manager.active_pump == PumpState.BACKUP
+    assert not primary.running and backup.running
+    manager.set_frequency(42.0)
+    assert backup.frequency == 42.0
+
+
+def test_failed_incoming_pump_hands_lead_back_when_handover_aborts():
+    manager, primary, backup, clock = make_manager(rotation_hours=1.0, handover_ramp_time=10.0)
+    manager.start(40.0)
+    assert manager.switch_lead()
+    clock.now += 5.0
+    manager.set_frequency(40.0)
+
+    manager.pump_failed(backup)
+
+    assert manager.handover is None
+    assert manager.active_pump == PumpState.PRIMARY
+    assert primary.running and not backup.running
+
+
+def test_needs_running_follows_lead_and_staging():
+    manager, primary, backup, _ = make_manager(stage_frequency=48.0, stage_delay=0.0)
+    assert not manager.needs_running(primary)
+    manager.start(40.0)
+    assert manager.needs_running(primary)
+    assert not manager.needs_running(backup)
+
+    manager.pump_failed(primary)
+    assert manager.needs_running(backup)
+    assert not manager.needs_running(primary)
@@ -1,65 +1,196 @@
+import os
 import logging
+import functools
 import serial
 import struct
+import threading
 import time
 
+from poll_scheduler import AdaptivePoller
+from g540_registers import (BY_NAME, STATE_NAMES, RUNNING_STATES, STATE_BLOCK, MONITOR_BLOCK, CMD_FORWARD,
+                            CMD_STOP, CMD_COAST_STOP, CMD_FAULT_RESET)
+
 logger = logging.getLogger(__name__)
 
+
+@functools.lru_cache(maxsize=None)
+def _words(count):
+    """Compiled big-endian format for count unsigned registers"""
+    return struct.Struct(f'>{count}H')
+
+
+def crc16(data):
+    """Modbus RTU CRC, as the two bytes appended to a frame"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return struct.pack('<H', crc)
+
+
+class RegisterCachePolicy:
+    """Per-register max-age rules for the shadow register cache"""
+    
+    def __init__(self, rules=(), default_max_age=0.0):
+        """
+        Args:
+            rules: (first register, last register, max age in s) tuples;
+                   the first matching rule wins
+            default_max_age: Max age for registers no rule covers (0 = always read)
+        """
+        self.rules = list(rules)
+        self.default_max_age = default_max_age
+    
+    def max_age(self, register):
+        for first, last, max_age in self.rules:
+            if first <= register <= last:
+                return max_age
+        return self.default_max_age
+
+
 class VFDController:
     """Controller for GALT G540 VFD via Modbus RTU"""
     
-    def __init__(self, ser, device_id, description="VFD"):
+    def __init__(self, ser, device_id, description="VFD", lock=None, cache_policy=None):
         self.ser = ser
         self.device_id = device_id
         self.description = description
+        self.name = description   # Manager name ('<tower>.<role>') once added to a MultiVFDManager
+        self.recorder = None      # Optional recorder(kind, **fields) capturing bus traffic for replay
         self.error_count = 0
+        self.last_latency = None  # Seconds for the last successful transaction
+        self.shadow = {}          # register -> (raw value, monotonic time) of last read/write
+        self.cache_policy = cache_policy
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._dirty = set()       # shadowed registers a write has made untrustworthy
         
-        # GALT G540 Register Map
-        self.REG_CONTROL = 0x2000
-        self.REG_FREQ_SET = 0x2001
-        self.REG_STATE_1 = 0x2100
-        self.REG_STATE_2 = 0x2101
-        self.REG_FAULT = 0x2102
-        self.REG_RUN_FREQ = 0x3000
-        self.REG_OUTPUT_CURRENT = 0x3004
+        # Serializes transactions on the shared RS-485 bus
+        self.lock = lock or threading.RLock()
+        
+        # GALT G540 Register Map (g540_registers.py)
+        self.REG_CONTROL = BY_NAME['control'].address
+        self.REG_FREQ_SET = BY_NAME['frequency_set'].address
+        self.REG_STATE_1 = BY_NAME['state_1'].address
+        self.REG_STATE_2 = BY_NAME['state_2'].address
+        self.REG_FAULT = BY_NAME['fault_code'].address
+        self.REG_RUN_FREQ = BY_NAME['run_frequency'].address
+        self.REG_OUTPUT_VOLTAGE = BY_NAME['output_voltage'].address
+        self.REG_OUTPUT_CURRENT = BY_NAME['output_current'].address
+        self.REG_OUTPUT_POWER = BY_NAME['output_power'].address
+        self.REG_IDENT = BY_NAME['ident'].address
         
         # Control commands
-        self.CMD_FORWARD = 0x0001
-        self.CMD_STOP = 0x0005
-        self.CMD_FAULT_RESET = 0x0007
+        self.CMD_FORWARD = CMD_FORWARD
+        self.CMD_STOP = CMD_STOP
+        self.CMD_COAST_STOP = CMD_COAST_STOP
+        self.CMD_FAULT_RESET = CMD_FAULT_RESET
 
     def crc16(self, data):
-        crc = 0xFFFF
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x0001:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc >>= 1
-        return struct.pack('<H', crc)
+        return crc16(data)
 
     def write_register(self, register, value, retries=3):
         """Write single register with retries"""
+        request = bytes([
+            self.device_id,
+            0x06,
+            (register >> 8) & 0xFF,
+            register & 0xFF,
+            (value >> 8) & 0xFF,
+            value & 0xFF
+        ])
+        with self.lock:
+            ok = self._write_request(request, retries)
+            if ok:
+                self._update_shadow(register, [value])
+                self._invalidate_after_write(register, 1)
+            if self.recorder:
+                self.recorder('tx', drive=self.name, reg=register, values=[value], ok=ok)
+            return ok
+
+    def write_registers(self, register, values, retries=3):
+        """Write multiple registers (function code 0x10) with retries"""
+        count = len(values)
+        request = bytes([
+            self.device_id,
+            0x10,
+            (register >> 8) & 0xFF,
+            register & 0xFF,
+            (count >> 8) & 0xFF,
+            count & 0xFF,
+            count * 2
+        ]) + struct.pack(f'>{count}H', *values)
+        with self.lock:
+            ok = self._write_request(request, retries)
+            if ok:
+                self._update_shadow(register, values)
+                self._invalidate_after_write(register, count)
+            if self.recorder:
+                self.recorder('tx', drive=self.name, reg=register, values=list(values), ok=ok)
+            return ok
+
+    def _update_shadow(self, register, values):
+        now = time.monotonic()
+        for i, value in enumerate(values):
+            self.shadow[register + i] = (value, now)
+            self._dirty.discard(register + i)
+    
+    def _invalidate_after_write(self, register, count):
+        """Commands change drive state; don't serve pre-command values from cache"""
+        written = range(register, register + count)
+        if self.REG_CONTROL in written:
+            self._dirty.update(range(self.REG_STATE_1, self.REG_FAULT + 1))
+            self._dirty.update(range(self.REG_RUN_FREQ, self.REG_OUTPUT_POWER + 2))
+        if self.REG_FREQ_SET in written:
+            self._dirty.add(self.REG_RUN_FREQ + 1)  # Set frequency (0x3001)
+    
+    def shadow_values(self, register, count=1):
+        """Shadowed raw values for a register range, or None if any is missing"""
+        entries = [self.shadow.get(address) for address in range(register, register + count)]
+        if any(entry is None for entry in entries):
+            return None
+        return [entry[0] for entry in entries]
+    
+    def needs_refresh(self, register, count=1):
+        """True if any register in the range was never read or a write made it stale"""
+        return any(address not in self.shadow or address in self._dirty
+                   for address in range(register, register + count))
+    
+    def _cached(self, register, count, max_age):
+        """Values for a register range if every one is within its freshness window"""
+        if max_age is None and self.cache_policy is None:
+            return None
+        now = time.monotonic()
+        values = []
+        for address in range(register, register + count):
+            entry = self.shadow.get(address)
+            if entry is None or address in self._dirty:
+                return None
+            limit = max_age if max_age is not None else self.cache_policy.max_age(address)
+            if limit <= 0 or now - entry[1] > limit:
+                return None
+            values.append(entry[0])
+        return values
+
+    def _write_request(self, request, retries):
+        if not self.ser.is_open:
+            self.error_count += 1  # Adapter not attached (yet)
+            return False
+        request += self.crc16(request)
         for attempt in range(retries):
             try:
-                request = bytes([
-                    self.device_id,
-                    0x06,
-                    (register >> 8) & 0xFF,
-                    register & 0xFF,
-                    (value >> 8) & 0xFF,
-                    value & 0xFF
-                ])
-                request += self.crc16(request)
-                
                 self.ser.reset_input_buffer()
                 self.ser.reset_output_buffer()
                 time.sleep(0.02)  # Pre-write delay
+                start = time.monotonic()
                 self.ser.write(request)
                 time.sleep(0.15)  # Increased post-write delay for daisy chain
                 
-                response = self.ser.read(256)
+                response = self.ser.read(8)  # FC06 / FC16 reply; returns as soon as it is in
                 
                 if len(response) < 5:
                     if attempt < retries - 1:
@@ -82,6 +213,7 @@ class VFDController:
                     self.error_count += 1
                     return False
                 
+                self.last_latency = time.monotonic() - start
                 self.error_count = max(0, self.error_count - 1)
                 return True
                 
@@ -95,8 +227,38 @@ class VFDController:
         
         return False
 
-    def read_register(self, register, count=1, retries=3):
-        """Read holding registers with retries"""
+    def read_register(self, register, count=1, retries=3, max_age=None):
+        """
+        Read holding registers with retries.
+        
+        Values still within their freshness window (max_age, or the cache
+        policy's age for each register) are served from the shadow without
+        a bus transaction.
+        """
+        cached = self._cached(register, count, max_age)
+        if cached is None:
+            with self.lock:
+                # Another thread may have read it while we waited for the bus
+                cached = self._cached(register, count, max_age)
+                if cached is None:
+                    self.cache_misses += 1
+                    values = self._read_register(register, count, retries)
+                    if self.recorder:
+                        self.recorder('rx', drive=self.name, reg=register, n=count,
+                                      values=values if values is None or count > 1 else [values],
+                                      latency=self.last_latency)
+                    return values
+        self.cache_hits += 1
+        return cached if count > 1 else cached[0]
+
+    def refresh(self, register, count=1, retries=3):
+        """Force a bus read of a register range, bypassing the shadow cache"""
+        return self.read_register(register, count, retries, max_age=0)
+
+    def _read_register(self, register, count, retries):
+        if not self.ser.is_open:
+            self.error_count += 1  # Adapter not attached (yet)
+            return None
         for attempt in range(retries):
             try:
                 request = bytes([
@@ -112,10 +274,11 @@ class VFDController:
                 self.ser.reset_input_buffer()
                 self.ser.reset_output_buffer()
                 time.sleep(0.02)  # Pre-read delay
+                start = time.monotonic()
                 self.ser.write(request)
                 time.sleep(0.15)  # Increased post-read delay for daisy chain
                 
-                response = self.ser.read(256)
+                response = self.ser.read(5 + 2 * count)  # Returns as soon as the reply is in
                 
                 if len(response) < 5:
                     if attempt < retries - 1:
@@ -140,14 +303,11 @@ class VFDController:
                     self.error_count += 1
                     return None
                 
-                byte_count = response[2]
-                data = response[3:3+byte_count]
-                
-                values = []
-                for i in range(0, len(data), 2):
-                    values.append((data[i] << 8) | data[i+1])
+                values = list(_words(count).unpack_from(response, 3))
                 
+                self.last_latency = time.monotonic() - start
                 self.error_count = max(0, self.error_count - 1)
+                self._update_shadow(register, values)
                 return values if count > 1 else values[0]
                 
             except Exception as e:
@@ -160,6 +320,52 @@ class VFDController:
         
         return None
 
+    def _quick_transaction(self, request, reply_length, timeout):
+        """
+        One attempt with a short timeout, returning as soon as the expected
+        reply is in (emergency stop path; the caller holds the bus lock).
+        Returns the reply frame, or None.
+        """
+        if not self.ser.is_open:
+            return None
+        request += self.crc16(request)
+        saved_timeout = self.ser.timeout
+        try:
+            self.ser.timeout = timeout
+            self.ser.reset_input_buffer()
+            self.ser.write(request)
+            response = self.ser.read(reply_length)
+        except Exception as e:
+            logger.error(f"[{self.description}] Quick transaction error: {e}")
+            return None
+        finally:
+            self.ser.timeout = saved_timeout
+        if len(response) < 5 or response[-2:] != self.crc16(response[:-2]) or response[1] & 0x80:
+            return None
+        return response
+    
+    def quick_read(self, register, timeout):
+        """Single-register read without retries; None if no valid answer within timeout"""
+        request = bytes([self.device_id, 0x03, (register >> 8) & 0xFF, register & 0xFF, 0x00, 0x01])
+        response = self._quick_transaction(request, 7, timeout)
+        if response is None:
+            return None
+        value = (response[3] << 8) | response[4]
+        self._update_shadow(register, [value])
+        return value
+    
+    def quick_write(self, register, value, timeout):
+        """Single-register write without retries; True if the drive echoed it within timeout"""
+        request = bytes([self.device_id, 0x06, (register >> 8) & 0xFF, register & 0xFF,
+                         (value >> 8) & 0xFF, value & 0xFF])
+        ok = self._quick_transaction(request, 8, timeout) is not None
+        if ok:
+            self._update_shadow(register, [value])
+            self._invalidate_after_write(register, 1)
+        if self.recorder:
+            self.recorder('tx', drive=self.name, reg=register, values=[value], ok=ok)
+        return ok
+
     def start(self):
         logger.info(f"[{self.description}] Sending START command")
         return self.write_register(self.REG_CONTROL, self.CMD_FORWARD)
@@ -168,79 +374,484 @@ class VFDController:
         logger.info(f"[{self.description}] Sending STOP command")
         return self.write_register(self.REG_CONTROL, self.CMD_STOP)
 
+    def fault_reset(self):
+        logger.info(f"[{self.description}] Sending FAULT RESET command")
+        return self.write_register(self.REG_CONTROL, self.CMD_FAULT_RESET)
+
     def set_frequency(self, hz):
         value = int(hz * 100)
         logger.debug(f"[{self.description}] Setting frequency to {hz:.2f} Hz")
         return self.write_register(self.REG_FREQ_SET, value)
 
-    def get_status(self):
-        state1 = self.read_register(self.REG_STATE_1)
-        run_freq = self.read_register(self.REG_RUN_FREQ)
-        fault = self.read_register(self.REG_FAULT)
-        current = self.read_register(self.REG_OUTPUT_CURRENT)
-        
-        state_map = {
-            0x0001: "Forward",
-            0x0002: "Reverse",
-            0x0003: "Stopped",
-            0x0004: "Fault",
-            0x0005: "PowerOff",
-            0x0006: "PreExcited"
-        }
+    def get_status(self, max_age=None):
+        """Drive status; max_age=0 forces fresh reads instead of the shadow cache"""
+        # State word 1, state word 2 and fault code are contiguous (0x2100-0x2102)
+        states = self.read_register(STATE_BLOCK.first, count=STATE_BLOCK.count, max_age=max_age)
+        # Monitoring block 0x3000-0x3006: run freq .. output power in one read
+        monitor = self.read_register(MONITOR_BLOCK.first, count=MONITOR_BLOCK.count, max_age=max_age)
+        return self.decode_status(states, monitor)
+    
+    def cached_status(self):
+        """Status built from the shadow alone, whatever its age (no bus traffic)"""
+        return self.decode_status(self.shadow_values(STATE_BLOCK.first, STATE_BLOCK.count),
+                                  self.shadow_values(MONITOR_BLOCK.first, MONITOR_BLOCK.count))
+    
+    def read_record(self, block, max_age=None):
+        """Decoded record (g540_registers.RegisterBlock) of one block read, or None"""
+        values = self.read_register(block.first, count=block.count, max_age=max_age)
+        if values is None:
+            return None
+        return block.decode_values(values if block.count > 1 else [values])
+    
+    @staticmethod
+    def _complete(values, block):
+        """A block read that can be decoded: every register present"""
+        return values is not None and len(values) == block.count and None not in values
+    
+    def decode_status(self, states, monitor):
+        """Status dict from the raw state block (0x2100) and monitoring block (0x3000); None = no answer"""
+        states = STATE_BLOCK.decode_values(states) if self._complete(states, STATE_BLOCK) else None
+        monitor = MONITOR_BLOCK.decode_values(monitor) if self._complete(monitor, MONITOR_BLOCK) else None
+        state1 = states.state_1 if states else None
         
         return {
-            "state": state_map.get(state1, "Unknown") if state1 else "NoComm",
-            "output_frequency": (run_freq * 0.01) if run_freq else 0.0,
-            "fault_code": fault if fault else 0,
-            "output_current": (current * 0.1) if current else 0.0,
+            "state": STATE_NAMES.get(state1, "Unknown") if state1 else "NoComm",
+            "output_frequency": monitor.run_frequency if monitor else 0.0,
+            "fault_code": states.fault_code if states else 0,
+            "state_word_2": states.state_2 if states else 0,
+            "output_current": monitor.output_current if monitor else 0.0,
+            "output_voltage": float(monitor.output_voltage) if monitor else 0.0,
+            "output_power_pct": monitor.output_power if monitor else 0.0,
             "healthy": self.error_count < 5  # Increased threshold
         }
     
+    def get_cache_stats(self):
+        total = self.cache_hits + self.cache_misses
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'hit_ratio': round(self.cache_hits / total, 3) if total else 0.0
+        }
+    
     def is_healthy(self, max_errors=5):
         return self.error_count < max_errors
 
 
-class MultiVFDManager:
-    def __init__(self, port='/dev/ttyUSB0', baudrate=19200, parity='E', stopbits=1, bytesize=8, timeout=1.5):
-        parity_map = {'E': serial.PARITY_EVEN, 'O': serial.PARITY_ODD, 'N': serial.PARITY_NONE}
-        
+class ModbusBus:
+    """One RS-485 serial bus and the lock serializing transactions on it"""
+    
+    PARITIES = {'E': serial.PARITY_EVEN, 'O': serial.PARITY_ODD, 'N': serial.PARITY_NONE}
+    
+    def __init__(self, name, port, baudrate=19200, parity='E', stopbits=1, bytesize=8, timeout=1.5):
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.parity = parity
+        self.stopbits = stopbits
         self.ser = serial.Serial(
-            port=port,
             baudrate=baudrate,
             bytesize=bytesize,
-            parity=parity_map.get(parity, serial.PARITY_EVEN),
+            parity=self.PARITIES.get(parity, serial.PARITY_EVEN),
             stopbits=stopbits,
             timeout=timeout
         )
-        
+        self.ser.port = port  # Set after construction so the port is only opened by connect()
+        self.lock = threading.RLock()
         self.vfds = {}
-        logger.info(f"Modbus RTU initialized: {port} @ {baudrate} baud, parity={parity}")
+        self.poller = None
+        self.reconnects = 0
+        self._device = None  # Inode of the device node the port was opened on
+        self._open_failed = False
+        logger.info(f"Modbus RTU bus '{name}' initialized: {port} @ {baudrate} baud, parity={parity}")
     
-    def connect(self):
+    @property
+    def connected(self):
+        return self.ser.is_open
+    
+    def connect(self, quiet=False):
         if self.ser.is_open:
-            logger.info("Serial port already open")
+            logger.info(f"Serial port {self.port} already open")
             return True
         try:
-            self.ser.open()
-            logger.info("Serial port opened successfully")
+            with self.lock:
+                self.ser.open()
+            self._device = self._device_inode()
+            logger.info(f"Serial port {self.port} opened successfully")
+            return True
+        except Exception as e:
+            (logger.debug if quiet else logger.error)(f"Failed to open serial port {self.port}: {e}")
+            return False
+    
+    def _device_inode(self):
+        try:
+            return os.stat(self.port).st_ino
+        except OSError:
+            return None
+    
+    def check(self):
+        """
+        Follow USB adapter hotplug: close the port when its device node
+        disappears (so the kernel can reuse the name) and open it again when
+        it reappears. Returns True while the port is open.
+        """
+        device = self._device_inode()
+        if self.ser.is_open:
+            if device is not None and device == self._device:
+                return True
+            logger.warning(f"Serial adapter {self.port} removed or replaced, closing port")
+            with self.lock:  # Not in the middle of a transaction
+                self.ser.close()
+        if device is None:
+            return False
+        reopen = self._device is not None
+        if self.connect(quiet=self._open_failed):
+            self._open_failed = False
+            if reopen:
+                self.reconnects += 1
             return True
+        self._open_failed = True  # Log the first failure only
+        return False
+    
+    def reconfigure(self, baudrate, parity=None, stopbits=None):
+        """Switch the port's line settings in place (applied immediately if open)"""
+        parity = parity or self.parity
+        stopbits = stopbits or self.stopbits
+        with self.lock:  # Not in the middle of a transaction
+            self.ser.baudrate = baudrate
+            self.ser.parity = self.PARITIES.get(parity, serial.PARITY_EVEN)
+            self.ser.stopbits = stopbits
+            if self.ser.is_open:
+                self.ser.reset_input_buffer()  # Garbage received at the old rate
+        self.baudrate, self.parity, self.stopbits = baudrate, parity, stopbits
+        logger.info(f"Bus '{self.name}' now {baudrate} baud, parity={parity}, stopbits={stopbits}")
+    
+    def broadcast(self, register, value, repeats=2, lock_timeout=0.2):
+        """
+        Write one register on every drive of the bus at once (slave 0).
+        
+        Broadcasts are not answered, so the frame is sent `repeats` times.
+        If a transaction holds the bus for longer than lock_timeout the
+        frame goes out anyway: a collision only loses a frame, which the
+        repeats and the caller's verification cover.
+        """
+        if not self.ser.is_open:
+            return False
+        request = bytes([0x00, 0x06, (register >> 8) & 0xFF, register & 0xFF, (value >> 8) & 0xFF, value & 0xFF])
+        request += crc16(request)
+        locked = self.lock.acquire(timeout=lock_timeout)
+        try:
+            for _ in range(repeats):
+                self.ser.write(request)
+                self.ser.flush()
+                time.sleep(0.02)  # Inter-frame gap
         except Exception as e:
-            logger.error(f"Failed to open serial port: {e}")
+            logger.error(f"Broadcast on bus '{self.name}' failed: {e}")
             return False
+        finally:
+            if locked:
+                self.lock.release()
+        for vfd in self.vfds.values():
+            vfd._invalidate_after_write(register, 1)
+            if vfd.recorder:
+                vfd.recorder('tx', drive=vfd.name, reg=register, values=[value], ok=True, broadcast=True)
+        return True
     
     def close(self):
+        if self.poller:
+            self.poller.stop()
         self.ser.close()
-        logger.info("Serial port closed")
+        logger.info(f"Serial port {self.port} closed")
+
+
+class BusPoller(threading.Thread):
+    """Worker thread polling the status of every drive on one bus"""
+    
+    def __init__(self, bus, interval, callback, skip=None):
+        """
+        Args:
+            bus: ModbusBus to poll
+            interval: Seconds between polling rounds
+            callback: Called as callback(name, status) for each drive
+            skip: Optional skip(name) -> bool to leave a drive out of a round
+        """
+        super().__init__(name=f"poll-{bus.name}", daemon=True)
+        self.bus = bus
+        self.interval = interval
+        self.callback = callback
+        self.skip = skip
+        self.cycle_time = 0.0
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        while not self._stop_event.is_set():
+            start = time.monotonic()
+            for name, vfd in list(self.bus.vfds.items()):
+                if self._stop_event.is_set():
+                    break
+                if self.skip and self.skip(name):
+                    continue
+                try:
+                    self.callback(name, vfd.get_status())
+                except Exception as e:
+                    logger.error(f"[{self.bus.name}] Poll error for '{name}': {e}")
+            self.cycle_time = time.monotonic() - start
+            self._stop_event.wait(max(0.0, self.interval - self.cycle_time))
+    
+    def stop(self):
+        self._stop_event.set()
+
+
+def parse_address(address):
+    """Split a 'bus/slave' drive address into (bus, slave id)"""
+    bus, _, slave = address.partition('/')
+    if not bus or not slave:
+        raise ValueError(f"Invalid drive address '{address}' (expected 'bus/slave')")
+    return bus, int(slave)
+
+
+class MultiVFDManager:
+    """Drives on one or more RS-485 buses, addressed as 'bus/slave'"""
+    
+    def __init__(self, port=None, baudrate=19200, parity='E', stopbits=1, bytesize=8, timeout=1.5,
+                 cache_policy=None):
+        self.cache_policy = cache_policy
+        self.buses = {}
+        self.vfds = {}
+        self.addresses = {}  # 'bus/slave' -> drive name
+        self.towers = {}     # tower -> {role: drive name}
+        self.recorder = None
+        
+        if port:
+            self.add_bus('bus0', port, baudrate, parity, stopbits, bytesize, timeout)
+    
+    @classmethod
+    def from_config(cls, buses, towers, cache_policy=None):
+        """
+        Build a manager from the SERIAL_BUSES / TOWERS config schema.
+        
+        Drives are named '<tower>.<role>'; each VFD entry gives either
+        'address' ('bus/slave') or 'bus' and 'device_id'.
+        """
+        manager = cls(cache_policy=cache_policy)
+        for name, cfg in buses.items():
+            manager.add_bus(name, **cfg)
+        for tower, tower_cfg in towers.items():
+            for role, cfg in tower_cfg['vfds'].items():
+                bus, device_id = manager._resolve(cfg)
+                manager.add_vfd(f"{tower}.{role}", device_id, cfg['description'], bus=bus)
+                manager.towers.setdefault(tower, {})[role] = f"{tower}.{role}"
+        return manager
+    
+    def _resolve(self, cfg):
+        """(bus, slave id) of a TOWERS VFD entry"""
+        if 'address' in cfg:
+            return parse_address(cfg['address'])
+        return cfg.get('bus', next(iter(self.buses))), cfg['device_id']
+    
+    def apply_towers(self, towers):
+        """
+        Apply a changed TOWERS map to the running buses.
+        
+        New drives are added and existing drives re-addressed in place
+        (same VFDController object, so pollers and control loops keep
+        working). Moving a drive to another bus or removing it needs a
+        restart.
+        """
+        for tower, tower_cfg in towers.items():
+            for role, cfg in tower_cfg['vfds'].items():
+                name = f"{tower}.{role}"
+                bus, device_id = self._resolve(cfg)
+                vfd = self.vfds.get(name)
+                if vfd is None:
+                    self.add_vfd(name, device_id, cfg['description'], bus=bus)
+                    self.towers.setdefault(tower, {})[role] = name
+                    continue
+                vfd.description = cfg['description']
+                if bus != vfd.bus:
+                    logger.warning(f"Moving '{name}' to bus '{bus}' needs a restart")
+                elif device_id != vfd.device_id:
+                    del self.addresses[vfd.address]
+                    with vfd.lock:
+                        vfd.device_id = device_id
+                        vfd.shadow.clear()  # Values belong to the old slave
+                    vfd.address = f"{bus}/{device_id}"
+                    self.addresses[vfd.address] = name
+                    logger.info(f"Re-addressed VFD '{name}' to {vfd.address}")
+        
+        configured = {f"{t}.{r}" for t, cfg in towers.items() for r in cfg['vfds']}
+        for name in set(self.vfds) - configured:
+            logger.warning(f"Removing '{name}' needs a restart")
+    
+    def add_bus(self, name, port, baudrate=19200, parity='E', stopbits=1, bytesize=8, timeout=1.5):
+        self.buses[name] = ModbusBus(name, port, baudrate, parity, stopbits, bytesize, timeout)
+        return self.buses[name]
+    
+    def connect(self):
+        """Open every bus; True only if all opened"""
+        results = [bus.connect() for bus in self.buses.values()]
+        return bool(results) and all(results)
+    
+    def close(self):
+        for bus in self.buses.values():
+            bus.close()
     
-    def add_vfd(self, name, device_id, description):
-        self.vfds[name] = VFDController(self.ser, device_id, description)
-        logger.info(f"Added VFD '{name}': {description} (Device ID: {device_id})")
+    def check_buses(self):
+        """Open buses whose adapters appeared, reopen replugged ones: {bus: connected}"""
+        return {name: bus.check() for name, bus in self.buses.items()}
+    
+    def add_vfd(self, name, device_id, description, bus=None):
+        bus = self.buses[bus] if bus else next(iter(self.buses.values()))
+        vfd = VFDController(bus.ser, device_id, description, lock=bus.lock,
+                            cache_policy=self.cache_policy)
+        vfd.name = name
+        vfd.recorder = self.recorder
+        vfd.bus = bus.name
+        vfd.address = f"{bus.name}/{device_id}"
+        
+        bus.vfds[name] = vfd
+        self.vfds[name] = vfd
+        self.addresses[vfd.address] = name
+        logger.info(f"Added VFD '{name}': {description} (Address: {vfd.address})")
+        return vfd
+    
+    def set_recorder(self, recorder, tower=None):
+        """Capture Modbus reads and writes with recorder(kind, **fields), of one tower's drives or all"""
+        names = self.towers[tower].values() if tower else self.vfds
+        if not tower:
+            self.recorder = recorder  # Drives added later are captured too
+        for name in names:
+            self.vfds[name].recorder = recorder
+    
+    def set_bus_capture(self, capture):
+        """Route every bus's serial traffic through capture.tap (bus_capture.BusCapture), in bus order"""
+        for index, bus in enumerate(self.buses.values()):
+            bus.ser = capture.tap(bus.ser, index)
+            for vfd in bus.vfds.values():
+                vfd.ser = bus.ser
     
     def get_vfd(self, name):
-        return self.vfds.get(name)
+        """Get a drive by name or by 'bus/slave' address"""
+        if name in self.vfds:
+            return self.vfds[name]
+        return self.vfds.get(self.addresses.get(name))
     
-    def stop_all(self):
-        logger.info("Stopping all VFDs...")
-        for name, vfd in self.vfds.items():
+    def get_tower(self, tower):
+        """Get {role: VFDController} for one tower"""
+        return {role: self.vfds[name] for role, name in self.towers.get(tower, {}).items()}
+    
+    def start_polling(self, interval, callback, skip=None, adaptive=None):
+        """
+        Start one polling worker per bus so buses are polled in parallel.
+        
+        With adaptive settings (config ADAPTIVE_POLLING), each bus gets an
+        AdaptivePoller instead of polling every drive at a fixed interval.
+        """
+        for bus in self.buses.values():
+            if bus.poller and bus.poller.is_alive():
+                continue
+            if adaptive:
+                bus.poller = AdaptivePoller(
+                    bus, callback, skip,
+                    blocks=adaptive['blocks'],
+                    min_interval=adaptive['min_interval'],
+                    max_interval=adaptive['max_interval'],
+                    bus_budget=adaptive['bus_budget'],
+                    deadbands=adaptive['deadbands'],
+                    smoothing=adaptive['smoothing']
+                )
+            else:
+                bus.poller = BusPoller(bus, interval, callback, skip)
+            bus.poller.start()
+    
+    def get_polling_stats(self):
+        return {name: bus.poller.get_stats() for name, bus in self.buses.items()
+                if bus.poller and hasattr(bus.poller, 'get_stats')}
+    
+    def stop_polling(self):
+        for bus in self.buses.values():
+            if bus.poller:
+                bus.poller.stop()
+    
+    def _stop_bus(self, bus):
+        for name, vfd in bus.vfds.items():
             vfd.stop()
             time.sleep(0.2)  # Delay between commands
+    
+    def _estop_bus(self, bus, command, end, repeats, read_timeout):
+        """Broadcast stop on one bus, then confirm each drive until the deadline"""
+        bus.broadcast(0x2000, command, repeats)  # Control word register
+        pending = dict(bus.vfds)
+        states = {}
+        while pending and bus.ser.is_open:
+            for name, vfd in list(pending.items()):
+                remaining = end - time.monotonic()
+                if remaining <= 0 or not bus.lock.acquire(timeout=remaining):
+                    return pending, states
+                try:
+                    state = vfd.quick_read(vfd.REG_STATE_1, min(read_timeout, end - time.monotonic()))
+                    states[name] = state
+                    if state is not None and state not in RUNNING_STATES:
+                        del pending[name]
+                    elif end - time.monotonic() > 0:
+                        # Missed the broadcast (or does not take them): stop it by address
+                        vfd.quick_write(vfd.REG_CONTROL, command, min(read_timeout, end - time.monotonic()))
+                finally:
+                    bus.lock.release()
+        return pending, states
+    
+    def emergency_stop(self, command=0x0006, deadline=3.0, repeats=2, read_timeout=0.25):
+        """
+        Stop every drive as fast as the buses allow.
+        
+        Each bus gets a broadcast stop frame, then its drives' state words
+        are polled (buses in parallel) until each reads stopped; a drive
+        still running or not answering gets an addressed stop and is polled
+        again, until the deadline.
+        
+        Args:
+            command: Control word (0x0006 coast stop, 0x0005 ramp stop)
+            deadline: Seconds allowed for stopping and confirming
+            repeats: Broadcast frames per bus
+            read_timeout: Seconds per verification read or addressed stop
+        
+        Returns:
+            Dict with 'stopped' and 'unconfirmed' (name -> last state) drives and 'elapsed' seconds
+        """
+        start = time.monotonic()
+        end = start + deadline
+        logger.warning("EMERGENCY STOP: broadcasting stop on all buses")
+        results = {}
+        
+        def run(bus):
+            results[bus.name] = self._estop_bus(bus, command, end, repeats, read_timeout)
+        
+        threads = [threading.Thread(target=run, args=(bus,), name=f'estop-{bus.name}', daemon=True)
+                   for bus in self.buses.values()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(max(0.0, end - time.monotonic()) + read_timeout)
+        
+        stopped, unconfirmed = [], {}
+        for bus in self.buses.values():
+            pending, states = results.get(bus.name, (bus.vfds, {}))
+            for name, vfd in bus.vfds.items():
+                if name in pending:
+                    state = states.get(name)
+                    unconfirmed[name] = STATE_NAMES.get(state, 'Unknown') if state is not None else 'NoComm'
+                else:
+                    stopped.append(name)
+        elapsed = time.monotonic() - start
+        if unconfirmed:
+            logger.error(f"EMERGENCY STOP: not confirmed for {', '.join(sorted(unconfirmed))} after {elapsed:.2f} s")
+        else:
+            logger.warning(f"EMERGENCY STOP: all {len(stopped)} drives confirmed stopped in {elapsed:.2f} s")
+        return {'stopped': sorted(stopped), 'unconfirmed': unconfirmed, 'elapsed': round(elapsed, 3)}
+    
+    def stop_all(self):
+        logger.info("Stopping all VFDs...")
+        threads = [threading.Thread(target=self._stop_bus, args=(bus,)) for bus in self.buses.values()]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
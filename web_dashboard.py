@@ -3,26 +3,27 @@ import secrets
 """
 Cooling Tower Web Dashboard
 Full control and monitoring interface for 3 VFDs + sensors
+
+The hardware is owned by control_daemon.py; this process only reads the
+daemon's state snapshot and sends it commands, so it can run as several
+WSGI workers (e.g. gunicorn -w 4 web_dashboard:app).
 """
 
 from flask import Flask, redirect, render_template, jsonify, request, make_response
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-import threading
+import os
 import time
 import logging
-from datetime import datetime
-from vfd_controller import MultiVFDManager
-from sensor_manager import SensorManager
-from pump_failover import PumpFailoverManager
+from control_ipc import DaemonClient, DaemonUnavailable
 from config import *
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-# Security configuration
-app.secret_key = secrets.token_hex(32)
+# Security configuration (set COOLING_TOWER_SECRET_KEY so all WSGI workers accept the same sessions)
+app.secret_key = os.environ.get('COOLING_TOWER_SECRET_KEY') or secrets.token_hex(32)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -64,172 +65,57 @@ def logout():
     return redirect('/login')
 
 
-class CoolingTowerSystem:
-    def __init__(self):
-        self.running = False
-        self.auto_mode = False
-        self.system_state = {
-            'timestamp': None,
-            'sensors': {'pressure_psi': 0, 'temperature_f': 0},
-            'fan': {'state': 'Unknown', 'frequency': 0, 'current': 0, 'fault': 0},
-            'pump_primary': {'state': 'Unknown', 'frequency': 0, 'current': 0, 'fault': 0},
-            'pump_backup': {'state': 'Unknown', 'frequency': 0, 'current': 0, 'fault': 0},
-            'active_pump': 'primary',
-            'control_params': CONTROL_PARAMS.copy(),
-            'errors': []
-        }
-        
-        # Initialize hardware
-        try:
-            self.vfd_manager = MultiVFDManager(
-                port=SERIAL_PORT,
-                baudrate=SERIAL_BAUDRATE,
-                parity=SERIAL_PARITY,
-                stopbits=SERIAL_STOPBITS,
-                bytesize=SERIAL_BYTESIZE
-            )
-            
-            for name, cfg in VFD_CONFIG.items():
-                self.vfd_manager.add_vfd(name, cfg['device_id'], cfg['description'])
-            
-            self.fan_vfd = self.vfd_manager.get_vfd('fan')
-            pump_primary = self.vfd_manager.get_vfd('pump_primary')
-            pump_backup = self.vfd_manager.get_vfd('pump_backup')
-            
-            self.pump_manager = PumpFailoverManager(
-                pump_primary,
-                pump_backup,
-                max_errors=PUMP_FAILOVER['max_consecutive_errors'],
-                check_interval=PUMP_FAILOVER['health_check_interval']
-            )
-            
-            self.sensors = SensorManager(
-                i2c_address=SENSOR_CONFIG['i2c_address'],
-                gain=SENSOR_CONFIG['ads_gain']
-            )
-            
-            self.vfd_manager.connect()
-            logger.info("Hardware initialized successfully")
-            
-        except Exception as e:
-            logger.error(f"Hardware initialization failed: {e}")
-            self.system_state['errors'].append(str(e))
-    
-    def update_sensors(self):
-        """Update sensor readings only (fast ~0.02s)"""
-        try:
-            sensor_data = self.sensors.read_all()
-            self.system_state['sensors'] = sensor_data
-            self.system_state['timestamp'] = datetime.now().isoformat()
-        except Exception as e:
-            logger.error(f"Sensor update error: {e}")
-    
-    def update_vfds(self):
-        """Update VFD status (slow ~30s)"""
-        try:
-            # Read VFD states
-            fan_status = self.fan_vfd.get_status()
-            self.system_state['fan'] = {
-                'state': fan_status['state'],
-                'frequency': fan_status['output_frequency'],
-                'current': fan_status['output_current'],
-                'fault': fan_status['fault_code']
-            }
-            
-            pump_status = self.pump_manager.get_status()
-            self.system_state['active_pump'] = pump_status['active_pump']
-            
-            primary_status = self.pump_manager.primary.get_status()
-            self.system_state['pump_primary'] = {
-                'state': primary_status['state'],
-                'frequency': primary_status['output_frequency'],
-                'current': primary_status['output_current'],
-                'fault': primary_status['fault_code']
-            }
-            
-            backup_status = self.pump_manager.backup.get_status()
-            self.system_state['pump_backup'] = {
-                'state': backup_status['state'],
-                'frequency': backup_status['output_frequency'],
-                'current': backup_status['output_current'],
-                'fault': backup_status['fault_code']
-            }
-        except Exception as e:
-            logger.error(f"VFD update error: {e}")
-    
-    def update_state(self):
-        """Update complete system state from hardware"""
-        self.update_sensors()
-        self.update_vfds()
-    
-    def control_loop(self):
-        """Main control loop"""
-        while self.running:
-            try:
-                self.update_state()
-                
-                if self.auto_mode:
-                    # Automatic pressure control
-                    pressure = self.system_state['sensors']['pressure_psi']
-                    target = self.system_state['control_params']['target_pressure']
-                    kp = self.system_state['control_params']['kp']
-                    
-                    error = target - pressure
-                    output_hz = 30.0 + (error * kp)
-                    
-                    output_hz = max(
-                        self.system_state['control_params']['min_frequency'],
-                        min(self.system_state['control_params']['max_frequency'], output_hz)
-                    )
-                    
-                    self.pump_manager.set_frequency(output_hz)
-                    
-                    # Check pump health for failover
-                    if PUMP_FAILOVER['auto_failover_enabled']:
-                        self.pump_manager.check_health()
-                
-                time.sleep(1.0)
-                
-            except Exception as e:
-                logger.error(f"Control loop error: {e}")
-                time.sleep(5.0)
-    
-    def start_system(self):
-        """Start the cooling tower system"""
-        if self.running:
-            return
-        
-        self.running = True
-        
-        # Start fan
-        self.fan_vfd.set_frequency(45.0)
-        self.fan_vfd.start()
-        
-        # Start primary pump
-        active_pump = self.pump_manager.get_active_vfd()
-        active_pump.set_frequency(30.0)
-        active_pump.start()
-        
-        # Start control thread
-        self.control_thread = threading.Thread(target=self.control_loop, daemon=True)
-        self.control_thread.start()
-        
-        logger.info("System started")
-    
-    def stop_system(self):
-        """Stop the cooling tower system"""
-        self.running = False
-        self.auto_mode = False
-        
-        time.sleep(2.0)  # Let control loop finish
-        
-        self.pump_manager.stop()
-        self.fan_vfd.stop()
-        
-        logger.info("System stopped")
+# Control daemon connection
+daemon = DaemonClient(
+    CONTROL_DAEMON['socket_path'],
+    CONTROL_DAEMON['state_path'],
+    timeout=CONTROL_DAEMON['command_timeout'],
+    stale_after=CONTROL_DAEMON['stale_after']
+)
+
+VFD_NAMES = ('fan', 'pump_primary', 'pump_backup')
 
-# Global system instance
-system = CoolingTowerSystem()
+# Shown while the daemon is down and no snapshot was ever read
+_OFFLINE_VFD = {'state': 'Unknown', 'frequency': 0, 'current': 0, 'voltage': 0, 'fault': 0}
+OFFLINE_STATE = {
+    'timestamp': None,
+    'sensors': {'pressure_psi': 0, 'temperature_f': 0},
+    'fan': _OFFLINE_VFD,
+    'pump_primary': _OFFLINE_VFD,
+    'pump_backup': _OFFLINE_VFD,
+    'active_pump': 'primary',
+    'errors': []
+}
+
+_last_state = None
+
+
+def current_state():
+    """Daemon state for /api/status; last known values plus an error while it is down"""
+    global _last_state
+    snap = daemon.snapshot()
+    if snap is not None:
+        _last_state = snap['state']
+        return snap['state']
+    state = dict(_last_state or OFFLINE_STATE)
+    state['errors'] = list(state.get('errors', [])) + ['Control daemon not running or not responding']
+    return state
+
+
+def command(cmd, args=None, timeout=None):
+    """Send a command to the daemon and turn the reply into a JSON response"""
+    try:
+        reply = daemon.call(cmd, args, timeout=timeout)
+    except DaemonUnavailable as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    return jsonify(reply), (200 if reply.get('success') else 500)
+
+
+def require_snapshot():
+    snap = daemon.snapshot()
+    if snap is None:
+        return None, (jsonify({'success': False, 'error': 'Control daemon not running'}), 503)
+    return snap, None
 
 # ==================== WEB ROUTES ====================
 
@@ -242,7 +128,7 @@ def index():
 @login_required
 def get_status():
     """Get current system status"""
-    response = make_response(jsonify(system.system_state))
+    response = make_response(jsonify(current_state()))
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
@@ -252,137 +138,207 @@ def get_status():
 @login_required
 def start_system():
     """Start the cooling tower"""
-    try:
-        system.start_system()
-        return jsonify({'success': True, 'message': 'System started'})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    return command('start', timeout=SEQUENCES['command_timeout'])  # Waits for the drives
 
-@login_required
 @app.route('/api/stop', methods=['POST'])
+@login_required
 def stop_system():
     """Stop the cooling tower"""
-    try:
-        system.stop_system()
-        return jsonify({'success': True, 'message': 'System stopped'})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    return command('stop', timeout=SEQUENCES['command_timeout'])
 
-@login_required
 @app.route('/api/auto', methods=['POST'])
+@login_required
 def toggle_auto():
     """Toggle automatic control mode"""
     data = request.json
-    system.auto_mode = data.get('enabled', False)
-    return jsonify({'success': True, 'auto_mode': system.auto_mode})
+    return command('auto', {'enabled': data.get('enabled', False)})
 
-@login_required
 @app.route('/api/vfd/<name>/frequency', methods=['POST'])
+@login_required
 def set_vfd_frequency(name):
     """Set VFD frequency manually"""
+    if name not in VFD_NAMES:
+        return jsonify({'success': False, 'error': 'Invalid VFD name'}), 400
     try:
-        data = request.json
-        frequency = float(data['frequency'])
-        
-        if name == 'fan':
-            system.fan_vfd.set_frequency(frequency)
-        elif name == 'pump_primary':
-            system.pump_manager.primary.set_frequency(frequency)
-        elif name == 'pump_backup':
-            system.pump_manager.backup.set_frequency(frequency)
-        else:
-            return jsonify({'success': False, 'error': 'Invalid VFD name'}), 400
-        
-        return jsonify({'success': True})
+        frequency = float(request.json['frequency'])
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return command('vfd_frequency', {'name': name, 'frequency': frequency})
 
-@login_required
 @app.route('/api/vfd/<name>/start', methods=['POST'])
+@login_required
 def start_vfd(name):
     """Start individual VFD"""
-    try:
-        if name == 'fan':
-            system.fan_vfd.start()
-        elif name == 'pump_primary':
-            system.pump_manager.primary.start()
-        elif name == 'pump_backup':
-            system.pump_manager.backup.start()
-        else:
-            return jsonify({'success': False, 'error': 'Invalid VFD name'}), 400
-        
-        return jsonify({'success': True})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    if name not in VFD_NAMES:
+        return jsonify({'success': False, 'error': 'Invalid VFD name'}), 400
+    return command('vfd_start', {'name': name})
 
-@login_required
 @app.route('/api/vfd/<name>/stop', methods=['POST'])
+@login_required
 def stop_vfd(name):
     """Stop individual VFD"""
-    try:
-        if name == 'fan':
-            system.fan_vfd.stop()
-        elif name == 'pump_primary':
-            system.pump_manager.primary.stop()
-        elif name == 'pump_backup':
-            system.pump_manager.backup.stop()
-        else:
-            return jsonify({'success': False, 'error': 'Invalid VFD name'}), 400
-        
-        return jsonify({'success': True})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    if name not in VFD_NAMES:
+        return jsonify({'success': False, 'error': 'Invalid VFD name'}), 400
+    return command('vfd_stop', {'name': name})
 
-@login_required
 @app.route('/api/settings', methods=['POST'])
+@login_required
 def update_settings():
     """Update control parameters"""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
+    return command('settings', data)
+
+@app.route('/api/estop', methods=['POST'])
+@login_required
+def emergency_stop():
+    """Emergency stop: broadcast stop to every drive and confirm within the deadline"""
+    return command('estop')
+
+@app.route('/api/autotune')
+@login_required
+def get_autotune():
+    """Pressure loop autotune progress and the last result"""
+    snap, error = require_snapshot()
+    if error:
+        return error
+    return jsonify({'success': True, 'autotune': snap['state'].get('autotune')})
+
+@app.route('/api/autotune/start', methods=['POST'])
+@login_required
+def start_autotune():
+    """Run a relay autotune of the pressure loop (system running in auto mode)"""
+    return command('autotune_start')
+
+@app.route('/api/autotune/abort', methods=['POST'])
+@login_required
+def abort_autotune():
+    """Stop a running autotune; the pressure loop takes back over"""
+    return command('autotune_abort')
+
+@app.route('/api/energy')
+@login_required
+def get_energy():
+    """Get energy totals with daily/monthly history per drive"""
+    snap, error = require_snapshot()
+    if error:
+        return error
+    if snap['energy'] is None:
+        return jsonify({'success': False, 'error': 'Energy metering disabled'}), 404
     try:
-        data = request.json
-        
-        if 'target_pressure' in data:
-            system.system_state['control_params']['target_pressure'] = float(data['target_pressure'])
-        if 'kp' in data:
-            system.system_state['control_params']['kp'] = float(data['kp'])
-        if 'min_frequency' in data:
-            system.system_state['control_params']['min_frequency'] = float(data['min_frequency'])
-        if 'max_frequency' in data:
-            system.system_state['control_params']['max_frequency'] = float(data['max_frequency'])
-        
-        return jsonify({'success': True, 'settings': system.system_state['control_params']})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        history = daemon.call('energy_history').get('history', {})
+    except DaemonUnavailable as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    return jsonify({'success': True, 'status': snap['energy'], 'history': history})
+
+@app.route('/api/gateway')
+@login_required
+def get_gateway():
+    """Get Modbus TCP gateway statistics"""
+    snap, error = require_snapshot()
+    if error:
+        return error
+    if snap['gateway'] is None:
+        return jsonify({'success': False, 'error': 'Gateway not running'}), 404
+    return jsonify({'success': True, 'stats': snap['gateway']})
 
+@app.route('/api/alarms')
 @login_required
+def get_alarms():
+    """
+    Active alarms. With ?since=<version> the request waits (long poll) until
+    the alarm version in the daemon's snapshot changes, so the dashboard
+    only re-renders on changes.
+    """
+    snap, error = require_snapshot()
+    if error:
+        return error
+    if snap['alarms'] is None:
+        return jsonify({'success': False, 'error': 'Alarms disabled'}), 404
+    since = request.args.get('since', type=int)
+    if since is not None:
+        deadline = time.monotonic() + ALARMS['long_poll_timeout']
+        while snap['alarm_version'] == since and time.monotonic() < deadline:
+            time.sleep(CONTROL_DAEMON['publish_interval'])
+            snap = daemon.snapshot() or snap
+    return jsonify({
+        'success': True,
+        'version': snap['alarm_version'],
+        'alarms': snap['alarms']
+    })
+
+@app.route('/api/alarms/history')
+@login_required
+def get_alarm_history():
+    """Alarm history, newest first (?drive=, ?code=, ?limit=)"""
+    return command('alarm_history', {
+        'drive': request.args.get('drive'),
+        'code': request.args.get('code'),
+        'limit': request.args.get('limit', 100, type=int)
+    })
+
+@app.route('/api/alarms/<int:alarm_id>/ack', methods=['POST'])
+@login_required
+def acknowledge_alarm(alarm_id):
+    """Acknowledge one alarm"""
+    return command('alarm_ack', {'alarm_id': alarm_id, 'user': current_user.id})
+
+@app.route('/api/alarms/ack', methods=['POST'])
+@login_required
+def acknowledge_all_alarms():
+    """Acknowledge every unacknowledged alarm"""
+    return command('alarm_ack_all', {'user': current_user.id})
+
+@app.route('/api/config')
+@login_required
+def get_config_status():
+    """Config override file status (last errors, sections needing a restart)"""
+    snap, error = require_snapshot()
+    if error:
+        return error
+    return jsonify({'success': True, 'config': snap['config']})
+
+@app.route('/api/config/reload', methods=['POST'])
+@login_required
+def reload_config():
+    """Ask the daemon to re-read the config override file"""
+    return command('config_reload')
+
+@app.route('/api/polling')
+@login_required
+def get_polling():
+    """Get adaptive bus polling statistics"""
+    snap, error = require_snapshot()
+    if error:
+        return error
+    return jsonify({'success': True, 'buses': snap['polling']})
+
+@app.route('/api/daemon')
+@login_required
+def get_daemon():
+    """Control daemon IPC statistics and snapshot age"""
+    snap, error = require_snapshot()
+    if error:
+        return error
+    return jsonify({
+        'success': True,
+        'running': snap['running'],
+        'auto_mode': snap['auto_mode'],
+        'age': round(time.time() - snap['published'], 2),
+        'ipc': snap['ipc']
+    })
+
 @app.route('/api/pump/switch', methods=['POST'])
+@login_required
 def switch_pump():
-    """Manually switch active pump"""
+    """Manually switch active pump (staged handover while running)"""
     try:
-        if system.system_state['active_pump'] == 'primary':
-            system.pump_manager._failover_to_backup()
-        else:
-            system.pump_manager._failback_to_primary()
-        
-        return jsonify({'success': True})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        reply = daemon.call('pump_switch')
+    except DaemonUnavailable as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    return jsonify(reply), (200 if reply.get('success') else 409)
 
 if __name__ == '__main__':
-    # Start status update thread
-    def update_thread():
-        """Fast sensor updates every 2 seconds"""
-        while True:
-            system.update_sensors()
-            time.sleep(2.0)
-    
-    def vfd_update_thread():
-        """Slow VFD status updates every 10 seconds"""
-        while True:
-            system.update_vfds()
-            time.sleep(10.0)
-    
-    threading.Thread(target=update_thread, daemon=True).start()
-    threading.Thread(target=vfd_update_thread, daemon=True).start()
-    
-    # Run Flask app
-    app.run(host='0.0.0.0', port=8000, debug=False)
+    # Development server; production runs several workers under a WSGI server
+    app.run(host='0.0.0.0', port=8000, debug=False, threaded=True)